@@ -1,11 +1,30 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import List
-from ..database import get_collection
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from ..models.user import User, UserInDB
 from ..models.question import Question
 from ..models.answer import Answer
 from ..auth.dependencies import get_current_admin_user
+from ..auth.jwt import revoke_user_tokens
+from ..services.reputation import ledger, votes_points, accepted_points
+from ..services.ranking import answer_removed
+from ..services.duplicates import duplicate_index
+from ..services.related import related_index
+from ..services.suggest import suggest_index
+from ..services.listings import listing_cache
+from ..services.mentions import username_cache
+from ..services import comments, revisions, rollups
+from ..utils.singleflight import read_flight
+from ..repositories import base as repositories
+from ..repositories.questions import question_repo
+from ..repositories.answers import answer_repo
+from ..repositories.users import user_repo
+from ..repositories.notifications import notification_repo
+from ..config import settings
 from bson import ObjectId
+import datetime
+import json
+import zlib
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -15,10 +34,7 @@ async def get_all_users(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100)
 ):
-    users_collection = get_collection("users")
-    
-    cursor = users_collection.find().sort("created_at", -1).skip(skip).limit(limit)
-    users = await cursor.to_list(length=limit)
+    users = await user_repo.newest(skip, limit)
     
     return [User(**{**u, "id": str(u["_id"])}) for u in users]
 
@@ -27,10 +43,8 @@ async def ban_user(
     user_id: str,
     current_admin: UserInDB = Depends(get_current_admin_user)
 ):
-    users_collection = get_collection("users")
-    
     try:
-        user = await users_collection.find_one({"_id": ObjectId(user_id)})
+        user = await user_repo.get(ObjectId(user_id))
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -43,10 +57,9 @@ async def ban_user(
                 detail="Cannot ban admin users"
             )
         
-        await users_collection.update_one(
-            {"_id": ObjectId(user_id)},
-            {"$set": {"is_active": False}}
-        )
+        await user_repo.set_fields(ObjectId(user_id), {"is_active": False})
+        await revoke_user_tokens(user_id)
+        username_cache.forget_user(user_id)
         
         return {"message": "User banned successfully"}
     except:
@@ -60,20 +73,16 @@ async def unban_user(
     user_id: str,
     current_admin: UserInDB = Depends(get_current_admin_user)
 ):
-    users_collection = get_collection("users")
-    
     try:
-        user = await users_collection.find_one({"_id": ObjectId(user_id)})
+        user = await user_repo.get(ObjectId(user_id))
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
         
-        await users_collection.update_one(
-            {"_id": ObjectId(user_id)},
-            {"$set": {"is_active": True}}
-        )
+        await user_repo.set_fields(ObjectId(user_id), {"is_active": True})
+        username_cache.forget_user(user_id)
         
         return {"message": "User unbanned successfully"}
     except:
@@ -87,22 +96,30 @@ async def delete_question_admin(
     question_id: str,
     current_admin: UserInDB = Depends(get_current_admin_user)
 ):
-    questions_collection = get_collection("questions")
-    answers_collection = get_collection("answers")
-    
     try:
-        question = await questions_collection.find_one({"_id": ObjectId(question_id)})
+        question = await question_repo.delete_owned(
+            ObjectId(question_id),
+            projection={"author_id": 1, "user_votes": 1, "accepted_answer_id": 1}
+        )
         if not question:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Question not found"
             )
         
-        # Delete associated answers
-        await answers_collection.delete_many({"question_id": ObjectId(question_id)})
+        # Take back the reputation earned on the question and its answers
+        ledger.record(question["author_id"], -votes_points("question", question.get("user_votes"), question["author_id"]), "question_deleted", question["_id"])
+        async for a in answer_repo.for_question(ObjectId(question_id), {"author_id": 1, "user_votes": 1}):
+            ledger.record(a["author_id"], -votes_points("answer", a.get("user_votes"), a["author_id"]) - accepted_points(question, a), "answer_deleted", a["_id"])
         
-        # Delete question
-        await questions_collection.delete_one({"_id": ObjectId(question_id)})
+        # Delete associated answers
+        await answer_repo.delete_for_question(ObjectId(question_id))
+        await comments.remove_for_question(question["_id"])
+        await revisions.remove_for_question(question["_id"])
+        duplicate_index.remove(question_id)
+        related_index.remove(question_id)
+        suggest_index.remove(question_id)
+        listing_cache.invalidate()
         
         return {"message": "Question deleted by admin"}
     except:
@@ -116,25 +133,21 @@ async def delete_answer_admin(
     answer_id: str,
     current_admin: UserInDB = Depends(get_current_admin_user)
 ):
-    answers_collection = get_collection("answers")
-    questions_collection = get_collection("questions")
-    
     try:
-        answer = await answers_collection.find_one({"_id": ObjectId(answer_id)})
+        answer = await answer_repo.delete_owned(
+            ObjectId(answer_id),
+            projection={"question_id": 1, "author_id": 1, "user_votes": 1}
+        )
         if not answer:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Answer not found"
             )
         
-        # Decrement answer count for question
-        await questions_collection.update_one(
-            {"_id": answer["question_id"]},
-            {"$inc": {"answers_count": -1}}
-        )
-        
-        # Delete answer
-        await answers_collection.delete_one({"_id": ObjectId(answer_id)})
+        question = await answer_removed(answer["question_id"], answer["_id"])
+        await comments.remove_for_answer(answer["_id"])
+        await revisions.remove_for_answer(answer["_id"])
+        ledger.record(answer["author_id"], -votes_points("answer", answer.get("user_votes"), answer["author_id"]) - accepted_points(question, answer), "answer_deleted", answer["_id"])
         
         return {"message": "Answer deleted by admin"}
     except:
@@ -143,17 +156,29 @@ async def delete_answer_admin(
             detail="Invalid answer ID"
         )
 
+@router.get("/metrics/read-coalescing")
+async def get_read_coalescing_metrics(
+    limit: int = Query(50, ge=1, le=1000),
+    current_admin: UserInDB = Depends(get_current_admin_user)
+):
+    # Hot read keys in this worker, most shared first
+    return read_flight.stats(limit)
+
+@router.get("/metrics/repositories")
+async def get_repository_metrics(
+    limit: int = Query(100, ge=1, le=1000),
+    current_admin: UserInDB = Depends(get_current_admin_user)
+):
+    # Database calls made through the repositories in this worker, most time spent first
+    return repositories.stats(limit)
+
 @router.get("/stats")
 async def get_admin_stats(current_admin: UserInDB = Depends(get_current_admin_user)):
-    users_collection = get_collection("users")
-    questions_collection = get_collection("questions")
-    answers_collection = get_collection("answers")
-    
-    total_users = await users_collection.count_documents({})
-    active_users = await users_collection.count_documents({"is_active": True})
-    total_questions = await questions_collection.count_documents({})
-    total_answers = await answers_collection.count_documents({})
-    answered_questions = await questions_collection.count_documents({"is_answered": True})
+    total_users = await user_repo.count_all()
+    active_users = await user_repo.count_active()
+    total_questions = await question_repo.count_all()
+    total_answers = await answer_repo.count_all()
+    answered_questions = await question_repo.count_answered()
     
     return {
         "total_users": total_users,
@@ -163,4 +188,94 @@ async def get_admin_stats(current_admin: UserInDB = Depends(get_current_admin_us
         "total_answers": total_answers,
         "answered_questions": answered_questions,
         "unanswered_questions": total_questions - answered_questions
-    } 
\ No newline at end of file
+    } 
+
+@router.get("/stats/daily")
+async def get_daily_stats(
+    start: Optional[datetime.date] = Query(None, description="First day (default: 30 days before end)"),
+    end: Optional[datetime.date] = Query(None, description="Last day, inclusive (default: today)"),
+    top_tags: int = Query(10, ge=1, le=100),
+    current_admin: UserInDB = Depends(get_current_admin_user)
+):
+    # Served from the daily_stats rollups only; see services.rollups
+    end = end or datetime.date.today()
+    start = start or end - datetime.timedelta(days=29)
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    if (end - start).days >= 3660:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Date range too long"
+        )
+    
+    return await rollups.series(start, end, top_tags)
+
+# Collections available for export, with fields that must never leave the server
+EXPORT_COLLECTIONS = {
+    "users": (user_repo, {"hashed_password": 0}),
+    "questions": (question_repo, None),
+    "answers": (answer_repo, None),
+    "notifications": (notification_repo, None),
+}
+
+def _export_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+async def _export_stream(collection_name: str, after_id: Optional[ObjectId], compress: bool):
+    repo, projection = EXPORT_COLLECTIONS[collection_name]
+    cursor = repo.scan(projection, settings.EXPORT_BATCH_SIZE, after_id)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    
+    # Lines are joined into ~64KB chunks so each yield carries a useful payload
+    buffer = []
+    buffered = 0
+    async for doc in cursor:
+        line = json.dumps(doc, default=_export_default, separators=(",", ":")) + "\n"
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= 65536:
+            chunk = "".join(buffer).encode()
+            buffer, buffered = [], 0
+            if compressor:
+                chunk = compressor.compress(chunk)
+                if not chunk:
+                    continue
+            yield chunk
+    
+    chunk = "".join(buffer).encode()
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+@router.get("/export/{collection_name}")
+async def export_collection(
+    collection_name: str,
+    compress: bool = Query(False),
+    after_id: Optional[str] = Query(None, description="Resume an interrupted export after this document ID"),
+    current_admin: UserInDB = Depends(get_current_admin_user)
+):
+    if collection_name not in EXPORT_COLLECTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unknown export collection"
+        )
+    if after_id is not None and not ObjectId.is_valid(after_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid document ID"
+        )
+    
+    filename = f"{collection_name}.ndjson" + (".gz" if compress else "")
+    return StreamingResponse(
+        _export_stream(collection_name, ObjectId(after_id) if after_id else None, compress),
+        media_type="application/gzip" if compress else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -1,13 +1,24 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
 from typing import List
-from ..database import get_collection
 from ..models.answer import AnswerCreate, Answer, AnswerUpdate
+from ..models.revision import Revision, RevisionInfo
 from ..models.question import Question
 from ..auth.dependencies import get_current_active_user
 from ..models.user import UserInDB, PyObjectId
 from bson import ObjectId
 import datetime
-from ..models.notification import NotificationCreate
+from ..services.reputation import ledger, vote_delta, votes_points, accepted_points
+from ..services.ranking import question_hot_score, answer_removed
+from ..services.votes import raise_not_found_or_forbidden
+from ..services.mentions import notify_mentions
+from ..services.rendering import rendered_fields
+from ..services.notifications import notify
+from ..services import comments, revisions
+from ..services.listings import listing_cache
+from ..utils.conditional import make_etag, is_not_modified, not_modified_response, set_etag
+from ..repositories.questions import question_repo
+from ..repositories.answers import answer_repo
+from ..repositories.votes import vote_repo
 
 router = APIRouter(prefix="/answers", tags=["answers"])
 
@@ -17,12 +28,8 @@ async def create_answer(
     question_id: str = Query(...),
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    answers_collection = get_collection("answers")
-    questions_collection = get_collection("questions")
-    notifications_collection = get_collection("notifications")
-    
     # Check if question exists
-    question = await questions_collection.find_one({"_id": ObjectId(question_id)})
+    question = await question_repo.get(ObjectId(question_id))
     if not question:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -38,28 +45,26 @@ async def create_answer(
     answer_dict["_id"] = ObjectId()
     answer_dict["created_at"] = datetime.datetime.now()
     answer_dict["updated_at"] = datetime.datetime.now()
+    answer_dict.update(rendered_fields("content", answer_dict["content"]))
     
-    result = await answers_collection.insert_one(answer_dict)
+    result = await answer_repo.insert_one(answer_dict)
     answer_dict["id"] = str(result.inserted_id)
     
     # Increment answer count for question
-    await questions_collection.update_one(
-        {"_id": ObjectId(question_id)},
-        {"$inc": {"answers_count": 1}}
-    )
+    await question_repo.answer_added(ObjectId(question_id), question_hot_score(question, answers_delta=1))
     
     # Notify question author (if not answering own question)
     if str(question["author_id"]) != str(current_user.id):
-        notification = NotificationCreate(
-            recipient_id=question["author_id"],
-            type="answer",
-            title="New Answer to Your Question",
-            message=f"{current_user.username} answered your question: {question['title']}",
-            related_question_id=PyObjectId(question["_id"]),
-            related_answer_id=PyObjectId(answer_dict["_id"]),
-            sender_username=current_user.username
+        await notify(
+            question["author_id"],
+            "answer",
+            "New Answer to Your Question",
+            f"{current_user.username} answered your question: {question['title']}",
+            sender_username=current_user.username,
+            related_question_id=question["_id"],
+            related_answer_id=answer_dict["_id"]
         )
-        await notifications_collection.insert_one(notification.dict(by_alias=True))
+    await notify_mentions(answer_dict["content"], current_user, question["_id"], question["title"], answer_id=answer_dict["_id"])
     
     # Before returning, convert ObjectId fields to strings
     answer_dict["id"] = str(answer_dict["_id"])
@@ -67,14 +72,17 @@ async def create_answer(
     answer_dict["author_id"] = str(answer_dict["author_id"])
     return Answer(**answer_dict)
 
+def answers_etag(question_id: str, stamp: dict, skip: int, limit: int) -> str:
+    return make_etag(question_id, stamp.get("answers_version", 0), stamp.get("answers_count", 0), skip, limit)
+
 @router.get("/question/{question_id}", response_model=List[Answer])
 async def get_answers_for_question(
     question_id: str,
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100)
 ):
-    answers_collection = get_collection("answers")
-    
     try:
         # Validate ObjectId format
         if not ObjectId.is_valid(question_id):
@@ -83,8 +91,16 @@ async def get_answers_for_question(
                 detail="Invalid question ID format"
             )
         
-        cursor = answers_collection.find({"question_id": ObjectId(question_id)}).sort("votes", -1).skip(skip).limit(limit)
-        answers = await cursor.to_list(length=limit)
+        # Every answer write bumps answers_version on the parent question
+        stamp = await question_repo.get_shared(ObjectId(question_id), {"answers_version": 1, "answers_count": 1})
+        if stamp:
+            etag = answers_etag(question_id, stamp, skip, limit)
+            if is_not_modified(request, etag):
+                return not_modified_response(etag)
+            set_etag(response, etag)
+        
+        # Concurrent readers of the same page share one query
+        answers = await answer_repo.page_shared(ObjectId(question_id), skip, limit)
         
         return [Answer(**{
             **a, 
@@ -110,22 +126,7 @@ async def update_answer(
     answer_update: AnswerUpdate,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    answers_collection = get_collection("answers")
-    
     try:
-        answer = await answers_collection.find_one({"_id": ObjectId(answer_id)})
-        if not answer:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Answer not found"
-            )
-        
-        if str(answer["author_id"]) != str(current_user.id):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized to update this answer"
-            )
-        
         update_data = answer_update.dict(exclude_unset=True)
         if not update_data:
             raise HTTPException(
@@ -134,18 +135,20 @@ async def update_answer(
             )
         
         update_data["updated_at"] = datetime.datetime.now()
+        if "content" in update_data:
+            update_data.update(rendered_fields("content", update_data["content"]))
         
-        await answers_collection.update_one(
-            {"_id": ObjectId(answer_id)},
-            {"$set": update_data}
-        )
-        
-        updated_answer = await answers_collection.find_one({"_id": ObjectId(answer_id)})
-        if not updated_answer:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Answer not found after update"
-            )
+        # Ownership is part of the filter, so the check and the write are one atomic step.
+        # The previous version comes back too so revisions and mentions can be diffed against it.
+        edited = await answer_repo.update_owned(ObjectId(answer_id), current_user.id, update_data)
+        if not edited:
+            await raise_not_found_or_forbidden(answer_repo, ObjectId(answer_id), "Answer not found", "Not authorized to update this answer")
+        answer, updated_answer = edited
+        await revisions.record_edit("answer", answer, updated_answer, current_user)
+        await question_repo.bump_answers_version(updated_answer["question_id"])
+        if "content" in update_data:
+            question = await question_repo.get(answer["question_id"], {"title": 1})
+            await notify_mentions(updated_answer["content"], current_user, answer["question_id"], question["title"] if question else "", answer_id=answer["_id"], previous_text=answer.get("content"))
         return Answer(**{
             **updated_answer, 
             "id": str(updated_answer["_id"]), 
@@ -156,6 +159,8 @@ async def update_answer(
             "created_at": updated_answer.get("created_at", datetime.datetime.now()),
             "updated_at": updated_answer.get("updated_at", datetime.datetime.now())
         })
+    except HTTPException:
+        raise
     except:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -167,86 +172,169 @@ async def delete_answer(
     answer_id: str,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    answers_collection = get_collection("answers")
-    questions_collection = get_collection("questions")
-    
     try:
-        answer = await answers_collection.find_one({"_id": ObjectId(answer_id)})
-        if not answer:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Answer not found"
-            )
-        
-        if str(answer["author_id"]) != str(current_user.id) and current_user.role != "admin":
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized to delete this answer"
-            )
-        
-        # Decrement answer count for question
-        await questions_collection.update_one(
-            {"_id": answer["question_id"]},
-            {"$inc": {"answers_count": -1}}
+        answer = await answer_repo.delete_owned(
+            ObjectId(answer_id),
+            None if current_user.role == "admin" else current_user.id,
+            projection={"question_id": 1, "author_id": 1, "user_votes": 1}
         )
+        if not answer:
+            await raise_not_found_or_forbidden(answer_repo, ObjectId(answer_id), "Answer not found", "Not authorized to delete this answer")
         
-        # Delete answer
-        await answers_collection.delete_one({"_id": ObjectId(answer_id)})
+        question = await answer_removed(answer["question_id"], answer["_id"])
+        await comments.remove_for_answer(answer["_id"])
+        await revisions.remove_for_answer(answer["_id"])
+        ledger.record(answer["author_id"], -votes_points("answer", answer.get("user_votes"), answer["author_id"]) - accepted_points(question, answer), "answer_deleted", answer["_id"])
         
         return {"message": "Answer deleted successfully"}
+    except HTTPException:
+        raise
     except:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid answer ID"
         )
 
+REVISION_PROJECTION = {"content": 1, "question_id": 1, "author_id": 1, "author_username": 1, "created_at": 1, "revision_count": 1}
+
+async def find_answer_for_revisions(answer_id: str) -> dict:
+    if not ObjectId.is_valid(answer_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid answer ID"
+        )
+    answer = await answer_repo.get(ObjectId(answer_id), REVISION_PROJECTION)
+    if not answer:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Answer not found"
+        )
+    return answer
+
+@router.get("/{answer_id}/revisions", response_model=List[RevisionInfo])
+async def get_answer_revisions(
+    answer_id: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100)
+):
+    answer = await find_answer_for_revisions(answer_id)
+    return await revisions.list_revisions("answer", answer, skip, limit)
+
+@router.get("/{answer_id}/revisions/{number}", response_model=Revision)
+async def get_answer_revision(answer_id: str, number: int):
+    answer = await find_answer_for_revisions(answer_id)
+    revision = await revisions.materialize("answer", answer, number)
+    if revision is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Revision not found"
+        )
+    return revision
+
 @router.post("/{answer_id}/vote")
 async def vote_answer(
     answer_id: str,
     vote_type: str = Query(..., regex="^(upvote|downvote)$"),
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    answers_collection = get_collection("answers")
-    notifications_collection = get_collection("notifications")
-    
     try:
-        answer = await answers_collection.find_one({"_id": ObjectId(answer_id)})
-        if not answer:
+        vote_value = 1 if vote_type == "upvote" else -1
+        user_id_str = str(current_user.id)
+        
+        # Read and toggle in one atomic update, so concurrent clicks cannot skew the total
+        result = await vote_repo.toggle(
+            "answer", ObjectId(answer_id), user_id_str, vote_value,
+            projection={"author_id": 1, "question_id": 1}
+        )
+        if result is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Answer not found"
             )
+        answer, existing_vote, new_vote = result
         
-        # Check if user already voted
-        user_votes = answer.get("user_votes", {}) if answer else {}
-        user_id_str = str(current_user.id)
-        existing_vote = user_votes.get(user_id_str, 0)
-        
-        vote_value = 1 if vote_type == "upvote" else -1
+        await question_repo.bump_answers_version(answer["question_id"])
+        # Self-votes earn nothing, but a vote cast is still journaled for the activity rollups
+        points = vote_delta("answer", existing_vote, new_vote) if str(answer["author_id"]) != user_id_str else 0
+        ledger.record(answer["author_id"], points, "answer_vote", answer["_id"], cast=existing_vote == 0 and new_vote != 0)
         
-        if existing_vote == vote_value:
-            # Remove vote - user is clicking the same vote type again
-            await answers_collection.update_one(
-                {"_id": ObjectId(answer_id)},
-                {
-                    "$unset": {f"user_votes.{user_id_str}": ""},
-                    "$inc": {"votes": -vote_value}
-                }
-            )
+        if new_vote == 0:
             return {"message": "Vote removed"}
-        else:
-            # Update vote - either new vote or changing vote type
-            vote_diff = vote_value - existing_vote
-            await answers_collection.update_one(
-                {"_id": ObjectId(answer_id)},
-                {
-                    "$set": {f"user_votes.{user_id_str}": vote_value},
-                    "$inc": {"votes": vote_diff}
-                }
-            )
-            return {"message": f"Answer {vote_type}d"}
+        return {"message": f"Answer {vote_type}d"}
+    except HTTPException:
+        raise
     except:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid answer ID"
-        ) 
\ No newline at end of file
+        )
+
+async def raise_accept_failure(question_id, current_user: UserInDB, message: str):
+    """Explain why an accept or unaccept matched no question; only runs on the failure path."""
+    question = await question_repo.get(question_id, {"author_id": 1})
+    if not question:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Question not found"
+        )
+    if question["author_id"] != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the question author can accept answers"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=message
+    )
+
+async def find_answer_for_accept(answer_id: str) -> dict:
+    if not ObjectId.is_valid(answer_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid answer ID"
+        )
+    answer = await answer_repo.get(ObjectId(answer_id), {"question_id": 1, "author_id": 1})
+    if not answer:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Answer not found"
+        )
+    return answer
+
+@router.post("/{answer_id}/accept")
+async def accept_answer(
+    answer_id: str,
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    answer = await find_answer_for_accept(answer_id)
+    
+    # The accepted answer and is_answered change together, in one update filtered on ownership
+    question = await question_repo.set_accepted(answer["question_id"], current_user.id, answer["_id"])
+    if not question:
+        await raise_accept_failure(answer["question_id"], current_user, "Answer is already accepted")
+    
+    # Accepting another answer moves the bonus over
+    if question.get("accepted_answer_id"):
+        previous = await answer_repo.get(question["accepted_answer_id"], {"author_id": 1})
+        if previous:
+            ledger.record(previous["author_id"], -accepted_points(question, previous), "answer_unaccepted", previous["_id"])
+    ledger.record(answer["author_id"], accepted_points({**question, "accepted_answer_id": answer["_id"]}, answer), "answer_accepted", answer["_id"])
+    listing_cache.invalidate()
+    
+    return {"message": "Answer accepted"}
+
+@router.delete("/{answer_id}/accept")
+async def unaccept_answer(
+    answer_id: str,
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    answer = await find_answer_for_accept(answer_id)
+    
+    question = await question_repo.clear_accepted(answer["question_id"], current_user.id, answer["_id"])
+    if not question:
+        await raise_accept_failure(answer["question_id"], current_user, "Answer is not accepted")
+    
+    ledger.record(answer["author_id"], -accepted_points(question, answer), "answer_unaccepted", answer["_id"])
+    listing_cache.invalidate()
+    
+    return {"message": "Answer unaccepted"}
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.security import OAuth2PasswordRequestForm
-from ..database import get_collection
+from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials
 from ..models.user import UserCreate, User, UserUpdate, UserInDB
-from ..auth.jwt import create_access_token, get_password_hash, verify_password
-from ..auth.dependencies import get_current_active_user
+from ..auth.jwt import create_access_token, get_password_hash, verify_password, revoke_token, revoke_user_tokens
+from ..auth.dependencies import get_current_active_user, security
+from ..services.reputation import leaderboard
+from ..services.mentions import username_cache
+from ..repositories.users import user_repo
 from bson import ObjectId
 import datetime
 import re
@@ -12,10 +14,8 @@ router = APIRouter(prefix="/auth", tags=["authentication"])
 
 @router.post("/register", response_model=User)
 async def register(user_data: UserCreate):
-    users_collection = get_collection("users")
-    
     # Check if username already exists
-    existing_user = await users_collection.find_one({"username": user_data.username})
+    existing_user = await user_repo.get_by_username(user_data.username)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -23,7 +23,7 @@ async def register(user_data: UserCreate):
         )
     
     # Check if email already exists
-    existing_email = await users_collection.find_one({"email": user_data.email})
+    existing_email = await user_repo.get_by_email(user_data.email)
     if existing_email:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -52,16 +52,15 @@ async def register(user_data: UserCreate):
     user_dict["created_at"] = datetime.datetime.now()
     user_dict["updated_at"] = datetime.datetime.now()
     
-    result = await users_collection.insert_one(user_dict)
+    result = await user_repo.insert_one(user_dict)
     user_dict["id"] = str(result.inserted_id)
+    leaderboard.set(user_dict["id"], 0, user_dict["username"])
     
     return User(**user_dict)
 
 @router.post("/login")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    users_collection = get_collection("users")
-    
-    user = await users_collection.find_one({"username": form_data.username})
+    user = await user_repo.get_by_username(form_data.username)
     if not user or not verify_password(form_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -89,6 +88,14 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
         }
     }
 
+@router.post("/logout")
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    await revoke_token(credentials.credentials)
+    return {"message": "Logged out successfully"}
+
 @router.get("/me", response_model=User)
 async def get_current_user_info(current_user: UserInDB = Depends(get_current_active_user)):
     return User(
@@ -107,8 +114,6 @@ async def update_current_user(
     user_update: UserUpdate,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    users_collection = get_collection("users")
-    
     update_data = user_update.dict(exclude_unset=True)
     if not update_data:
         raise HTTPException(
@@ -118,10 +123,7 @@ async def update_current_user(
     
     # Check if new username already exists
     if "username" in update_data:
-        existing_user = await users_collection.find_one({
-            "username": update_data["username"],
-            "_id": {"$ne": current_user.id}
-        })
+        existing_user = await user_repo.get_by_username(update_data["username"], exclude_id=current_user.id)
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -130,10 +132,7 @@ async def update_current_user(
     
     # Check if new email already exists
     if "email" in update_data:
-        existing_email = await users_collection.find_one({
-            "email": update_data["email"],
-            "_id": {"$ne": current_user.id}
-        })
+        existing_email = await user_repo.get_by_email(update_data["email"], exclude_id=current_user.id)
         if existing_email:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -141,18 +140,23 @@ async def update_current_user(
             )
     
     # Hash password if provided
-    if "password" in update_data:
+    password_changed = "password" in update_data
+    if password_changed:
         update_data["hashed_password"] = get_password_hash(update_data.pop("password"))
     
     update_data["updated_at"] = datetime.datetime.now()
     
-    await users_collection.update_one(
-        {"_id": current_user.id},
-        {"$set": update_data}
-    )
+    await user_repo.set_fields(current_user.id, update_data)
+    
+    # Invalidate every token issued before the password change
+    if password_changed:
+        await revoke_user_tokens(str(current_user.id))
+    if "username" in update_data:
+        leaderboard.rename(str(current_user.id), update_data["username"])
+        username_cache.forget_user(current_user.id)
     
     # Get updated user
-    updated_user = await users_collection.find_one({"_id": current_user.id})
+    updated_user = await user_repo.get(current_user.id)
     if not updated_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -0,0 +1,128 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from typing import Dict, Optional
+from ..models.comment import CommentCreate, Comment, CommentPage, CommentParentType
+from ..auth.dependencies import get_current_active_user
+from ..models.user import UserInDB
+from bson import ObjectId
+from ..services import comments
+from ..services.notifications import notify
+from ..repositories.questions import question_repo
+from ..repositories.comments import comment_bucket_repo
+
+router = APIRouter(prefix="/comments", tags=["comments"])
+
+def to_comment(parent_type: str, parent_id, c: dict) -> Comment:
+    return Comment(
+        id=str(c["_id"]),
+        parent_type=parent_type,
+        parent_id=str(parent_id),
+        author_id=str(c["author_id"]),
+        author_username=c["author_username"],
+        content=c["content"],
+        created_at=c["created_at"]
+    )
+
+def parse_id(value: str, label: str) -> ObjectId:
+    if not ObjectId.is_valid(value):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid {label} ID"
+        )
+    return ObjectId(value)
+
+@router.post("/", response_model=Comment)
+async def create_comment(
+    comment_data: CommentCreate,
+    parent_type: CommentParentType = Query(...),
+    parent_id: str = Query(...),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    result = await comments.append(parent_type, parse_id(parent_id, parent_type), current_user, comment_data.content)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{parent_type.capitalize()} not found"
+        )
+    parent, comment = result
+
+    # Notify the author of what was commented on (if not commenting on own post)
+    if str(parent["author_id"]) != str(current_user.id):
+        if parent_type == "question":
+            question_id, title = parent["_id"], parent.get("title", "")
+        else:
+            question_id = parent["question_id"]
+            question = await question_repo.get(question_id, {"title": 1})
+            title = question["title"] if question else ""
+        await notify(
+            parent["author_id"],
+            "comment",
+            "New Comment",
+            f"{current_user.username} commented on your {parent_type}: {title}",
+            sender_username=current_user.username,
+            related_question_id=question_id,
+            related_answer_id=parent["_id"] if parent_type == "answer" else None
+        )
+
+    return to_comment(parent_type, parent["_id"], comment)
+
+@router.get("/thread", response_model=Dict[str, CommentPage])
+async def get_thread_comments(
+    question_id: str = Query(...),
+    answer_ids: Optional[str] = Query(None, description="Comma-separated IDs of the answers on the page"),
+    limit: int = Query(5, ge=1, le=comments.BUCKET_SIZE)
+):
+    """First comments of a question and a page of its answers, in one query."""
+    parents = {parse_id(question_id, "question"): "question"}
+    if answer_ids:
+        ids = [a.strip() for a in answer_ids.split(",") if a.strip()]
+        if len(ids) > 100:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Too many answer IDs"
+            )
+        for a in ids:
+            parents[parse_id(a, "answer")] = "answer"
+
+    pages = await comments.first_pages(list(parents), limit)
+    return {
+        str(parent_id): CommentPage(
+            comments=[to_comment(parents[parent_id], parent_id, c) for c in page_comments],
+            next_cursor=next_cursor
+        )
+        for parent_id, (page_comments, next_cursor) in pages.items()
+    }
+
+@router.get("/{parent_type}/{parent_id}", response_model=CommentPage)
+async def get_comments(
+    parent_type: CommentParentType,
+    parent_id: str,
+    cursor: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100)
+):
+    parent_oid = parse_id(parent_id, parent_type)
+    page_comments, next_cursor = await comments.page(parent_oid, cursor, limit)
+    return CommentPage(
+        comments=[to_comment(parent_type, parent_oid, c) for c in page_comments],
+        next_cursor=next_cursor
+    )
+
+@router.delete("/{comment_id}")
+async def delete_comment(
+    comment_id: str,
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    comment_oid = parse_id(comment_id, "comment")
+    # Ownership is part of the filter; admins may remove any comment
+    author_id = None if current_user.role == "admin" else current_user.id
+    if not await comments.remove(comment_oid, author_id):
+        if await comment_bucket_repo.has_live(comment_oid):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to delete this comment"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Comment not found"
+        )
+
+    return {"message": "Comment deleted successfully"}
@@ -0,0 +1,69 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Path
+from typing import List, Optional
+from ..models.question import Question, QuestionPage
+from ..models.user import UserInDB
+from ..auth.dependencies import get_current_active_user
+from ..services import feeds
+from ..utils.keyset import decode_cursor
+from ..config import settings
+
+router = APIRouter(prefix="/feed", tags=["feed"])
+
+@router.get("/", response_model=QuestionPage)
+async def get_feed(
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    """Newest questions in the tags the current user follows, paged by (created_at, _id)."""
+    position = None
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+
+    questions, next_cursor = await feeds.page(current_user.id, current_user.followed_tags, position, limit)
+
+    return QuestionPage(
+        questions=[Question(**{**q, "id": str(q["_id"]), "author_id": str(q["author_id"]), "user_votes": q.get("user_votes", {})}) for q in questions],
+        next_cursor=next_cursor
+    )
+
+@router.get("/tags", response_model=List[str])
+async def get_followed_tags(current_user: UserInDB = Depends(get_current_active_user)):
+    return current_user.followed_tags
+
+@router.put("/tags/{tag}")
+async def follow_tag(
+    tag: str = Path(..., min_length=1, max_length=50),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    tag = tag.strip()
+    if tag in current_user.followed_tags:
+        return {"message": "Tag already followed"}
+    if len(current_user.followed_tags) >= settings.FEED_MAX_FOLLOWED_TAGS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot follow more than {settings.FEED_MAX_FOLLOWED_TAGS} tags"
+        )
+
+    # The write re-checks both conditions, a concurrent follow may have won
+    await feeds.follow(current_user.id, tag)
+
+    return {"message": "Tag followed"}
+
+@router.delete("/tags/{tag}")
+async def unfollow_tag(
+    tag: str = Path(..., min_length=1, max_length=50),
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    if not await feeds.unfollow(current_user.id, tag.strip()):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tag not followed"
+        )
+
+    return {"message": "Tag unfollowed"}
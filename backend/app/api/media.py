@@ -0,0 +1,198 @@
+from fastapi import APIRouter, HTTPException, status, Request, Response
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+from ..config import settings
+from ..utils.conditional import etag_matches
+import aiofiles
+import aiofiles.os
+import mimetypes
+import os
+import re
+import stat
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+mimetypes.add_type("image/webp", ".webp")
+
+SAFE_FILENAME = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9._-]*$")
+# Upload outputs are named after the SHA-256 of their source, so their bytes never change
+CONTENT_HASHED_FILENAME = re.compile(r"^([0-9a-f]{64}(?:_thumb)?)\.[a-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+class _SmallFileCache:
+    """Byte-bounded LRU for small immutable media such as thumbnails."""
+
+    def __init__(self, max_bytes: int, max_item_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self._items: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._size = 0
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        item = self._items.get(key)
+        if item is not None:
+            self._items.move_to_end(key)
+        return item
+
+    def put(self, key: str, content: bytes, mtime: float):
+        if len(content) > self.max_item_bytes or key in self._items:
+            return
+        self._items[key] = (content, mtime)
+        self._size += len(content)
+        while self._size > self.max_bytes and self._items:
+            _, (evicted, _) = self._items.popitem(last=False)
+            self._size -= len(evicted)
+
+small_file_cache = _SmallFileCache(settings.MEDIA_CACHE_BYTES, settings.MEDIA_CACHE_MAX_ITEM_BYTES)
+
+class FileRangeResponse(Response):
+    """Sends ``count`` bytes of a file from ``offset``, zero-copy when the server supports it."""
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, path: str, offset: int, count: int, status_code: int, headers: dict, media_type: str):
+        super().__init__(status_code=status_code, headers={**headers, "content-length": str(count)}, media_type=media_type)
+        self.path = path
+        self.offset = offset
+        self.count = count
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD" or self.count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        # ASGI zero-copy send extension: the server hands the file to sendfile(2)
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as f:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.offset,
+                    "count": self.count,
+                    "more_body": False,
+                })
+            return
+
+        async with aiofiles.open(self.path, "rb") as f:
+            await f.seek(self.offset)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Return the inclusive byte span of a single-range header, ``None`` to send the whole file.
+
+    Raises ``ValueError`` for an unsatisfiable range. Multi-range requests are
+    answered with the full representation, which RFC 9110 allows.
+    """
+    if not header:
+        return None
+    match = RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        suffix = int(end)
+        if suffix == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - suffix, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+@router.get("/{filename}")
+@router.head("/{filename}", include_in_schema=False)
+async def get_media(filename: str, request: Request):
+    not_found = HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="File not found"
+    )
+    if not SAFE_FILENAME.match(filename):
+        raise not_found
+
+    hashed = CONTENT_HASHED_FILENAME.match(filename)
+    path = os.path.join(settings.UPLOAD_DIR, filename)
+    cached = small_file_cache.get(filename) if hashed else None
+    if cached:
+        content, mtime = cached
+        size = len(content)
+    else:
+        try:
+            stat_result = await aiofiles.os.stat(path)
+        except FileNotFoundError:
+            raise not_found
+        if not stat.S_ISREG(stat_result.st_mode):
+            raise not_found
+        size, mtime = stat_result.st_size, stat_result.st_mtime
+
+    etag = f'"{hashed.group(1)}"' if hashed else f'"{int(mtime):x}-{size:x}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if hashed else DEFAULT_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    if _not_modified(request, etag, mtime):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # Offload to the reverse proxy's sendfile when one is configured
+    if settings.MEDIA_ACCEL_REDIRECT_PREFIX and not cached:
+        return Response(headers={**headers, "X-Accel-Redirect": settings.MEDIA_ACCEL_REDIRECT_PREFIX + filename}, media_type=media_type)
+
+    span = None
+    if_range = request.headers.get("if-range")
+    if not if_range or if_range.strip() == etag:
+        try:
+            span = parse_range(request.headers.get("range"), size)
+        except ValueError:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{size}"}
+            )
+    start, end = span if span else (0, size - 1)
+    status_code = status.HTTP_206_PARTIAL_CONTENT if span else status.HTTP_200_OK
+    if span:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    if cached:
+        body = content if request.method == "GET" else b""
+        if span:
+            body = body[start:end + 1]
+        return Response(content=body, status_code=status_code, headers={**headers, "content-length": str(end - start + 1)}, media_type=media_type)
+
+    if hashed and size <= small_file_cache.max_item_bytes:
+        async with aiofiles.open(path, "rb") as f:
+            content = await f.read()
+        small_file_cache.put(filename, content, mtime)
+        body = content[start:end + 1] if request.method == "GET" else b""
+        return Response(content=body, status_code=status_code, headers={**headers, "content-length": str(end - start + 1)}, media_type=media_type)
+
+    return FileRangeResponse(path, start, end - start + 1, status_code, headers, media_type)
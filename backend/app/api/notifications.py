@@ -1,29 +1,35 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
 from typing import List
-from ..database import get_collection
-from ..models.notification import Notification, NotificationCreate
+from ..models.notification import Notification, NotificationCreate, NotificationIds
 from ..auth.dependencies import get_current_active_user
 from ..models.user import UserInDB, PyObjectId
 from bson import ObjectId
 import datetime
+from ..config import settings
+from ..services.notifications import bump_version
+from ..services.votes import raise_not_found_or_forbidden
+from ..utils.conditional import make_etag, is_not_modified, not_modified_response, set_etag
+from ..repositories.notifications import notification_repo
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
 @router.get("/", response_model=List[Notification])
 async def get_notifications(
+    request: Request,
+    response: Response,
     current_user: UserInDB = Depends(get_current_active_user),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     unread_only: bool = Query(False)
 ):
-    notifications_collection = get_collection("notifications")
+    # Every write to a recipient's notifications bumps notifications_version, and the user
+    # document is already loaded for auth, so revalidation costs no query
+    etag = make_etag(current_user.id, current_user.notifications_version, skip, limit, unread_only)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_etag(response, etag)
     
-    filter_query = {"recipient_id": str(current_user.id)}
-    if unread_only:
-        filter_query["is_read"] = False
-    
-    cursor = notifications_collection.find(filter_query).sort("created_at", -1).skip(skip).limit(limit)
-    notifications = await cursor.to_list(length=limit)
+    notifications = await notification_repo.page(current_user.id, skip, limit, unread_only)
     
     def convert_notification(n):
         if not n.get("recipient_id"):  # recipient_id is required
@@ -37,47 +43,58 @@ async def get_notifications(
             related_question_id=PyObjectId(n["related_question_id"]) if n.get("related_question_id") else None,
             related_answer_id=PyObjectId(n["related_answer_id"]) if n.get("related_answer_id") else None,
             sender_username=n.get("sender_username"),
+            count=n.get("count", 1),
+            senders=n.get("senders") or ([n["sender_username"]] if n.get("sender_username") else []),
             is_read=bool(n.get("is_read", False)),
             created_at=n.get("created_at") or datetime.datetime.now(),
+            updated_at=n.get("updated_at"),
         )
     return [notif for n in notifications if (notif := convert_notification(n))]
 
 @router.get("/unread-count")
 async def get_unread_count(current_user: UserInDB = Depends(get_current_active_user)):
-    notifications_collection = get_collection("notifications")
-    
-    count = await notifications_collection.count_documents({
-        "recipient_id": current_user.id,
-        "is_read": False
-    })
+    count = await notification_repo.unread_count(current_user.id)
     
     return {"unread_count": count}
 
+def parse_ids(ids: List[str]) -> List[ObjectId]:
+    if not all(ObjectId.is_valid(i) for i in ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid notification ID"
+        )
+    return [ObjectId(i) for i in ids]
+
+@router.post("/read")
+async def mark_notifications_read(
+    payload: NotificationIds,
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    # Ownership is part of the filter, ids belonging to other users are simply not matched
+    marked = await notification_repo.mark_read(parse_ids(payload.ids), current_user.id)
+    if marked:
+        await bump_version(current_user.id)
+    return {"marked_read": marked}
+
+@router.post("/delete")
+async def delete_notifications(
+    payload: NotificationIds,
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    deleted = await notification_repo.delete_owned(parse_ids(payload.ids), current_user.id)
+    if deleted:
+        await bump_version(current_user.id)
+    return {"deleted": deleted}
+
 @router.post("/{notification_id}/read")
 async def mark_notification_read(
     notification_id: str,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    notifications_collection = get_collection("notifications")
-    
     try:
-        notification = await notifications_collection.find_one({"_id": ObjectId(notification_id)})
-        if not notification:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Notification not found"
-            )
-        
-        if str(notification["recipient_id"]) != str(current_user.id):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized to mark this notification as read"
-            )
-        
-        await notifications_collection.update_one(
-            {"_id": ObjectId(notification_id)},
-            {"$set": {"is_read": True}}
-        )
+        if not await notification_repo.mark_one_read(ObjectId(notification_id), current_user.id):
+            await raise_not_found_or_forbidden(notification_repo, ObjectId(notification_id), "Notification not found", "Not authorized to mark this notification as read")
+        await bump_version(current_user.id)
         
         return {"message": "Notification marked as read"}
     except:
@@ -88,44 +105,33 @@ async def mark_notification_read(
 
 @router.post("/mark-all-read")
 async def mark_all_notifications_read(current_user: UserInDB = Depends(get_current_active_user)):
-    notifications_collection = get_collection("notifications")
-    
-    await notifications_collection.update_many(
-        {
-            "recipient_id": str(current_user.id),
-            "is_read": False
-        },
-        {"$set": {"is_read": True}}
-    )
+    # Bounded chunks keep each write short however large the unread backlog is
+    marked = 0
+    while True:
+        chunk = await notification_repo.unread_ids(current_user.id, settings.NOTIFICATION_MARK_ALL_CHUNK)
+        if not chunk:
+            break
+        marked += await notification_repo.mark_read(chunk)
+        if len(chunk) < settings.NOTIFICATION_MARK_ALL_CHUNK:
+            break
+    if marked:
+        await bump_version(current_user.id)
     
-    return {"message": "All notifications marked as read"}
+    return {"message": "All notifications marked as read", "marked_read": marked}
 
 @router.delete("/{notification_id}")
 async def delete_notification(
     notification_id: str,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    notifications_collection = get_collection("notifications")
-    
     try:
-        notification = await notifications_collection.find_one({"_id": ObjectId(notification_id)})
-        if not notification:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Notification not found"
-            )
-        
-        if str(notification["recipient_id"]) != str(current_user.id):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized to delete this notification"
-            )
-        
-        await notifications_collection.delete_one({"_id": ObjectId(notification_id)})
+        if not await notification_repo.delete_owned([ObjectId(notification_id)], current_user.id):
+            await raise_not_found_or_forbidden(notification_repo, ObjectId(notification_id), "Notification not found", "Not authorized to delete this notification")
+        await bump_version(current_user.id)
         
         return {"message": "Notification deleted successfully"}
     except:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid notification ID"
-        ) 
\ No newline at end of file
+        )
\ No newline at end of file
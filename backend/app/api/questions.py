@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
 from typing import List, Optional
-from ..database import get_collection
-from ..models.question import QuestionCreate, Question, QuestionUpdate, QuestionInDB
+from ..config import settings
+from ..models.question import QuestionCreate, Question, QuestionUpdate, QuestionInDB, QuestionPage
+from ..models.revision import Revision, RevisionInfo
 from ..models.answer import Answer, AnswerCreate
 from ..auth.dependencies import get_current_active_user, get_current_user
 from ..models.user import UserInDB
@@ -9,6 +10,21 @@ from bson import ObjectId
 import datetime
 from ..models.notification import NotificationCreate
 from ..models.user import PyObjectId
+from ..services.reputation import ledger, vote_delta, votes_points, accepted_points
+from ..services.ranking import question_hot_score, hot_score_expression
+from ..services.votes import raise_not_found_or_forbidden
+from ..services.mentions import notify_mentions
+from ..services.rendering import rendered_fields
+from ..services.duplicates import duplicate_index
+from ..services.related import related_index
+from ..services.suggest import suggest_index
+from ..services.listings import listing_cache, listing_sort, tag_catalog
+from ..services import comments, revisions, feeds
+from ..utils.keyset import encode_cursor, decode_cursor
+from ..utils.conditional import QUESTION_ETAG_PROJECTION, question_etag, is_not_modified, not_modified_response, set_etag
+from ..repositories.questions import question_repo
+from ..repositories.answers import answer_repo
+from ..repositories.votes import vote_repo
 
 router = APIRouter(prefix="/questions", tags=["questions"])
 
@@ -17,8 +33,6 @@ async def create_question(
     question_data: QuestionCreate,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    questions_collection = get_collection("questions")
-    
     question_dict = question_data.dict()
     question_dict["author_id"] = str(current_user.id)  # Convert to string for Question model
     question_dict["author_username"] = current_user.username
@@ -29,14 +43,22 @@ async def create_question(
     question_dict["is_answered"] = False
     question_dict["created_at"] = datetime.datetime.now()
     question_dict["updated_at"] = datetime.datetime.now()
+    question_dict.update(rendered_fields("description", question_dict["description"]))
     
     # Create the document for MongoDB (with ObjectId)
     mongo_doc = question_dict.copy()
+    mongo_doc["hot_score"] = question_hot_score(mongo_doc)
     mongo_doc["_id"] = ObjectId()
     mongo_doc["author_id"] = current_user.id  # Keep as ObjectId for MongoDB
     
-    result = await questions_collection.insert_one(mongo_doc)
+    result = await question_repo.insert_one(mongo_doc)
     question_dict["id"] = str(result.inserted_id)
+    duplicate_index.add(question_dict["id"], mongo_doc["title"], mongo_doc["description"])
+    related_index.add(question_dict["id"], mongo_doc["title"], mongo_doc["tags"])
+    suggest_index.add(question_dict["id"], mongo_doc["title"], 0, mongo_doc["created_at"])
+    listing_cache.invalidate()
+    await notify_mentions(mongo_doc["description"], current_user, mongo_doc["_id"], mongo_doc["title"])
+    feeds.schedule_fan_out(mongo_doc)
     
     return Question(**question_dict)
 
@@ -46,34 +68,89 @@ async def get_questions(
     limit: int = Query(10, ge=1, le=100),
     search: Optional[str] = Query(None),
     tags: Optional[str] = Query(None),
-    sort_by: str = Query("created_at", regex="^(created_at|votes|views|answers_count)$"),
+    sort_by: str = Query("created_at", regex="^(created_at|votes|views|answers_count|hot)$"),
     sort_order: str = Query("desc", regex="^(asc|desc)$")
 ):
-    questions_collection = get_collection("questions")
-    
-    # Build filter
-    filter_query = {}
-    if search:
-        filter_query["$text"] = {"$search": search}
-    if tags:
-        tag_list = [tag.strip() for tag in tags.split(",")]
-        filter_query["tags"] = {"$in": tag_list}
-    
-    # Build sort
     sort_direction = -1 if sort_order == "desc" else 1
-    sort_query = [(sort_by, sort_direction)]
     
-    cursor = questions_collection.find(filter_query).sort(sort_query).skip(skip).limit(limit)
-    questions = await cursor.to_list(length=limit)
+    # The unfiltered first page is the homepage, served from a short-lived shared cache
+    if not search and not tags and skip == 0 and limit <= settings.LISTING_CACHE_DEPTH:
+        questions = listing_cache.get(sort_by, sort_direction)
+        if questions is None:
+            questions = await listing_cache.load(sort_by, sort_direction)
+        return [Question(**{**q, "id": str(q["_id"]), "author_id": str(q["author_id"]), "user_votes": q.get("user_votes", {})}) for q in questions[:limit]]
+    
+    tag_list = [tag.strip() for tag in tags.split(",")] if tags else None
+    questions = await question_repo.search(search, tag_list, listing_sort(sort_by, sort_direction), skip, limit)
     
     return [Question(**{**q, "id": str(q["_id"]), "author_id": str(q["author_id"]), "user_votes": q.get("user_votes", {})}) for q in questions if q]
 
-@router.get("/{question_id}", response_model=Question)
-async def get_question(question_id: str):
-    questions_collection = get_collection("questions")
+@router.get("/tags")
+async def get_tag_catalog(limit: int = Query(100, ge=1, le=1000)):
+    return (await tag_catalog.get())[:limit]
+
+@router.get("/unanswered", response_model=QuestionPage)
+async def get_unanswered_questions(
+    tag: Optional[str] = Query(None),
+    order: str = Query("newest", regex="^(newest|oldest)$"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Questions without an accepted answer, paged by (created_at, _id) instead of skip."""
+    position = None
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
     
+    # One extra row tells whether there is a next page
+    questions = await question_repo.unanswered(tag.strip() if tag else None, position, order == "newest", limit + 1)
+    next_cursor = None
+    if len(questions) > limit:
+        questions = questions[:limit]
+        next_cursor = encode_cursor(questions[-1]["created_at"], questions[-1]["_id"])
+    
+    return QuestionPage(
+        questions=[Question(**{**q, "id": str(q["_id"]), "author_id": str(q["author_id"]), "user_votes": q.get("user_votes", {})}) for q in questions],
+        next_cursor=next_cursor
+    )
+
+@router.get("/duplicates")
+async def find_duplicate_questions(
+    title: str = Query(..., min_length=3, max_length=300),
+    description: Optional[str] = Query(None, max_length=10000),
+    limit: int = Query(5, ge=1, le=20),
+    exclude_id: Optional[str] = Query(None)
+):
+    # Served entirely from the in-memory MinHash index, no database access
+    return duplicate_index.query(title, description or "", limit, exclude_id)
+
+@router.get("/suggest")
+async def suggest_questions(
+    response: Response,
+    q: str = Query(..., max_length=100),
+    limit: int = Query(8, ge=1, le=10)
+):
+    # Served from the in-memory title index; short caching lets the browser reuse results on backspace
+    response.headers["Cache-Control"] = "public, max-age=30"
+    return suggest_index.suggest(q, limit)
+
+@router.get("/{question_id}", response_model=Question)
+async def get_question(question_id: str, request: Request, response: Response):
     try:
-        question = await questions_collection.find_one({"_id": ObjectId(question_id)})
+        # Revalidation only needs the version fields, and does not count as a view
+        if request.headers.get("if-none-match"):
+            stamp = await question_repo.get_shared(ObjectId(question_id), QUESTION_ETAG_PROJECTION)
+            if stamp:
+                etag = question_etag(stamp)
+                if is_not_modified(request, etag):
+                    return not_modified_response(etag)
+        
+        # A viral question gets many identical concurrent reads, they share one query
+        question = await question_repo.get_shared(ObjectId(question_id))
         if not question:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -81,40 +158,85 @@ async def get_question(question_id: str):
             )
         
         # Increment view count
-        await questions_collection.update_one(
-            {"_id": ObjectId(question_id)},
-            {"$inc": {"views": 1}}
-        )
+        await question_repo.record_view(ObjectId(question_id), question_hot_score(question, views_delta=1))
+        set_etag(response, question_etag(question))
         
         return Question(**{**question, "id": str(question["_id"]), "author_id": str(question["author_id"]), "user_votes": question.get("user_votes", {})})
+    except HTTPException:
+        raise
     except:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid question ID"
         )
 
-@router.put("/{question_id}", response_model=Question)
-async def update_question(
+@router.get("/{question_id}/related")
+async def get_related_questions(
     question_id: str,
-    question_update: QuestionUpdate,
-    current_user: UserInDB = Depends(get_current_active_user)
+    limit: int = Query(5, ge=1, le=20)
 ):
-    questions_collection = get_collection("questions")
+    if not ObjectId.is_valid(question_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid question ID"
+        )
     
-    try:
-        question = await questions_collection.find_one({"_id": ObjectId(question_id)})
+    results = related_index.related(question_id, limit)
+    if results is None:
+        # Not in the index yet (or no index built), score it from its stored title and tags
+        question = await question_repo.get(ObjectId(question_id), {"title": 1, "tags": 1})
         if not question:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Question not found"
             )
-        
-        if str(question["author_id"]) != str(current_user.id):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized to update this question"
-            )
-        
+        results = related_index.related(question_id, limit, fallback=(question.get("title", ""), question.get("tags", []))) or []
+    return results
+
+# What the revision endpoints read of the post itself
+REVISION_PROJECTION = {"title": 1, "description": 1, "tags": 1, "author_id": 1, "author_username": 1, "created_at": 1, "revision_count": 1}
+
+async def find_question_for_revisions(question_id: str) -> dict:
+    if not ObjectId.is_valid(question_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid question ID"
+        )
+    question = await question_repo.get(ObjectId(question_id), REVISION_PROJECTION)
+    if not question:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Question not found"
+        )
+    return question
+
+@router.get("/{question_id}/revisions", response_model=List[RevisionInfo])
+async def get_question_revisions(
+    question_id: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100)
+):
+    question = await find_question_for_revisions(question_id)
+    return await revisions.list_revisions("question", question, skip, limit)
+
+@router.get("/{question_id}/revisions/{number}", response_model=Revision)
+async def get_question_revision(question_id: str, number: int):
+    question = await find_question_for_revisions(question_id)
+    revision = await revisions.materialize("question", question, number)
+    if revision is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Revision not found"
+        )
+    return revision
+
+@router.put("/{question_id}", response_model=Question)
+async def update_question(
+    question_id: str,
+    question_update: QuestionUpdate,
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    try:
         update_data = question_update.dict(exclude_unset=True)
         if not update_data:
             raise HTTPException(
@@ -123,19 +245,28 @@ async def update_question(
             )
         
         update_data["updated_at"] = datetime.datetime.now()
+        if "description" in update_data:
+            update_data.update(rendered_fields("description", update_data["description"]))
         
-        await questions_collection.update_one(
-            {"_id": ObjectId(question_id)},
-            {"$set": update_data}
-        )
-        
-        updated_question = await questions_collection.find_one({"_id": ObjectId(question_id)})
-        if not updated_question:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Question not found after update"
-            )
+        # Ownership is part of the filter, so the check and the write are one atomic step.
+        # The previous version comes back too so revisions and mentions can be diffed against it.
+        edited = await question_repo.update_owned(ObjectId(question_id), current_user.id, update_data)
+        if not edited:
+            await raise_not_found_or_forbidden(question_repo, ObjectId(question_id), "Question not found", "Not authorized to update this question")
+        question, updated_question = edited
+        await revisions.record_edit("question", question, updated_question, current_user)
+        if "description" in update_data:
+            await notify_mentions(updated_question["description"], current_user, question["_id"], updated_question["title"], previous_text=question.get("description"))
+        if "title" in update_data or "description" in update_data:
+            duplicate_index.add(question_id, updated_question["title"], updated_question["description"])
+        if "title" in update_data or "tags" in update_data:
+            related_index.add(question_id, updated_question["title"], updated_question.get("tags", []))
+        if "title" in update_data:
+            suggest_index.set_title(question_id, updated_question["title"])
+        listing_cache.invalidate()
         return Question(**{**updated_question, "id": str(updated_question["_id"]), "author_id": str(updated_question["author_id"]), "user_votes": updated_question.get("user_votes", {})})
+    except HTTPException:
+        raise
     except:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -147,30 +278,32 @@ async def delete_question(
     question_id: str,
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    questions_collection = get_collection("questions")
-    answers_collection = get_collection("answers")
-    
     try:
-        question = await questions_collection.find_one({"_id": ObjectId(question_id)})
+        question = await question_repo.delete_owned(
+            ObjectId(question_id),
+            None if current_user.role == "admin" else current_user.id,
+            projection={"author_id": 1, "user_votes": 1, "accepted_answer_id": 1}
+        )
         if not question:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Question not found"
-            )
+            await raise_not_found_or_forbidden(question_repo, ObjectId(question_id), "Question not found", "Not authorized to delete this question")
         
-        if str(question["author_id"]) != str(current_user.id) and current_user.role != "admin":
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized to delete this question"
-            )
+        # Take back the reputation earned on the question and its answers
+        ledger.record(question["author_id"], -votes_points("question", question.get("user_votes"), question["author_id"]), "question_deleted", question["_id"])
+        async for a in answer_repo.for_question(ObjectId(question_id), {"author_id": 1, "user_votes": 1}):
+            ledger.record(a["author_id"], -votes_points("answer", a.get("user_votes"), a["author_id"]) - accepted_points(question, a), "answer_deleted", a["_id"])
         
         # Delete associated answers
-        await answers_collection.delete_many({"question_id": ObjectId(question_id)})
-        
-        # Delete question
-        await questions_collection.delete_one({"_id": ObjectId(question_id)})
+        await answer_repo.delete_for_question(ObjectId(question_id))
+        await comments.remove_for_question(question["_id"])
+        await revisions.remove_for_question(question["_id"])
+        duplicate_index.remove(question_id)
+        related_index.remove(question_id)
+        suggest_index.remove(question_id)
+        listing_cache.invalidate()
         
         return {"message": "Question deleted successfully"}
+    except HTTPException:
+        raise
     except:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -183,44 +316,33 @@ async def vote_question(
     vote_type: str = Query(..., regex="^(upvote|downvote)$"),
     current_user: UserInDB = Depends(get_current_active_user)
 ):
-    questions_collection = get_collection("questions")
-    notifications_collection = get_collection("notifications")
     try:
-        question = await questions_collection.find_one({"_id": ObjectId(question_id)})
-        if not question:
+        vote_value = 1 if vote_type == "upvote" else -1
+        user_id_str = str(current_user.id)
+        
+        # Read, toggle and re-score in one atomic update, so concurrent clicks cannot skew the total
+        result = await vote_repo.toggle(
+            "question", ObjectId(question_id), user_id_str, vote_value,
+            projection={"author_id": 1, "votes": 1},
+            then={"hot_score": hot_score_expression()}
+        )
+        if result is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Question not found"
             )
+        question, existing_vote, new_vote = result
         
-        # Check if user already voted
-        user_votes = question.get("user_votes", {})
-        user_id_str = str(current_user.id)
-        existing_vote = user_votes.get(user_id_str, 0)
+        # Self-votes earn nothing, but a vote cast is still journaled for the activity rollups
+        points = vote_delta("question", existing_vote, new_vote) if str(question["author_id"]) != user_id_str else 0
+        ledger.record(question["author_id"], points, "question_vote", question["_id"], cast=existing_vote == 0 and new_vote != 0)
+        suggest_index.set_votes(question_id, question.get("votes", 0) + new_vote - existing_vote)
         
-        vote_value = 1 if vote_type == "upvote" else -1
-        
-        if existing_vote == vote_value:
-            # Remove vote - user is clicking the same vote type again
-            await questions_collection.update_one(
-                {"_id": ObjectId(question_id)},
-                {
-                    "$unset": {f"user_votes.{user_id_str}": ""},
-                    "$inc": {"votes": -vote_value}
-                }
-            )
+        if new_vote == 0:
             return {"message": "Vote removed"}
-        else:
-            # Update vote - either new vote or changing vote type
-            vote_diff = vote_value - existing_vote
-            await questions_collection.update_one(
-                {"_id": ObjectId(question_id)},
-                {
-                    "$set": {f"user_votes.{user_id_str}": vote_value},
-                    "$inc": {"votes": vote_diff}
-                }
-            )
-            return {"message": f"Question {vote_type}d"}
+        return {"message": f"Question {vote_type}d"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
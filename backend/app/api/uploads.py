@@ -0,0 +1,166 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Request
+from multipart.multipart import MultipartParser, parse_options_header
+from multipart.exceptions import MultipartParseError
+from ..config import settings
+from ..auth.dependencies import get_current_active_user
+from ..models.user import UserInDB
+from ..services import images
+from ..repositories.uploads import upload_repo
+import aiofiles
+import aiofiles.os
+import datetime
+import hashlib
+import os
+import uuid
+
+router = APIRouter(prefix="/uploads", tags=["uploads"])
+
+# Allowance for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+class _FilePartSink:
+    """MultipartParser callbacks that collect the bytes of the first file part."""
+
+    def __init__(self):
+        self.chunks = []
+        self.found_file = False
+        self.filename = None
+        self._in_file = False
+        self._headers = {}
+        self._header_name = []
+        self._header_value = []
+
+    def drain(self):
+        chunks, self.chunks = self.chunks, []
+        return chunks
+
+    def on_header_field(self, data, start, end):
+        self._header_name.append(data[start:end])
+
+    def on_header_value(self, data, start, end):
+        self._header_value.append(data[start:end])
+
+    def on_header_end(self):
+        self._headers[b"".join(self._header_name).lower()] = b"".join(self._header_value)
+        self._header_name.clear()
+        self._header_value.clear()
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition"))
+        self._in_file = not self.found_file and b"filename" in options
+        if self._in_file:
+            self.found_file = True
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+        self._headers = {}
+
+    def on_part_data(self, data, start, end):
+        if self._in_file:
+            self.chunks.append(data[start:end])
+
+    def on_part_end(self):
+        self._in_file = False
+
+    @property
+    def callbacks(self):
+        return {
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+def _upload_response(doc: dict, deduplicated: bool) -> dict:
+    return {
+        "id": doc["_id"],
+        "filename": images.image_filename(doc["_id"]),
+        "thumbnail_filename": images.thumbnail_filename(doc["_id"]),
+        "url": f"/media/{images.image_filename(doc['_id'])}",
+        "thumbnail_url": f"/media/{images.thumbnail_filename(doc['_id'])}",
+        "width": doc["width"],
+        "height": doc["height"],
+        "size": doc["size"],
+        "deduplicated": deduplicated,
+    }
+
+@router.post("/")
+async def upload_image(
+    request: Request,
+    current_user: UserInDB = Depends(get_current_active_user)
+):
+    content_type, params = parse_options_header(request.headers.get("content-type"))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a multipart/form-data body"
+        )
+
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds the maximum size of {settings.MAX_FILE_SIZE} bytes"
+    )
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD:
+        raise too_large
+
+    tmp_dir = os.path.join(settings.UPLOAD_DIR, "tmp")
+    await aiofiles.os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+
+    sink = _FilePartSink()
+    parser = MultipartParser(params[b"boundary"], sink.callbacks)
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        # Stream the body to disk, enforcing the size limit chunk by chunk
+        try:
+            async with aiofiles.open(tmp_path, "wb") as f:
+                async for chunk in request.stream():
+                    parser.write(chunk)
+                    for data in sink.drain():
+                        size += len(data)
+                        if size > settings.MAX_FILE_SIZE:
+                            raise too_large
+                        hasher.update(data)
+                        await f.write(data)
+            parser.finalize()
+        except MultipartParseError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Malformed multipart body"
+            )
+
+        if not sink.found_file or size == 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No file uploaded"
+            )
+
+        # Identical content maps to the same id, so repeat uploads skip processing
+        content_hash = hasher.hexdigest()
+        existing = await upload_repo.get(content_hash)
+        if existing and await aiofiles.os.path.exists(os.path.join(settings.UPLOAD_DIR, images.image_filename(content_hash))):
+            return _upload_response(existing, deduplicated=True)
+
+        try:
+            info = await images.process_upload(tmp_path, content_hash)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+
+        doc = {
+            "_id": content_hash,
+            **info,
+            "size": size,
+            "original_filename": sink.filename,
+            "uploader_id": current_user.id,
+            "created_at": datetime.datetime.now(),
+        }
+        await upload_repo.save(doc)
+        return _upload_response(doc, deduplicated=False)
+    finally:
+        if await aiofiles.os.path.exists(tmp_path):
+            await aiofiles.os.remove(tmp_path)
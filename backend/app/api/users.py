@@ -0,0 +1,21 @@
+from fastapi import APIRouter, HTTPException, status, Query
+from typing import Optional
+from bson import ObjectId
+from ..services.reputation import leaderboard
+
+router = APIRouter(prefix="/users", tags=["users"])
+
+@router.get("/leaderboard")
+async def get_leaderboard(
+    limit: int = Query(10, ge=1, le=100),
+    user_id: Optional[str] = Query(None)
+):
+    result = {"top": leaderboard.top(limit), "user": None}
+    if user_id:
+        if not ObjectId.is_valid(user_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid user ID"
+            )
+        result["user"] = leaderboard.rank(user_id)
+    return result
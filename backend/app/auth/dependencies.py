@@ -1,6 +1,6 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from ..database import get_collection
+from ..repositories.users import user_repo
 from ..models.user import UserInDB
 from .jwt import verify_token
 from bson import ObjectId
@@ -22,11 +22,14 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     if user_id is None:
         raise credentials_exception
     
-    users_collection = get_collection("users")
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await user_repo.get(ObjectId(user_id))
     if user is None:
         raise credentials_exception
     
+    # Durable cut-off from a password change or ban, also covers workers that missed the revocation
+    if payload.get("iat", 0) <= user.get("tokens_valid_after", 0):
+        raise credentials_exception
+    
     return UserInDB(**user)
 
 async def get_current_active_user(current_user: UserInDB = Depends(get_current_user)) -> UserInDB:
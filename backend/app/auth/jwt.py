@@ -1,12 +1,100 @@
 from datetime import datetime, timedelta
 import datetime
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional
+from bson import ObjectId
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from ..config import settings
+from ..repositories.users import user_repo, revoked_token_repo
+from ..services.invalidation import invalidation_bus
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+class TokenCache:
+    """Bounded LRU of verified token payloads, keyed by a SHA-256 digest of the token.
+
+    Entries live until the token's ``exp`` claim. Revoked digests and per-user
+    revocation cut-offs are remembered so a cached (or re-decoded) token can be
+    rejected after logout, a ban or a password change.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._revoked_tokens: dict = {}  # digest -> exp
+        self._revoked_users: dict = {}  # user_id -> revoked-before timestamp
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, digest: str) -> Optional[dict]:
+        with self._lock:
+            payload = self._entries.get(digest)
+            if payload is None:
+                return None
+            if payload.get("exp", 0) <= time.time():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return payload
+
+    def put(self, digest: str, payload: dict):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[digest] = payload
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def is_revoked(self, digest: str, payload: dict) -> bool:
+        if digest in self._revoked_tokens:
+            return True
+        revoked_before = self._revoked_users.get(payload.get("sub"))
+        return revoked_before is not None and payload.get("iat", 0) <= revoked_before
+
+    def revoke_token(self, token: str, exp: Optional[float] = None):
+        self.revoke_digest(self.digest(token), exp)
+
+    def revoke_digest(self, digest: str, exp: Optional[float] = None) -> float:
+        with self._lock:
+            payload = self._entries.pop(digest, None)
+            if exp is None:
+                exp = payload.get("exp") if payload else time.time() + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+            self._revoked_tokens[digest] = exp
+            self._purge_revoked()
+            return exp
+
+    def revoke_user(self, user_id: str, revoked_at: Optional[float] = None):
+        with self._lock:
+            revoked_at = revoked_at or time.time()
+            self._revoked_users[str(user_id)] = max(revoked_at, self._revoked_users.get(str(user_id), 0))
+            stale = [d for d, p in self._entries.items() if p.get("sub") == str(user_id)]
+            for d in stale:
+                del self._entries[d]
+            self._purge_revoked()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _purge_revoked(self):
+        now = time.time()
+        for d in [d for d, exp in self._revoked_tokens.items() if exp <= now]:
+            del self._revoked_tokens[d]
+        # A user cut-off only matters while tokens issued before it can still be valid
+        horizon = now - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        for u in [u for u, ts in self._revoked_users.items() if ts <= horizon]:
+            del self._revoked_users[u]
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -19,13 +107,58 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.datetime.now() + expires_delta
     else:
         expire = datetime.datetime.now() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # Sub-second issue time so a revocation cut-off never catches a token issued right after it
+    to_encode.update({"exp": expire, "iat": time.time()})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 def verify_token(token: str) -> Optional[dict]:
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    digest = TokenCache.digest(token)
+    payload = token_cache.get(digest)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            return None
+        if token_cache.is_revoked(digest, payload):
+            return None
+        token_cache.put(digest, payload)
         return payload
-    except JWTError:
-        return None 
\ No newline at end of file
+    if token_cache.is_revoked(digest, payload):
+        return None
+    return payload
+
+async def revoke_token(token: str):
+    digest = TokenCache.digest(token)
+    exp = token_cache.revoke_digest(digest)
+    # Persisted so other workers (via the invalidation bus) and restarts honour the logout
+    await revoked_token_repo.revoke(digest, datetime.datetime.utcfromtimestamp(exp))
+
+async def revoke_user_tokens(user_id: str):
+    revoked_at = time.time()
+    token_cache.revoke_user(user_id, revoked_at)
+    await user_repo.set_fields(ObjectId(user_id), {"tokens_valid_after": revoked_at})
+
+async def load_revocations():
+    now = time.time()
+    async for doc in revoked_token_repo.unexpired(datetime.datetime.utcfromtimestamp(now)):
+        token_cache.revoke_digest(doc["_id"], doc["expires_at"].replace(tzinfo=datetime.timezone.utc).timestamp())
+    horizon = now - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    async for user in user_repo.tokens_revoked_since(horizon):
+        token_cache.revoke_user(str(user["_id"]), user["tokens_valid_after"])
+
+@invalidation_bus.subscribe("revoked_tokens")
+def _on_token_revoked(event: dict):
+    doc = event.get("fullDocument")
+    if doc and doc.get("expires_at"):
+        token_cache.revoke_digest(doc["_id"], doc["expires_at"].replace(tzinfo=datetime.timezone.utc).timestamp())
+
+@invalidation_bus.subscribe("users", fields=("tokens_valid_after",))
+def _on_user_changed(event: dict):
+    user_id = str(event["documentKey"]["_id"])
+    if event["operationType"] == "delete":
+        token_cache.revoke_user(user_id)
+        return
+    revoked_at = event.get("updateDescription", {}).get("updatedFields", {}).get("tokens_valid_after")
+    if revoked_at is not None:
+        token_cache.revoke_user(user_id, revoked_at)
@@ -0,0 +1 @@
+# Maintenance Commands
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""Recompute the daily activity rollups of a range of past days.
+
+The rollup job only looks at the days since its watermark, so data written
+with older ``created_at`` values (such as an imported dump) needs a backfill:
+
+    python -m app.commands.backfill_stats --since 2024-01-01 --until 2024-12-31
+
+Days are recomputed whole, so ranges may overlap what is already rolled up.
+"""
+import argparse
+import asyncio
+import datetime
+import time
+from ..database import connect_to_mongo, close_mongo_connection
+from ..services import rollups
+
+def _day(value: str) -> datetime.date:
+    return datetime.date.fromisoformat(value)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Recompute StackIt's daily activity rollups for past days")
+    parser.add_argument("--since", type=_day, required=True, help="First day to recompute (YYYY-MM-DD)")
+    parser.add_argument("--until", type=_day, default=None, help="Last day to recompute (default: today)")
+    args = parser.parse_args()
+    until = args.until or datetime.date.today()
+    if until < args.since:
+        parser.error("--until is before --since")
+
+    await connect_to_mongo()
+    try:
+        started = time.monotonic()
+        await rollups.backfill(args.since, until)
+        print(f"Rolled up {(until - args.since).days + 1} days in {time.monotonic() - started:.1f}s")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,321 @@
+"""Bulk import of Stack Exchange style data dumps.
+
+Reads ``Users`` and ``Posts`` dumps as XML (``<row .../>`` elements, as in the
+official Stack Exchange data dump) or as JSON (a top-level array or one object
+per line) using the same attribute names. Files are parsed as streams, so
+memory use does not grow with the size of the dump.
+
+    python -m app.commands.import_dump --site superuser --users Users.xml --posts Posts.xml
+
+Imported documents get deterministic ``_id`` values derived from ``--site`` and
+the dump's numeric ids, so re-running an interrupted import only inserts what is
+missing. Usernames already taken by other accounts (compared case-insensitively)
+get the dump id appended. Imported accounts receive a random placeholder
+password and need a password reset before they can log in.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import re
+import secrets
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+from xml.etree.ElementTree import iterparse
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from ..database import connect_to_mongo, close_mongo_connection
+from ..repositories.answers import answer_repo
+from ..repositories.questions import question_repo
+from ..repositories.users import user_repo
+
+KIND_USER = 1
+KIND_QUESTION = 2
+KIND_ANSWER = 3
+
+DUPLICATE_KEY_ERROR = 11000
+REPOSITORIES = {"users": user_repo, "questions": question_repo, "answers": answer_repo}
+TAG_PATTERN = re.compile(r"<([^>]+)>|\|([^|]+)")
+
+def iter_xml_rows(path: str) -> Iterator[dict]:
+    events = iterparse(path, events=("start", "end"))
+    _, root = next(events)
+    for event, elem in events:
+        if event == "end" and elem.tag == "row":
+            yield dict(elem.attrib)
+            # Cleared rows still hang off the root; drop them so the tree never holds the whole file
+            root.clear()
+
+def iter_json_records(path: str, chunk_size: int = 1 << 20) -> Iterator[dict]:
+    decoder = json.JSONDecoder()
+    buffer = ""
+    with open(path, "r", encoding="utf-8") as f:
+        eof = False
+        while not eof:
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            pos = 0
+            while True:
+                # Skip array brackets, separators and whitespace between records
+                while pos < len(buffer) and buffer[pos] in "[], \t\r\n":
+                    pos += 1
+                if pos >= len(buffer):
+                    break
+                try:
+                    record, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    break
+                yield record
+                pos = end
+            buffer = buffer[pos:]
+
+def iter_records(path: str) -> Iterator[dict]:
+    if path.lower().endswith(".xml"):
+        return iter_xml_rows(path)
+    return iter_json_records(path)
+
+def make_id(site_prefix: bytes, kind: int, source_id) -> ObjectId:
+    """Deterministic ObjectId: 4-byte site prefix, 1-byte kind and 7-byte dump id."""
+    return ObjectId(site_prefix + bytes([kind]) + int(source_id).to_bytes(7, "big", signed=True))
+
+def parse_date(value) -> datetime.datetime:
+    if not value:
+        return datetime.datetime.now()
+    return datetime.datetime.fromisoformat(str(value).rstrip("Z"))
+
+def parse_tags(value) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, list):
+        tags = value
+    else:
+        tags = [a or b for a, b in TAG_PATTERN.findall(value)]
+    return [t.strip().lower() for t in tags if t.strip()][:5]
+
+def hash_placeholder_passwords(count: int, rounds: int) -> List[str]:
+    # Runs in a worker process; bcrypt is CPU bound and would stall the writers
+    from passlib.hash import bcrypt
+    hasher = bcrypt.using(rounds=rounds)
+    return [hasher.hash(secrets.token_urlsafe(24)) for _ in range(count)]
+
+class DumpImporter:
+    def __init__(self, site: str, batch_size: int, workers: int, bcrypt_rounds: int, processes: Optional[int]):
+        self.site_prefix = zlib.crc32(site.encode()).to_bytes(4, "big")
+        self.batch_size = batch_size
+        self.workers = workers
+        self.bcrypt_rounds = bcrypt_rounds
+        self.pool = ProcessPoolExecutor(max_workers=processes)
+        self.queue: Optional[asyncio.Queue] = None
+        self._writers: List[asyncio.Task] = []
+        self.usernames = {}
+        # Lowercased username -> id of the account holding it
+        self.taken_usernames: Dict[str, ObjectId] = {}
+        self.inserted = {"users": 0, "questions": 0, "answers": 0}
+        self.skipped = 0
+        self.ghost_id = make_id(self.site_prefix, KIND_USER, -1)
+
+    async def load_taken_usernames(self):
+        async for user in user_repo.scan({"username": 1}, batch_size=10000):
+            if user.get("username"):
+                self.taken_usernames[user["username"].lower()] = user["_id"]
+
+    def unique_username(self, display_name: str, source_id, user_id: ObjectId) -> str:
+        base = (display_name or f"user{source_id}").strip()[:50] or f"user{source_id}"
+        username, attempt = base, 0
+        # A re-run finds the account's own earlier import, which keeps its name
+        while self.taken_usernames.get(username.lower(), user_id) != user_id:
+            attempt += 1
+            suffix = f"_{source_id}" if attempt == 1 else f"_{source_id}_{attempt}"
+            username = base[:50 - len(suffix)] + suffix
+        self.taken_usernames[username.lower()] = user_id
+        return username
+
+    def map_user(self, row: dict) -> dict:
+        user_id = make_id(self.site_prefix, KIND_USER, row["Id"])
+        username = self.unique_username(row.get("DisplayName"), row["Id"], user_id)
+        self.usernames[str(row["Id"])] = username
+        created_at = parse_date(row.get("CreationDate"))
+        return {
+            "_id": user_id,
+            "username": username,
+            "email": f"user{row['Id']}@import.invalid",
+            "full_name": (row.get("DisplayName") or username)[:100],
+            "role": "user",
+            "is_active": True,
+            "reputation": int(row.get("Reputation") or 0),
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+    def author_of(self, row: dict):
+        owner = row.get("OwnerUserId")
+        if owner is None or str(owner) == "-1":
+            return self.ghost_id, row.get("OwnerDisplayName") or "community"
+        username = self.usernames.get(str(owner)) or row.get("OwnerDisplayName") or f"user{owner}"
+        return make_id(self.site_prefix, KIND_USER, owner), username
+
+    def map_post(self, row: dict):
+        post_type = str(row.get("PostTypeId"))
+        author_id, author_username = self.author_of(row)
+        created_at = parse_date(row.get("CreationDate"))
+        updated_at = parse_date(row.get("LastEditDate") or row.get("LastActivityDate") or row.get("CreationDate"))
+        if post_type == "1":
+            return "questions", {
+                "_id": make_id(self.site_prefix, KIND_QUESTION, row["Id"]),
+                "title": row.get("Title") or "",
+                "description": row.get("Body") or "",
+                "tags": parse_tags(row.get("Tags")),
+                "author_id": author_id,
+                "author_username": author_username,
+                "votes": int(row.get("Score") or 0),
+                "user_votes": {},
+                "views": int(row.get("ViewCount") or 0),
+                "answers_count": 0,
+                "is_answered": bool(row.get("AcceptedAnswerId")),
+                "accepted_answer_id": make_id(self.site_prefix, KIND_ANSWER, row["AcceptedAnswerId"]) if row.get("AcceptedAnswerId") else None,
+                "hot_score": 0,
+                "created_at": created_at,
+                "updated_at": updated_at,
+            }
+        if post_type == "2" and row.get("ParentId"):
+            return "answers", {
+                "_id": make_id(self.site_prefix, KIND_ANSWER, row["Id"]),
+                "question_id": make_id(self.site_prefix, KIND_QUESTION, row["ParentId"]),
+                "content": row.get("Body") or "",
+                "author_id": author_id,
+                "author_username": author_username,
+                "votes": int(row.get("Score") or 0),
+                "user_votes": {},
+                "created_at": created_at,
+                "updated_at": updated_at,
+            }
+        return None, None
+
+    async def _writer(self):
+        while True:
+            item = await self.queue.get()
+            try:
+                if item is None:
+                    return
+                collection_name, docs, hashes = item
+                if hashes is not None:
+                    for doc, hashed_password in zip(docs, await hashes):
+                        doc["hashed_password"] = hashed_password
+                try:
+                    result = await REPOSITORIES[collection_name].insert_many(docs, ordered=False)
+                    self.inserted[collection_name] += len(result.inserted_ids)
+                except BulkWriteError as e:
+                    # Documents already present from an earlier run are skipped, anything else is fatal
+                    errors = e.details.get("writeErrors", [])
+                    if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                        raise
+                    self.inserted[collection_name] += e.details.get("nInserted", 0)
+                    self.skipped += len(errors)
+            finally:
+                self.queue.task_done()
+
+    async def _submit(self, collection_name: str, docs: List[dict]):
+        hashes = None
+        if collection_name == "users":
+            loop = asyncio.get_running_loop()
+            hashes = loop.run_in_executor(self.pool, hash_placeholder_passwords, len(docs), self.bcrypt_rounds)
+        await self._put((collection_name, docs, hashes))
+
+    async def _put(self, item):
+        # Fail fast instead of blocking on a full queue once a writer has died
+        put = asyncio.ensure_future(self.queue.put(item))
+        done, _ = await asyncio.wait([put, *self._writers], return_when=asyncio.FIRST_COMPLETED)
+        if put not in done:
+            put.cancel()
+            for writer in done:
+                writer.result()
+
+    async def _import_file(self, path: str, mapper):
+        batches = {}
+        for row in iter_records(path):
+            collection_name, doc = mapper(row)
+            if doc is None:
+                continue
+            batch = batches.setdefault(collection_name, [])
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                batches[collection_name] = []
+                await self._submit(collection_name, batch)
+        for collection_name, batch in batches.items():
+            if batch:
+                await self._submit(collection_name, batch)
+
+    async def _ensure_ghost_user(self):
+        username = f"community_{self.site_prefix.hex()}"
+        await user_repo.insert_if_missing({
+            "_id": self.ghost_id,
+            "username": username,
+            "email": f"community-{self.site_prefix.hex()}@import.invalid",
+            "full_name": "Community",
+            "role": "user",
+            "is_active": False,
+            "reputation": 0,
+            "hashed_password": hash_placeholder_passwords(1, self.bcrypt_rounds)[0],
+            "created_at": datetime.datetime.now(),
+            "updated_at": datetime.datetime.now(),
+        })
+        self.taken_usernames[username.lower()] = self.ghost_id
+
+    async def recompute_counters(self):
+        """Rebuild answers_count from the answers collection and votes from stored user_votes."""
+        await answer_repo.recount_per_question()
+        for repo in (question_repo, answer_repo):
+            await repo.recount_votes()
+
+    async def run(self, users_path: Optional[str], posts_path: Optional[str]):
+        self.queue = asyncio.Queue(maxsize=self.workers * 2)
+        self._writers = [asyncio.create_task(self._writer()) for _ in range(self.workers)]
+        try:
+            await self._ensure_ghost_user()
+            if users_path:
+                await self.load_taken_usernames()
+                await self._import_file(users_path, lambda row: ("users", self.map_user(row)))
+            if posts_path:
+                await self._import_file(posts_path, self.map_post)
+            for _ in self._writers:
+                await self._put(None)
+            await asyncio.gather(*self._writers)
+        finally:
+            for writer in self._writers:
+                writer.cancel()
+            self.pool.shutdown()
+        await self.recompute_counters()
+
+async def main():
+    parser = argparse.ArgumentParser(description="Import a Stack Exchange style data dump into StackIt")
+    parser.add_argument("--site", required=True, help="Name of the source site, used to namespace document ids")
+    parser.add_argument("--users", help="Users dump (.xml, .json or .jsonl)")
+    parser.add_argument("--posts", help="Posts dump (.xml, .json or .jsonl)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent insert_many writers")
+    parser.add_argument("--processes", type=int, default=None, help="Password hashing processes (default: CPU count)")
+    parser.add_argument(
+        "--bcrypt-rounds", type=int, default=4,
+        help="Cost for placeholder password hashes; they protect random secrets, so the minimum is enough"
+    )
+    args = parser.parse_args()
+    if not args.users and not args.posts:
+        parser.error("nothing to import, pass --users and/or --posts")
+
+    await connect_to_mongo()
+    try:
+        importer = DumpImporter(args.site, args.batch_size, args.workers, args.bcrypt_rounds, args.processes)
+        started = time.monotonic()
+        await importer.run(args.users, args.posts)
+        counts = ", ".join(f"{count} {name}" for name, count in importer.inserted.items())
+        print(f"Imported {counts} ({importer.skipped} already present) in {time.monotonic() - started:.1f}s")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
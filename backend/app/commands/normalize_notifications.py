@@ -0,0 +1,28 @@
+"""Convert notification ids stored as strings to ObjectIds.
+
+Every notification query filters on ``recipient_id`` as an ObjectId, so
+documents written with string ids are invisible to them. Safe to run more
+than once:
+
+    python -m app.commands.normalize_notifications
+"""
+import asyncio
+from ..database import connect_to_mongo, close_mongo_connection
+from ..repositories.notifications import notification_repo
+
+ID_FIELDS = ("recipient_id", "related_question_id", "related_answer_id")
+
+async def main():
+    await connect_to_mongo()
+    try:
+        for field in ID_FIELDS:
+            converted = await notification_repo.convert_string_ids(field)
+            print(f"Converted {converted} {field} values")
+        # Older documents predate updated_at, which the listing sorts on
+        backfilled = await notification_repo.backfill_updated_at()
+        print(f"Backfilled updated_at on {backfilled} notifications")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,23 @@
+"""Recompute every user's reputation from the votes stored on questions and answers.
+
+Run from the backend directory after changing ``REPUTATION_RULES``:
+
+    python -m app.commands.rebuild_reputation
+
+Stop the API workers first: reputation changes they still hold in their
+ledger buffers would otherwise be applied on top of the rebuilt totals.
+"""
+import asyncio
+from ..database import connect_to_mongo, close_mongo_connection
+from ..services import reputation
+
+async def main():
+    await connect_to_mongo()
+    try:
+        updated = await reputation.rebuild()
+        print(f"Rebuilt reputation for {updated} users")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
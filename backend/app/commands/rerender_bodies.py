@@ -0,0 +1,61 @@
+"""Re-render stored question and answer HTML after ``RENDERER_VERSION`` changes.
+
+    python -m app.commands.rerender_bodies [--processes N] [--batch-size N]
+
+Only documents rendered by an older renderer are touched. Each update is
+conditional on the source text being unchanged, so concurrent edits (which
+render their own HTML) are never overwritten.
+"""
+import argparse
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+from ..database import connect_to_mongo, close_mongo_connection
+from ..repositories.posts import PostRepository
+from ..repositories.questions import question_repo
+from ..repositories.answers import answer_repo
+from ..services.rendering import RENDERER_VERSION, render_body
+
+TARGETS = ((question_repo, "description"), (answer_repo, "content"))
+
+def render_batch(sources: List[str]) -> List[str]:
+    return [render_body(source) for source in sources]
+
+async def rerender_collection(pool: ProcessPoolExecutor, repo: PostRepository, field: str, batch_size: int, processes: int) -> int:
+    loop = asyncio.get_running_loop()
+    cursor = repo.rendered_before(field, RENDERER_VERSION, batch_size)
+
+    updated = 0
+    while True:
+        docs = await cursor.to_list(length=batch_size)
+        if not docs:
+            break
+        sources = [doc.get(field) or "" for doc in docs]
+        # Split each batch across the pool so every process gets work
+        step = max(len(sources) // processes, 1)
+        chunks = [sources[i:i + step] for i in range(0, len(sources), step)]
+        rendered = await asyncio.gather(*(loop.run_in_executor(pool, render_batch, chunk) for chunk in chunks))
+        bodies = [body for chunk in rendered for body in chunk]
+
+        updated += await repo.store_renders(field, RENDERER_VERSION, list(zip(docs, bodies)))
+    return updated
+
+async def main():
+    parser = argparse.ArgumentParser(description="Re-render stored question and answer HTML")
+    parser.add_argument("--processes", type=int, default=None, help="Render processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    await connect_to_mongo()
+    try:
+        processes = args.processes or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            for repo, field in TARGETS:
+                updated = await rerender_collection(pool, repo, field, args.batch_size, processes)
+                print(f"Re-rendered {updated} {repo.collection_name}")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
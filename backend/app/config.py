@@ -5,17 +5,77 @@ load_dotenv()
 
 class Settings:
     # Database
+    # "mongodb", or "memory" for a process-local store (development and demos; data is lost on restart)
+    DATABASE_BACKEND: str = os.getenv("DATABASE_BACKEND", "mongodb")
     MONGODB_URL: str = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
     DATABASE_NAME: str = os.getenv("DATABASE_NAME", "stackit")
+    MONGODB_MIN_POOL_SIZE: int = int(os.getenv("MONGODB_MIN_POOL_SIZE", "10"))
+    MONGODB_MAX_POOL_SIZE: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+    READY_PING_TIMEOUT: float = float(os.getenv("READY_PING_TIMEOUT", "2"))
     
     # JWT
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
     
     # File Upload
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads")
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", "5242880"))  # 5MB
+    IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", "0"))  # 0 = one per CPU
+    MEDIA_CACHE_BYTES: int = int(os.getenv("MEDIA_CACHE_BYTES", "33554432"))  # 32MB
+    MEDIA_CACHE_MAX_ITEM_BYTES: int = int(os.getenv("MEDIA_CACHE_MAX_ITEM_BYTES", "262144"))  # 256KB
+    # Internal nginx location aliased to UPLOAD_DIR, e.g. /_media/ (empty = serve from the app)
+    MEDIA_ACCEL_REDIRECT_PREFIX: str = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "")
+    
+    # Reputation
+    REPUTATION_FLUSH_INTERVAL: float = float(os.getenv("REPUTATION_FLUSH_INTERVAL", "5"))
+    REPUTATION_BATCH_SIZE: int = int(os.getenv("REPUTATION_BATCH_SIZE", "500"))
+    
+    # Hot ranking
+    HOT_WINDOW_DAYS: int = int(os.getenv("HOT_WINDOW_DAYS", "7"))
+    HOT_REFRESH_INTERVAL: float = float(os.getenv("HOT_REFRESH_INTERVAL", "300"))
+    
+    # Related questions
+    RELATED_REBUILD_INTERVAL: float = float(os.getenv("RELATED_REBUILD_INTERVAL", "3600"))
+    RELATED_CACHE_SIZE: int = int(os.getenv("RELATED_CACHE_SIZE", "10000"))
+    RELATED_CACHE_TTL: float = float(os.getenv("RELATED_CACHE_TTL", "600"))
+    
+    # Homepage listing and tag catalog caches
+    LISTING_CACHE_TTL: float = float(os.getenv("LISTING_CACHE_TTL", "10"))
+    LISTING_CACHE_DEPTH: int = int(os.getenv("LISTING_CACHE_DEPTH", "100"))
+    TAG_CATALOG_TTL: float = float(os.getenv("TAG_CATALOG_TTL", "300"))
+    
+    # Notifications
+    NOTIFICATION_READ_TTL_DAYS: float = float(os.getenv("NOTIFICATION_READ_TTL_DAYS", "30"))  # 0 keeps them forever
+    NOTIFICATION_PURGE_INTERVAL: float = float(os.getenv("NOTIFICATION_PURGE_INTERVAL", "3600"))
+    NOTIFICATION_MARK_ALL_CHUNK: int = int(os.getenv("NOTIFICATION_MARK_ALL_CHUNK", "500"))
+    
+    # Cross-worker cache invalidation (needs a replica set for change streams)
+    INVALIDATION_ENABLED: bool = os.getenv("INVALIDATION_ENABLED", "true").lower() == "true"
+    
+    # Edit history: a full snapshot every N revisions bounds how many deltas a read applies
+    REVISION_SNAPSHOT_INTERVAL: int = int(os.getenv("REVISION_SNAPSHOT_INTERVAL", "10"))
+    REVISION_COMPRESS_AFTER_HOURS: float = float(os.getenv("REVISION_COMPRESS_AFTER_HOURS", "24"))
+    REVISION_COMPRESS_INTERVAL: float = float(os.getenv("REVISION_COMPRESS_INTERVAL", "3600"))
+    REVISION_COMPRESS_BATCH_SIZE: int = int(os.getenv("REVISION_COMPRESS_BATCH_SIZE", "500"))
+
+    # Daily activity rollups for the admin dashboard; the settle delay must exceed REPUTATION_FLUSH_INTERVAL
+    ROLLUP_INTERVAL: float = float(os.getenv("ROLLUP_INTERVAL", "300"))
+    ROLLUP_SETTLE_SECONDS: float = float(os.getenv("ROLLUP_SETTLE_SECONDS", "60"))
+
+    # Tag-follow feeds: questions are pushed into capped per-user timelines, except for
+    # tags with at least FEED_POPULAR_TAG_FOLLOWERS followers, which are merged in on read.
+    # A popular tag stays popular until it drops below FEED_POPULAR_TAG_KEEP_FOLLOWERS.
+    FEED_TIMELINE_SIZE: int = int(os.getenv("FEED_TIMELINE_SIZE", "500"))
+    FEED_POPULAR_TAG_FOLLOWERS: int = int(os.getenv("FEED_POPULAR_TAG_FOLLOWERS", "1000"))
+    FEED_POPULAR_TAG_KEEP_FOLLOWERS: int = int(os.getenv("FEED_POPULAR_TAG_KEEP_FOLLOWERS", "800"))
+    FEED_POPULAR_TAGS_TTL: float = float(os.getenv("FEED_POPULAR_TAGS_TTL", "60"))
+    FEED_MAX_FOLLOWED_TAGS: int = int(os.getenv("FEED_MAX_FOLLOWED_TAGS", "100"))
+    FEED_FANOUT_BATCH_SIZE: int = int(os.getenv("FEED_FANOUT_BATCH_SIZE", "1000"))
+    
+    # Admin exports
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
     
     # CORS
     FRONTEND_URL: str = os.getenv("FRONTEND_URL", "http://localhost:5173")
@@ -1,5 +1,6 @@
 from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure
 from .config import settings
 
 class Database:
@@ -9,7 +10,17 @@ class Database:
 db = Database()
 
 async def connect_to_mongo():
-    db.client = AsyncIOMotorClient(settings.MONGODB_URL)
+    if settings.DATABASE_BACKEND == "memory":
+        from .repositories.memory import MemoryClient
+        db.client = MemoryClient()
+        db.db = db.client[settings.DATABASE_NAME]
+        print("Using the in-memory database")
+        return
+    db.client = AsyncIOMotorClient(
+        settings.MONGODB_URL,
+        minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+        maxPoolSize=settings.MONGODB_MAX_POOL_SIZE
+    )
     db.db = db.client[settings.DATABASE_NAME]
     print("Connected to MongoDB")
 
@@ -18,6 +29,42 @@ async def close_mongo_connection():
         db.client.close()
         print("Disconnected from MongoDB")
 
+async def ensure_indexes():
+    # Question search ($text) cannot run without it
+    try:
+        await db.db["questions"].create_index([("title", "text"), ("description", "text")], name="search")
+    except OperationFailure:
+        # A collection holds one text index; keep one created by hand with other fields
+        pass
+    await db.db["questions"].create_index([("hot_score", -1), ("_id", -1)])
+    await db.db["revoked_tokens"].create_index("expires_at", expireAfterSeconds=0)
+    # Serves listing (with or without unread_only), unread counts, mark-all and coalescing lookups
+    await db.db["notifications"].create_index([("recipient_id", 1), ("is_read", 1), ("updated_at", -1), ("_id", -1)])
+    # Unanswered queue, newest or oldest first and per tag; partial so answered questions are not indexed
+    unanswered = {"is_answered": False}
+    await db.db["questions"].create_index([("created_at", -1), ("_id", -1)], name="unanswered_by_age", partialFilterExpression=unanswered)
+    await db.db["questions"].create_index([("tags", 1), ("created_at", -1), ("_id", -1)], name="unanswered_by_tag", partialFilterExpression=unanswered)
+    # Comment buckets are addressed by (parent, seq); comments._id finds one for deletion
+    await db.db["comment_buckets"].create_index([("parent_id", 1), ("seq", 1)], unique=True)
+    await db.db["comment_buckets"].create_index("question_id")
+    await db.db["comment_buckets"].create_index("comments._id")
+    # Revisions are read back from a number to the nearest snapshot; the partial index feeds the compression job
+    await db.db["revisions"].create_index([("parent_id", 1), ("number", -1)], unique=True)
+    await db.db["revisions"].create_index("question_id")
+    await db.db["revisions"].create_index("created_at", name="uncompressed_by_age", partialFilterExpression={"compressed": False})
+    # Daily rollups aggregate each collection by creation time
+    await db.db["users"].create_index("created_at")
+    await db.db["questions"].create_index("created_at")
+    await db.db["answers"].create_index("created_at")
+    await db.db["reputation_ledger"].create_index("created_at", name="cast_by_age", partialFilterExpression={"cast": True})
+    # Fan-out finds the followers of a question's tags; popular tags are merged into feeds by (tags, created_at)
+    await db.db["users"].create_index("followed_tags")
+    # is_answered keeps the key pattern apart from unanswered_by_tag (servers before 5.0 reject two
+    # indexes on the same keys) and lets the index filter unanswered questions without fetching them
+    await db.db["questions"].create_index([("tags", 1), ("created_at", -1), ("_id", -1), ("is_answered", 1)], name="newest_by_tag")
+    # Finds notifications read long enough ago to be purged; unread ones have no read_at
+    await db.db["notifications"].create_index("read_at", sparse=True)
+
 def get_collection(collection_name: str):
     if db.db is None:
         raise RuntimeError("Database not connected")
@@ -1,8 +1,10 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from .database import connect_to_mongo, close_mongo_connection
+from .database import connect_to_mongo, close_mongo_connection, ensure_indexes
 from .config import settings
-from .api import auth, questions, answers, notifications, admin
+from .api import auth, questions, answers, notifications, admin, users, uploads, media, comments, feed
+from .services import reputation, ranking, images, duplicates, related, suggest, invalidation, readiness, revisions, rollups, feeds, notifications as notification_service
+from .auth.jwt import load_revocations
 
 app = FastAPI(
     title="StackIt API",
@@ -23,15 +25,44 @@ app.add_middleware(
 app.include_router(auth.router)
 app.include_router(questions.router)
 app.include_router(answers.router)
+app.include_router(comments.router)
 app.include_router(notifications.router)
 app.include_router(admin.router)
+app.include_router(users.router)
+app.include_router(uploads.router)
+app.include_router(media.router)
+app.include_router(feed.router)
 
 @app.on_event("startup")
 async def startup_event():
     await connect_to_mongo()
+    await ensure_indexes()
+    # Before any cache loads, so the change stream covers writes made while they do
+    await invalidation.mark_start()
+    await load_revocations()
+    await reputation.start()
+    ranking.start()
+    duplicates.start()
+    related.start()
+    suggest.start()
+    revisions.start()
+    rollups.start()
+    feeds.start()
+    notification_service.start()
+    invalidation.start()
+    readiness.start(app)
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await invalidation.stop()
+    await feeds.stop()
+    await notification_service.stop()
+    await rollups.stop()
+    await revisions.stop()
+    await related.stop()
+    await ranking.stop()
+    await reputation.stop()
+    images.shutdown()
     await close_mongo_connection()
 
 @app.get("/")
@@ -44,4 +75,12 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"} 
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/ready")
+async def readiness_check(response: Response):
+    # Unlike /health, only succeeds once warm-up is done and MongoDB answers
+    report = await readiness.report()
+    if not report["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return report 
\ No newline at end of file
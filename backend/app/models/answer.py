@@ -35,6 +35,7 @@ class Answer(AnswerBase):
     author_username: str
     votes: int
     user_votes: dict
+    content_html: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
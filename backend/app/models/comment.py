@@ -0,0 +1,41 @@
+from datetime import datetime
+from typing import List, Optional, Literal
+from pydantic import BaseModel, Field
+from bson import ObjectId
+from .user import PyObjectId
+
+CommentParentType = Literal["question", "answer"]
+
+class CommentBase(BaseModel):
+    content: str = Field(..., min_length=1, max_length=600)
+
+class CommentCreate(CommentBase):
+    pass
+
+class CommentInDB(CommentBase):
+    """One entry of a bucket's ``comments`` array."""
+    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    author_id: PyObjectId
+    author_username: str
+    created_at: datetime = Field(default_factory=datetime.now)
+
+    class Config:
+        populate_by_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+class Comment(CommentBase):
+    id: str
+    parent_type: CommentParentType
+    parent_id: str
+    author_id: str
+    author_username: str
+    created_at: datetime
+
+    class Config:
+        json_encoders = {ObjectId: str}
+
+class CommentPage(BaseModel):
+    comments: List[Comment] = []
+    # Pass back as ?cursor= to load the comments after these; None once there are no more
+    next_cursor: Optional[int] = None
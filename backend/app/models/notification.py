@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, Literal
+from typing import List, Optional, Literal
 from pydantic import BaseModel, Field
 from bson import ObjectId
 from .user import PyObjectId
@@ -14,6 +14,9 @@ class NotificationBase(BaseModel):
     related_question_id: Optional[PyObjectId] = None
     related_answer_id: Optional[PyObjectId] = None
     sender_username: Optional[str] = None
+    # Events folded into this notification, and their latest senders
+    count: int = 1
+    senders: List[str] = []
 
 class NotificationCreate(NotificationBase):
     pass
@@ -21,17 +24,23 @@ class NotificationCreate(NotificationBase):
 class NotificationInDB(NotificationBase):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     is_read: bool = False
+    read_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.now)
+    updated_at: Optional[datetime] = None
 
     class Config:
         populate_by_name = True
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str}
 
+class NotificationIds(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=500)
+
 class Notification(NotificationBase):
     id: str
     is_read: bool
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         json_encoders = {ObjectId: str} 
\ No newline at end of file
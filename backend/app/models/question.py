@@ -25,6 +25,8 @@ class QuestionInDB(QuestionBase):
     user_votes: dict = Field(default_factory=dict, description="Track individual user votes: {user_id: vote_value}")
     views: int = 0
     answers_count: int = 0
+    is_answered: bool = False
+    accepted_answer_id: Optional[PyObjectId] = None
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
 
@@ -42,8 +44,15 @@ class Question(QuestionBase):
     views: int
     answers_count: int
     is_answered: bool
+    accepted_answer_id: Optional[PyObjectId] = None
+    description_html: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
     class Config:
-        json_encoders = {ObjectId: str} 
\ No newline at end of file
+        json_encoders = {ObjectId: str}
+
+class QuestionPage(BaseModel):
+    questions: List[Question]
+    # Pass back as ?cursor= for the next page; None on the last one
+    next_cursor: Optional[str] = None
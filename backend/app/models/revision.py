@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel
+from bson import ObjectId
+
+class RevisionInfo(BaseModel):
+    number: int
+    author_id: str
+    author_username: Optional[str] = None
+    created_at: datetime
+    # Tracked fields this revision changed; every field for the first one
+    changed_fields: List[str] = []
+
+    class Config:
+        json_encoders = {ObjectId: str}
+
+class Revision(RevisionInfo):
+    """A post's tracked fields as they were at one revision."""
+    title: Optional[str] = None
+    description: Optional[str] = None
+    tags: Optional[List[str]] = None
+    content: Optional[str] = None
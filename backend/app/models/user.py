@@ -54,6 +54,9 @@ class UserInDB(UserBase):
     hashed_password: str
     is_active: bool = True
     reputation: int = 0
+    notifications_version: int = 0
+    followed_tags: List[str] = []
+    tokens_valid_after: Optional[float] = None
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
 
@@ -0,0 +1,32 @@
+from typing import List, Optional
+from .base import TimedCursor
+from .posts import PostRepository
+
+class AnswerRepository(PostRepository):
+    def __init__(self):
+        super().__init__("answers")
+
+    def for_question(self, question_id, projection: Optional[dict] = None) -> TimedCursor:
+        return self.find({"question_id": question_id}, projection)
+
+    async def page_shared(self, question_id, skip: int, limit: int) -> List[dict]:
+        """A page of a question's answers, best voted first; concurrent readers share one query."""
+        return await self.find_shared({"question_id": question_id}, sort=[("votes", -1)], skip=skip, limit=limit)
+
+    async def delete_owned(self, answer_id, author_id=None, projection: Optional[dict] = None) -> Optional[dict]:
+        delete_filter = {"_id": answer_id}
+        if author_id is not None:
+            delete_filter["author_id"] = author_id
+        return await self.find_one_and_delete(delete_filter, projection=projection)
+
+    async def recount_per_question(self):
+        """Set ``answers_count`` on every question that has answers from the answers stored for it."""
+        await self.aggregate([
+            {"$group": {"_id": "$question_id", "answers_count": {"$sum": 1}}},
+            {"$merge": {"into": "questions", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}},
+        ], allowDiskUse=True).to_list(length=None)
+
+    async def delete_for_question(self, question_id):
+        await self.delete_many({"question_id": question_id})
+
+answer_repo = AnswerRepository()
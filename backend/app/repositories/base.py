@@ -0,0 +1,207 @@
+import time
+from typing import Dict, List, Optional, Tuple
+from ..database import get_collection
+from ..utils import singleflight
+
+class OperationMetrics:
+    __slots__ = ("collection", "op", "calls", "errors", "total_ms", "max_ms")
+
+    def __init__(self, collection: str, op: str):
+        self.collection = collection
+        self.op = op
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "collection": self.collection,
+            "op": self.op,
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 3),
+        }
+
+_metrics: Dict[Tuple[str, str], OperationMetrics] = {}
+
+def _metrics_for(collection: str, op: str) -> OperationMetrics:
+    metrics = _metrics.get((collection, op))
+    if metrics is None:
+        metrics = _metrics[(collection, op)] = OperationMetrics(collection, op)
+    return metrics
+
+def stats(limit: int = 100) -> List[dict]:
+    """Operations ranked by total time spent in them."""
+    ranked = sorted(_metrics.values(), key=lambda m: m.total_ms, reverse=True)
+    return [m.as_dict() for m in ranked[:limit]]
+
+class TimedCursor:
+    """Wraps a driver cursor so the time spent fetching from it is recorded as one call."""
+
+    def __init__(self, cursor, metrics: OperationMetrics):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._elapsed = 0.0
+        self._started = False
+
+    def _chain(self, method: str, *args, **kwargs) -> "TimedCursor":
+        self._cursor = getattr(self._cursor, method)(*args, **kwargs)
+        return self
+
+    def sort(self, *args, **kwargs):
+        return self._chain("sort", *args, **kwargs)
+
+    def skip(self, *args, **kwargs):
+        return self._chain("skip", *args, **kwargs)
+
+    def limit(self, *args, **kwargs):
+        return self._chain("limit", *args, **kwargs)
+
+    def batch_size(self, *args, **kwargs):
+        return self._chain("batch_size", *args, **kwargs)
+
+    def _record(self, started: float, failed: bool = False):
+        ms = (time.perf_counter() - started) * 1000
+        if not self._started:
+            self._started = True
+            self._metrics.calls += 1
+        if failed:
+            self._metrics.errors += 1
+        self._elapsed += ms
+        self._metrics.total_ms += ms
+        self._metrics.max_ms = max(self._metrics.max_ms, self._elapsed)
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        started = time.perf_counter()
+        try:
+            result = await self._cursor.to_list(length=length)
+        except Exception:
+            self._record(started, failed=True)
+            raise
+        self._record(started)
+        return result
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        started = time.perf_counter()
+        try:
+            document = await self._cursor.__anext__()
+        except StopAsyncIteration:
+            self._record(started)
+            raise
+        except Exception:
+            self._record(started, failed=True)
+            raise
+        self._record(started)
+        return document
+
+class Repository:
+    """Typed access to one collection.
+
+    Every database call of the routers and services goes through a
+    repository, which makes it the place where calls are timed (see
+    ``stats``) and where concurrent identical reads are coalesced. The
+    generic methods keep the driver's names and arguments and are the
+    building blocks of the subclasses, whose named lookups and writes hold
+    the filters, update operators and pipelines; callers outside the
+    repositories use those, or the generic methods without a query shape
+    (``get``, ``has``, ``insert_one``, ``scan``).
+    """
+
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+
+    @property
+    def collection(self):
+        return get_collection(self.collection_name)
+
+    async def _timed(self, op: str, call):
+        metrics = _metrics_for(self.collection_name, op)
+        metrics.calls += 1
+        started = time.perf_counter()
+        try:
+            return await call
+        except Exception:
+            metrics.errors += 1
+            raise
+        finally:
+            ms = (time.perf_counter() - started) * 1000
+            metrics.total_ms += ms
+            metrics.max_ms = max(metrics.max_ms, ms)
+
+    async def find_one(self, filter: dict, projection: Optional[dict] = None, **kwargs) -> Optional[dict]:
+        return await self._timed("find_one", self.collection.find_one(filter, projection, **kwargs))
+
+    async def find_one_shared(self, filter: dict, projection: Optional[dict] = None) -> Optional[dict]:
+        """``find_one`` sharing an identical in-flight read; the result must not be modified."""
+        return await self._timed("find_one_shared", singleflight.find_one_shared(self.collection_name, filter, projection))
+
+    def find(self, filter: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> TimedCursor:
+        return TimedCursor(self.collection.find(filter or {}, projection, **kwargs), _metrics_for(self.collection_name, "find"))
+
+    async def find_shared(self, filter: dict, sort: Optional[list] = None, skip: int = 0, limit: int = 0, projection: Optional[dict] = None) -> List[dict]:
+        """``find`` sharing an identical in-flight read; the results must not be modified."""
+        return await self._timed("find_shared", singleflight.find_shared(self.collection_name, filter, sort, skip, limit, projection))
+
+    def aggregate(self, pipeline: List[dict], **kwargs) -> TimedCursor:
+        return TimedCursor(self.collection.aggregate(pipeline, **kwargs), _metrics_for(self.collection_name, "aggregate"))
+
+    async def count_documents(self, filter: dict, **kwargs) -> int:
+        return await self._timed("count_documents", self.collection.count_documents(filter, **kwargs))
+
+    async def exists(self, filter: dict) -> bool:
+        return bool(await self.count_documents(filter, limit=1))
+
+    async def insert_one(self, document: dict, **kwargs):
+        return await self._timed("insert_one", self.collection.insert_one(document, **kwargs))
+
+    async def insert_many(self, documents: List[dict], **kwargs):
+        return await self._timed("insert_many", self.collection.insert_many(documents, **kwargs))
+
+    async def update_one(self, filter: dict, update, **kwargs):
+        return await self._timed("update_one", self.collection.update_one(filter, update, **kwargs))
+
+    async def update_many(self, filter: dict, update, **kwargs):
+        return await self._timed("update_many", self.collection.update_many(filter, update, **kwargs))
+
+    async def replace_one(self, filter: dict, replacement: dict, **kwargs):
+        return await self._timed("replace_one", self.collection.replace_one(filter, replacement, **kwargs))
+
+    async def find_one_and_update(self, filter: dict, update, **kwargs) -> Optional[dict]:
+        return await self._timed("find_one_and_update", self.collection.find_one_and_update(filter, update, **kwargs))
+
+    async def find_one_and_delete(self, filter: dict, **kwargs) -> Optional[dict]:
+        return await self._timed("find_one_and_delete", self.collection.find_one_and_delete(filter, **kwargs))
+
+    async def delete_one(self, filter: dict, **kwargs):
+        return await self._timed("delete_one", self.collection.delete_one(filter, **kwargs))
+
+    async def delete_many(self, filter: dict, **kwargs):
+        return await self._timed("delete_many", self.collection.delete_many(filter, **kwargs))
+
+    async def bulk_write(self, requests: list, **kwargs):
+        return await self._timed("bulk_write", self.collection.bulk_write(requests, **kwargs))
+
+    async def get(self, document_id, projection: Optional[dict] = None) -> Optional[dict]:
+        return await self.find_one({"_id": document_id}, projection)
+
+    async def has(self, document_id) -> bool:
+        return await self.exists({"_id": document_id})
+
+    async def insert_if_missing(self, document: dict):
+        """Insert ``document`` unless one with its ``_id`` exists, which is then left as it is."""
+        fields = {k: v for k, v in document.items() if k != "_id"}
+        await self.update_one({"_id": document["_id"]}, {"$setOnInsert": fields}, upsert=True)
+
+    async def count_all(self) -> int:
+        return await self.count_documents({})
+
+    def scan(self, projection: Optional[dict] = None, batch_size: int = 1000, after_id=None) -> TimedCursor:
+        """Every document in ``_id`` order, resuming after ``after_id`` if given."""
+        scan_filter = {"_id": {"$gt": after_id}} if after_id is not None else {}
+        return self.find(scan_filter, projection).sort("_id", 1).batch_size(batch_size)
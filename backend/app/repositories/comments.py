@@ -0,0 +1,59 @@
+from typing import List, Optional
+from pymongo.errors import DuplicateKeyError
+from .base import Repository, TimedCursor
+
+class CommentBucketRepository(Repository):
+    """Comments stored ``BUCKET_SIZE`` to a document per parent, addressed by ``(parent_id, seq)``."""
+
+    def __init__(self):
+        super().__init__("comment_buckets")
+
+    async def append(self, parent_type: str, parent_id, question_id, seq: int, comment: dict):
+        """Push ``comment`` into bucket ``seq`` of ``parent_id``, opening the bucket if needed."""
+        bucket_filter = {"parent_id": parent_id, "seq": seq}
+        update = {
+            "$push": {"comments": comment},
+            "$inc": {"size": 1, "count": 1},
+            "$setOnInsert": {"parent_type": parent_type, "question_id": question_id},
+        }
+        try:
+            await self.update_one(bucket_filter, update, upsert=True)
+        except DuplicateKeyError:
+            # Another comment opened the same bucket at the same moment
+            await self.update_one(bucket_filter, update)
+
+    def first_buckets(self, parent_ids: List, limit: int) -> TimedCursor:
+        """The first bucket of every parent, with only its first ``limit`` comments."""
+        return self.find(
+            {"parent_id": {"$in": parent_ids}, "seq": 0},
+            {"parent_id": 1, "seq": 1, "size": 1, "comments": {"$slice": limit}}
+        )
+
+    def buckets_from(self, parent_id, seq: int, limit: int) -> TimedCursor:
+        return self.find({"parent_id": parent_id, "seq": {"$gte": seq}}).sort("seq", 1).limit(limit)
+
+    async def tombstone(self, comment_id, author_id=None) -> bool:
+        """Mark a live comment deleted and drop its content, only if ``author_id`` wrote it unless that is ``None``."""
+        match = {"_id": comment_id, "deleted": {"$ne": True}}
+        if author_id is not None:
+            match["author_id"] = author_id
+        result = await self.update_one(
+            {"comments": {"$elemMatch": match}},
+            {
+                "$set": {"comments.$.deleted": True},
+                "$unset": {"comments.$.content": ""},
+                "$inc": {"count": -1},
+            }
+        )
+        return result.modified_count == 1
+
+    async def has_live(self, comment_id) -> bool:
+        return await self.exists({"comments": {"$elemMatch": {"_id": comment_id, "deleted": {"$ne": True}}}})
+
+    async def delete_for_question(self, question_id):
+        await self.delete_many({"question_id": question_id})
+
+    async def delete_for_parent(self, parent_id):
+        await self.delete_many({"parent_id": parent_id})
+
+comment_bucket_repo = CommentBucketRepository()
@@ -0,0 +1,70 @@
+from typing import Dict, Iterable, List, Optional, Set
+from pymongo import ReturnDocument, UpdateOne
+from .base import Repository
+
+def _push(entries: List[dict], size: int) -> dict:
+    return {"$push": {"entries": {"$each": entries, "$sort": {"created_at": -1}, "$slice": size}}}
+
+class TimelineRepository(Repository):
+    """One document per user (``_id`` is the user's id) holding the newest
+    questions fanned out to them, as ``entries`` sorted newest first."""
+
+    def __init__(self):
+        super().__init__("timelines")
+
+    async def entries(self, user_id) -> List[dict]:
+        timeline = await self.get(user_id, {"entries": 1})
+        return timeline["entries"] if timeline else []
+
+    async def question_ids(self, user_ids: List) -> Dict[object, Set]:
+        """The questions already in each of the users' timelines."""
+        cursor = self.find({"_id": {"$in": user_ids}}, {"entries.question_id": 1})
+        return {t["_id"]: {e["question_id"] for e in t.get("entries", [])} async for t in cursor}
+
+    async def push(self, user_ids: Iterable, entries: List[dict], size: int):
+        """Add ``entries`` to each user's timeline, keeping only its ``size`` newest."""
+        await self.bulk_write([UpdateOne({"_id": user_id}, _push(entries, size), upsert=True) for user_id in user_ids], ordered=False)
+
+    async def push_each(self, entries_by_user: Dict[object, List[dict]], size: int):
+        """``push`` with different entries for each user."""
+        requests = [
+            UpdateOne({"_id": user_id}, _push(entries, size), upsert=True)
+            for user_id, entries in entries_by_user.items() if entries
+        ]
+        if requests:
+            await self.bulk_write(requests, ordered=False)
+
+class TagFollowerRepository(Repository):
+    """Follower count per tag (``_id`` is the tag), which decides how questions reach followers."""
+
+    def __init__(self):
+        super().__init__("tag_followers")
+
+    async def adjust(self, tag: str, delta: int, popular_at: int, keep_at: int) -> Optional[bool]:
+        """Move the tag's follower count by ``delta`` and keep its ``popular`` flag in line.
+
+        A tag turns popular at ``popular_at`` followers and stays popular
+        until it drops below ``keep_at``. Returns the new flag if this call
+        changed it, else ``None``.
+        """
+        before = await self.find_one_and_update(
+            {"_id": tag},
+            {"$inc": {"followers": delta}},
+            projection={"followers": 1, "popular": 1},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        ) or {}
+        # Counts stored before the flag existed were popular by the plain threshold
+        was_popular = before.get("popular", before.get("followers", 0) >= popular_at)
+        followers = before.get("followers", 0) + delta
+        popular = followers >= (keep_at if was_popular else popular_at)
+        if popular != was_popular or "popular" not in before:
+            await self.update_one({"_id": tag}, {"$set": {"popular": popular}})
+        return popular if popular != was_popular else None
+
+    async def popular(self, popular_at: int) -> Set[str]:
+        flagged = {"$or": [{"popular": True}, {"popular": {"$exists": False}, "followers": {"$gte": popular_at}}]}
+        return {t["_id"] async for t in self.find(flagged, {"_id": 1})}
+
+timeline_repo = TimelineRepository()
+tag_follower_repo = TagFollowerRepository()
@@ -0,0 +1,30 @@
+from typing import List
+from .base import Repository
+
+class LedgerRepository(Repository):
+    """The ``reputation_ledger`` journal: one entry per reputation change, written by ``services.reputation``.
+
+    Entries of votes that were cast (rather than removed or flipped) carry
+    ``cast: True`` and are kept even when they earn nothing, like
+    self-votes; the daily activity rollups count them.
+    """
+
+    # Entries the activity rollups count as votes
+    CAST = {"cast": True}
+
+    def __init__(self):
+        super().__init__("reputation_ledger")
+
+    async def record(self, entries: List[dict]):
+        await self.insert_many(entries, ordered=False)
+
+    async def clear(self):
+        """Empty the journal before ``reputation.rebuild`` writes its totals back.
+
+        Cast votes stay for the rollups, with their points zeroed since the
+        rebuilt totals include them.
+        """
+        await self.delete_many({"cast": {"$ne": True}})
+        await self.update_many({"cast": True, "delta": {"$ne": 0}}, {"$set": {"delta": 0}})
+
+ledger_repo = LedgerRepository()
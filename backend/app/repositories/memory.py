@@ -0,0 +1,1400 @@
+"""In-memory stand-in for the Motor client, selected with ``DATABASE_BACKEND=memory``.
+
+It implements the subset of the collection API this application uses (query
+and update operators, update pipelines, the aggregation stages and
+expressions found in the services) with MongoDB's matching, ordering and
+projection rules, so the repositories run unchanged against it. Every
+operation completes without yielding to the event loop, which makes single
+document writes atomic just as they are on a server. Data lives in the
+process and is gone on restart; change streams are reported as unsupported,
+so the invalidation bus disables itself. ``tests/test_repositories.py`` runs
+the repository methods against it and against a real server
+(``TEST_MONGODB_URL``) with the same assertions.
+"""
+import copy
+import datetime
+import functools
+import math
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+class _Missing:
+    def __repr__(self):
+        return "MISSING"
+
+MISSING = _Missing()
+
+# --- Values and ordering -------------------------------------------------
+
+def to_bson(value):
+    """A copy of ``value`` as the server would store it: dates keep millisecond precision only."""
+    if isinstance(value, datetime.datetime):
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    if isinstance(value, dict):
+        return {key: to_bson(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_bson(item) for item in value]
+    return copy.deepcopy(value)
+
+def _type_rank(value) -> int:
+    # BSON comparison order across types
+    if value is None or value is MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, list):
+        return 5
+    if isinstance(value, bytes):
+        return 6
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime.datetime):
+        return 9
+    return 10
+
+def compare(a, b) -> int:
+    rank_a, rank_b = _type_rank(a), _type_rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if rank_a == 1:
+        return 0
+    if rank_a == 4:
+        a, b = list(a.items()), list(b.items())
+    if rank_a in (4, 5):
+        for x, y in zip(a, b):
+            if isinstance(x, tuple):
+                result = compare(x[0], y[0]) or compare(x[1], y[1])
+            else:
+                result = compare(x, y)
+            if result:
+                return result
+        return (len(a) > len(b)) - (len(a) < len(b))
+    return (a > b) - (a < b)
+
+def equals(a, b) -> bool:
+    if _type_rank(a) != _type_rank(b):
+        return False
+    return compare(a, b) == 0
+
+_sort_key = functools.cmp_to_key(compare)
+
+# --- Paths ------------------------------------------------------------------
+
+def _resolve(value, parts: List[str]) -> list:
+    """Every value reached by a dotted path, descending into arrays of documents."""
+    if not parts:
+        return [value]
+    head, rest = parts[0], parts[1:]
+    if isinstance(value, dict):
+        return _resolve(value[head], rest) if head in value else []
+    if isinstance(value, list):
+        if head.isdigit():
+            index = int(head)
+            return _resolve(value[index], rest) if index < len(value) else []
+        found = []
+        for item in value:
+            if isinstance(item, dict):
+                found.extend(_resolve(item, parts))
+        return found
+    return []
+
+def _candidates(doc: dict, path: str) -> list:
+    """Values a query condition on ``path`` is tested against: each value, and the elements of arrays."""
+    out = []
+    for value in _resolve(doc, path.split(".")):
+        out.append(value)
+        if isinstance(value, list):
+            out.extend(value)
+    return out
+
+def get_path(doc: dict, path: str, default=MISSING):
+    current = doc
+    for part in path.split("."):
+        if isinstance(current, dict) and part in current:
+            current = current[part]
+        elif isinstance(current, list) and part.isdigit() and int(part) < len(current):
+            current = current[int(part)]
+        else:
+            return default
+    return current
+
+def set_path(doc: dict, path: str, value):
+    parts = path.split(".")
+    current = doc
+    for part in parts[:-1]:
+        if isinstance(current, list):
+            current = current[int(part)]
+            continue
+        if not isinstance(current.get(part), (dict, list)):
+            current[part] = {}
+        current = current[part]
+    if isinstance(current, list):
+        index = int(parts[-1])
+        while len(current) <= index:
+            current.append(None)
+        current[index] = value
+    elif value is MISSING:
+        current.pop(parts[-1], None)
+    else:
+        current[parts[-1]] = value
+
+def unset_path(doc: dict, path: str):
+    parts = path.split(".")
+    current = doc
+    for part in parts[:-1]:
+        current = current.get(part) if isinstance(current, dict) else (current[int(part)] if isinstance(current, list) and part.isdigit() and int(part) < len(current) else None)
+        if current is None:
+            return
+    if isinstance(current, dict):
+        current.pop(parts[-1], None)
+    elif isinstance(current, list) and parts[-1].isdigit() and int(parts[-1]) < len(current):
+        current[int(parts[-1])] = None
+
+# --- Queries ----------------------------------------------------------------
+
+def _is_operator_dict(value) -> bool:
+    return isinstance(value, dict) and bool(value) and all(k.startswith("$") for k in value)
+
+def _equals_any(values: list, target) -> bool:
+    if target is None:
+        return not values or any(v is None for v in values)
+    return any(equals(v, target) for v in values)
+
+def _compare_any(values: list, target, test) -> bool:
+    return any(_type_rank(v) == _type_rank(target) and test(compare(v, target)) for v in values)
+
+def _regex(pattern, options: str = ""):
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    flags = 0
+    for option, flag in (("i", re.IGNORECASE), ("m", re.MULTILINE), ("s", re.DOTALL), ("x", re.VERBOSE)):
+        if option in options:
+            flags |= flag
+    return re.compile(pattern, flags)
+
+def _match_operators(doc: dict, path: str, ops: dict) -> bool:
+    values = _candidates(doc, path)
+    for op, arg in ops.items():
+        if op == "$eq":
+            ok = _equals_any(values, arg)
+        elif op == "$ne":
+            ok = not _equals_any(values, arg)
+        elif op == "$gt":
+            ok = _compare_any(values, arg, lambda c: c > 0)
+        elif op == "$gte":
+            ok = _compare_any(values, arg, lambda c: c >= 0)
+        elif op == "$lt":
+            ok = _compare_any(values, arg, lambda c: c < 0)
+        elif op == "$lte":
+            ok = _compare_any(values, arg, lambda c: c <= 0)
+        elif op == "$in":
+            ok = any(_regex(t).search(v) for t in arg if isinstance(t, re.Pattern) for v in values if isinstance(v, str)) or \
+                any(_equals_any(values, t) for t in arg if not isinstance(t, re.Pattern))
+        elif op == "$nin":
+            ok = not any(_equals_any(values, t) for t in arg)
+        elif op == "$exists":
+            ok = bool(_resolve(doc, path.split("."))) == bool(arg)
+        elif op == "$regex":
+            pattern = _regex(arg, ops.get("$options", ""))
+            ok = any(isinstance(v, str) and pattern.search(v) for v in values)
+        elif op == "$options":
+            continue
+        elif op == "$size":
+            ok = any(isinstance(v, list) and len(v) == arg for v in _resolve(doc, path.split(".")))
+        elif op == "$all":
+            ok = all(_equals_any(values, t) for t in arg)
+        elif op == "$elemMatch":
+            ok = any(
+                isinstance(v, list) and any(_element_matches(item, arg) for item in v)
+                for v in _resolve(doc, path.split("."))
+            )
+        elif op == "$not":
+            ok = not (_match_operators(doc, path, arg) if isinstance(arg, dict) else _match_operators(doc, path, {"$regex": arg}))
+        elif op == "$type":
+            names = {"string": 3, "object": 4, "array": 5, "objectId": 7, "bool": 8, "date": 9, "null": 1}
+            wanted = arg if isinstance(arg, list) else [arg]
+            ok = any(_type_rank(v) == names.get(t) for t in wanted for v in values)
+        else:
+            raise OperationFailure(f"unknown operator: {op}")
+        if not ok:
+            return False
+    return True
+
+def _element_matches(item, condition: dict) -> bool:
+    if _is_operator_dict(condition):
+        return _match_operators({"v": item}, "v", condition)
+    return isinstance(item, dict) and matches(item, condition)
+
+def _text_matches(doc: dict, search: str, fields: Optional[List[str]]) -> bool:
+    terms = [t.lower() for t in re.findall(r"\w+", search)]
+    if not terms:
+        return False
+    text = []
+    for field in fields or [k for k, v in doc.items() if isinstance(v, str)]:
+        for value in _candidates(doc, field):
+            if isinstance(value, str):
+                text.append(value.lower())
+    words = set(re.findall(r"\w+", " ".join(text)))
+    return any(term in words for term in terms)
+
+def _require_text_index(query: Optional[dict], text_fields: Optional[List[str]]):
+    if query and "$text" in query and text_fields is None:
+        raise OperationFailure("text index required for $text query", 27)
+
+def matches(doc: dict, query: Optional[dict], text_fields: Optional[List[str]] = None) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            ok = all(matches(doc, q, text_fields) for q in condition)
+        elif key == "$or":
+            ok = any(matches(doc, q, text_fields) for q in condition)
+        elif key == "$nor":
+            ok = not any(matches(doc, q, text_fields) for q in condition)
+        elif key == "$expr":
+            ok = _truthy(evaluate(condition, doc))
+        elif key == "$text":
+            ok = _text_matches(doc, condition["$search"], text_fields)
+        elif isinstance(condition, re.Pattern):
+            ok = any(isinstance(v, str) and condition.search(v) for v in _candidates(doc, key))
+        elif _is_operator_dict(condition):
+            ok = _match_operators(doc, key, condition)
+        else:
+            ok = _equals_any(_candidates(doc, key), condition)
+        if not ok:
+            return False
+    return True
+
+# --- Projection -------------------------------------------------------------
+
+def _slice(values: list, spec):
+    if isinstance(spec, list):
+        skip, limit = spec
+        if skip < 0:
+            skip = max(len(values) + skip, 0)
+        return values[skip:skip + limit]
+    return values[:spec] if spec >= 0 else values[spec:]
+
+def _include(source: dict, target: dict, parts: List[str]):
+    head = parts[0]
+    if head not in source:
+        return
+    if len(parts) == 1:
+        target[head] = copy.deepcopy(source[head])
+    elif isinstance(source[head], dict):
+        _include(source[head], target.setdefault(head, {}), parts[1:])
+    elif isinstance(source[head], list):
+        # A path into an array projects each embedded document; other elements are dropped
+        elements = [e for e in source[head] if isinstance(e, dict)]
+        projected = target.setdefault(head, [{} for _ in elements])
+        for element, into in zip(elements, projected):
+            _include(element, into, parts[1:])
+
+def project(doc: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return copy.deepcopy(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    slices = {k: v["$slice"] for k, v in projection.items() if isinstance(v, dict) and "$slice" in v}
+    fields = {k: v for k, v in projection.items() if k not in slices}
+    inclusive = any(v and k != "_id" for k, v in fields.items())
+    if inclusive:
+        result = {}
+        if fields.get("_id", 1) and "_id" in doc:
+            result["_id"] = copy.deepcopy(doc["_id"])
+        for path, flag in fields.items():
+            if flag and path != "_id":
+                _include(doc, result, path.split("."))
+        for path in slices:
+            _include(doc, result, path.split("."))
+    else:
+        result = copy.deepcopy(doc)
+        for path, flag in fields.items():
+            if not flag:
+                unset_path(result, path)
+    for path, spec in slices.items():
+        value = get_path(result, path)
+        if isinstance(value, list):
+            set_path(result, path, _slice(value, spec))
+    return result
+
+# --- Sorting ----------------------------------------------------------------
+
+def normalize_sort(key_or_list, direction=None) -> List[Tuple[str, int]]:
+    if key_or_list is None:
+        return []
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [tuple(item) for item in key_or_list]
+
+def _sort_value(doc: dict, path: str, direction: int):
+    values = _resolve(doc, path.split("."))
+    if not values:
+        return None
+    value = values[0] if len(values) == 1 else values
+    if isinstance(value, list):
+        if not value:
+            return None
+        return (min if direction > 0 else max)(value, key=_sort_key)
+    return value
+
+def sort_documents(docs: List[dict], spec: List[Tuple[str, int]]) -> List[dict]:
+    for path, direction in reversed(spec):
+        if isinstance(direction, dict):
+            # {"$meta": "textScore"} has no meaning here
+            continue
+        docs = sorted(docs, key=lambda d: _sort_key(_sort_value(d, path, direction)), reverse=direction < 0)
+    return docs
+
+# --- Aggregation expressions -------------------------------------------------
+
+def _truthy(value) -> bool:
+    return value not in (None, False, 0, MISSING) and value is not MISSING
+
+def _number(value):
+    return 0 if value is None or value is MISSING else value
+
+def _field(doc, path: str):
+    value = get_path(doc, path) if isinstance(doc, (dict, list)) else MISSING
+    if value is MISSING and "." in path:
+        # Paths through arrays of documents give the array of values
+        found = _resolve(doc, path.split(".")) if isinstance(doc, dict) else []
+        first = path.split(".")[0]
+        if isinstance(doc, dict) and isinstance(doc.get(first), list):
+            return found
+    return value
+
+def _add(values):
+    total, date = 0, None
+    for value in values:
+        if value is None or value is MISSING:
+            return None
+        if isinstance(value, datetime.datetime):
+            date = value
+        else:
+            total += value
+    return date + datetime.timedelta(milliseconds=total) if date else total
+
+def _subtract(a, b):
+    if a is None or b is None or a is MISSING or b is MISSING:
+        return None
+    if isinstance(a, datetime.datetime) and isinstance(b, datetime.datetime):
+        return int((a - b) / datetime.timedelta(milliseconds=1))
+    if isinstance(a, datetime.datetime):
+        return a - datetime.timedelta(milliseconds=b)
+    return a - b
+
+def _to_string(value):
+    if value is None or value is MISSING:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}Z"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+_DATE_UNITS = {
+    "year": lambda d: d.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0),
+    "month": lambda d: d.replace(day=1, hour=0, minute=0, second=0, microsecond=0),
+    "week": lambda d: (d - datetime.timedelta(days=(d.weekday() + 1) % 7)).replace(hour=0, minute=0, second=0, microsecond=0),
+    "day": lambda d: d.replace(hour=0, minute=0, second=0, microsecond=0),
+    "hour": lambda d: d.replace(minute=0, second=0, microsecond=0),
+    "minute": lambda d: d.replace(second=0, microsecond=0),
+}
+
+def _date_to_string(date, fmt: str):
+    if date is None or date is MISSING:
+        return None
+    for token, value in (("%Y", f"{date.year:04d}"), ("%m", f"{date.month:02d}"), ("%d", f"{date.day:02d}"),
+                         ("%H", f"{date.hour:02d}"), ("%M", f"{date.minute:02d}"), ("%S", f"{date.second:02d}"),
+                         ("%L", f"{date.microsecond // 1000:03d}")):
+        fmt = fmt.replace(token, value)
+    return fmt
+
+def evaluate(expr, doc, variables: Optional[dict] = None):
+    variables = variables or {}
+    if isinstance(expr, str):
+        if expr.startswith("$$"):
+            name, _, path = expr[2:].partition(".")
+            if name == "ROOT":
+                base = doc
+            elif name == "NOW":
+                base = variables.get("NOW") or datetime.datetime.now()
+            elif name == "REMOVE":
+                return MISSING
+            else:
+                base = variables.get(name, MISSING)
+            return _field(base, path) if path else base
+        if expr.startswith("$"):
+            return _field(doc, expr[1:])
+        return expr
+    if isinstance(expr, list):
+        return [evaluate(e, doc, variables) for e in expr]
+    if isinstance(expr, dict):
+        if len(expr) == 1:
+            op, arg = next(iter(expr.items()))
+            if op.startswith("$"):
+                return _operator(op, arg, doc, variables)
+        return {k: evaluate(v, doc, variables) for k, v in expr.items()}
+    return expr
+
+def _args(arg, doc, variables) -> list:
+    if isinstance(arg, list):
+        return [evaluate(a, doc, variables) for a in arg]
+    return [evaluate(arg, doc, variables)]
+
+def _operator(op: str, arg, doc, variables):
+    ev = lambda e: evaluate(e, doc, variables)
+    if op == "$literal":
+        return arg
+    if op == "$ifNull":
+        values = _args(arg, doc, variables)
+        for value in values[:-1]:
+            if value is not None and value is not MISSING:
+                return value
+        return values[-1]
+    if op == "$cond":
+        if isinstance(arg, dict):
+            condition, then, otherwise = arg["if"], arg["then"], arg["else"]
+        else:
+            condition, then, otherwise = arg
+        return ev(then) if _truthy(ev(condition)) else ev(otherwise)
+    if op == "$switch":
+        for branch in arg["branches"]:
+            if _truthy(ev(branch["case"])):
+                return ev(branch["then"])
+        return ev(arg.get("default"))
+    if op == "$and":
+        return all(_truthy(v) for v in _args(arg, doc, variables))
+    if op == "$or":
+        return any(_truthy(v) for v in _args(arg, doc, variables))
+    if op == "$not":
+        return not _truthy(_args(arg, doc, variables)[0])
+    if op in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$cmp"):
+        a, b = (None if v is MISSING else v for v in _args(arg, doc, variables))
+        result = compare(a, b)
+        return {
+            "$eq": result == 0, "$ne": result != 0, "$gt": result > 0, "$gte": result >= 0,
+            "$lt": result < 0, "$lte": result <= 0, "$cmp": result,
+        }[op]
+    if op == "$add":
+        return _add(_args(arg, doc, variables))
+    if op == "$subtract":
+        return _subtract(*_args(arg, doc, variables))
+    if op == "$multiply":
+        values = _args(arg, doc, variables)
+        if any(v is None or v is MISSING for v in values):
+            return None
+        return math.prod(values)
+    if op == "$divide":
+        a, b = _args(arg, doc, variables)
+        return None if a is None or b is None else a / b
+    if op == "$mod":
+        a, b = _args(arg, doc, variables)
+        return None if a is None or b is None else math.fmod(a, b)
+    if op == "$pow":
+        a, b = _args(arg, doc, variables)
+        return None if a is None or b is None else a ** b
+    if op in ("$log10", "$ln", "$exp", "$sqrt", "$abs", "$floor", "$ceil", "$trunc"):
+        value = _args(arg, doc, variables)[0]
+        if value is None or value is MISSING:
+            return None
+        return {
+            "$log10": math.log10, "$ln": math.log, "$exp": math.exp, "$sqrt": math.sqrt,
+            "$abs": abs, "$floor": math.floor, "$ceil": math.ceil, "$trunc": math.trunc,
+        }[op](value)
+    if op == "$round":
+        values = _args(arg, doc, variables)
+        return None if values[0] is None else round(values[0], values[1] if len(values) > 1 else 0)
+    if op in ("$max", "$min", "$sum", "$avg"):
+        values = _args(arg, doc, variables)
+        if len(values) == 1 and isinstance(values[0], list):
+            values = values[0]
+        present = [v for v in values if v is not None and v is not MISSING]
+        if op == "$sum":
+            return sum(v for v in present if isinstance(v, (int, float)) and not isinstance(v, bool))
+        if op == "$avg":
+            numbers = [v for v in present if isinstance(v, (int, float))]
+            return sum(numbers) / len(numbers) if numbers else None
+        if not present:
+            return None
+        return (max if op == "$max" else min)(present, key=_sort_key)
+    if op == "$in":
+        value, array = _args(arg, doc, variables)
+        return any(equals(value, item) for item in array or [])
+    if op == "$size":
+        value = _args(arg, doc, variables)[0]
+        return len(value) if isinstance(value, list) else None
+    if op == "$isArray":
+        return isinstance(_args(arg, doc, variables)[0], list)
+    if op == "$arrayElemAt":
+        array, index = _args(arg, doc, variables)
+        if not isinstance(array, list) or not -len(array) <= index < len(array):
+            return MISSING
+        return array[index]
+    if op in ("$first", "$last"):
+        array = _args(arg, doc, variables)[0]
+        if not isinstance(array, list) or not array:
+            return MISSING
+        return array[0] if op == "$first" else array[-1]
+    if op == "$slice":
+        values = _args(arg, doc, variables)
+        if values[0] is None or values[0] is MISSING:
+            return None
+        return _slice(values[0], values[1] if len(values) == 2 else values[1:])
+    if op == "$concatArrays":
+        values = _args(arg, doc, variables)
+        if any(v is None or v is MISSING for v in values):
+            return None
+        return [item for value in values for item in value]
+    if op in ("$setUnion", "$setIntersection", "$setDifference"):
+        values = _args(arg, doc, variables)
+        result: list = []
+        if op == "$setUnion":
+            for value in values:
+                for item in value or []:
+                    if not any(equals(item, r) for r in result):
+                        result.append(item)
+        elif op == "$setIntersection":
+            for item in values[0] or []:
+                if all(any(equals(item, o) for o in other or []) for other in values[1:]) and not any(equals(item, r) for r in result):
+                    result.append(item)
+        else:
+            for item in values[0] or []:
+                if not any(equals(item, o) for o in values[1] or []) and not any(equals(item, r) for r in result):
+                    result.append(item)
+        return result
+    if op == "$filter":
+        array = ev(arg["input"])
+        if array is None or array is MISSING:
+            return None
+        name = arg.get("as", "this")
+        limit = arg.get("limit")
+        out = [item for item in array if _truthy(evaluate(arg["cond"], doc, {**variables, name: item}))]
+        return out[:ev(limit)] if limit is not None else out
+    if op == "$map":
+        array = ev(arg["input"])
+        if array is None or array is MISSING:
+            return None
+        name = arg.get("as", "this")
+        return [evaluate(arg["in"], doc, {**variables, name: item}) for item in array]
+    if op == "$reduce":
+        array = ev(arg["input"])
+        if array is None or array is MISSING:
+            return None
+        value = ev(arg["initialValue"])
+        for item in array:
+            value = evaluate(arg["in"], doc, {**variables, "value": value, "this": item})
+        return value
+    if op == "$objectToArray":
+        value = _args(arg, doc, variables)[0]
+        if value is None or value is MISSING:
+            return None
+        return [{"k": k, "v": v} for k, v in value.items()]
+    if op == "$arrayToObject":
+        value = _args(arg, doc, variables)[0]
+        if value is None or value is MISSING:
+            return None
+        out = {}
+        for item in value:
+            if isinstance(item, dict):
+                out[item["k"]] = item["v"]
+            else:
+                out[item[0]] = item[1]
+        return out
+    if op == "$mergeObjects":
+        values = _args(arg, doc, variables)
+        if len(values) == 1 and isinstance(values[0], list):
+            values = values[0]
+        out = {}
+        for value in values:
+            if isinstance(value, dict):
+                out.update(value)
+        return out
+    if op == "$toString":
+        return _to_string(_args(arg, doc, variables)[0])
+    if op == "$toObjectId":
+        value = _args(arg, doc, variables)[0]
+        if value is None or value is MISSING or isinstance(value, ObjectId):
+            return None if value is MISSING else value
+        try:
+            return ObjectId(value)
+        except Exception:
+            raise OperationFailure(f"Failed to parse objectId '{value}' in $convert with no onError value", 241)
+    if op == "$toLower":
+        value = _args(arg, doc, variables)[0]
+        return "" if value is None or value is MISSING else str(value).lower()
+    if op == "$toUpper":
+        value = _args(arg, doc, variables)[0]
+        return "" if value is None or value is MISSING else str(value).upper()
+    if op == "$concat":
+        values = _args(arg, doc, variables)
+        return None if any(v is None or v is MISSING for v in values) else "".join(values)
+    if op == "$strLenCP":
+        return len(_args(arg, doc, variables)[0])
+    if op == "$toInt":
+        value = _args(arg, doc, variables)[0]
+        return None if value is None or value is MISSING else int(value)
+    if op == "$toDouble":
+        value = _args(arg, doc, variables)[0]
+        return None if value is None or value is MISSING else float(value)
+    if op == "$toBool":
+        return _truthy(_args(arg, doc, variables)[0])
+    if op == "$type":
+        value = _args(arg, doc, variables)[0]
+        if value is MISSING:
+            return "missing"
+        return {1: "null", 2: "double" if isinstance(value, float) else "int", 3: "string", 4: "object", 5: "array",
+                6: "binData", 7: "objectId", 8: "bool", 9: "date"}.get(_type_rank(value), "unknown")
+    if op == "$dateTrunc":
+        date = ev(arg["date"])
+        if date is None or date is MISSING:
+            return None
+        return _DATE_UNITS[arg["unit"]](date)
+    if op == "$dateToString":
+        return _date_to_string(ev(arg["date"]), arg.get("format", "%Y-%m-%dT%H:%M:%S.%LZ"))
+    if op == "$dateFromString":
+        value = ev(arg["dateString"])
+        return None if value is None else datetime.datetime.fromisoformat(value.rstrip("Z"))
+    if op in ("$year", "$month", "$dayOfMonth", "$hour", "$minute", "$second"):
+        date = _args(arg, doc, variables)[0]
+        if date is None or date is MISSING:
+            return None
+        return getattr(date, {"$year": "year", "$month": "month", "$dayOfMonth": "day", "$hour": "hour", "$minute": "minute", "$second": "second"}[op])
+    if op == "$let":
+        bound = {name: ev(value) for name, value in arg["vars"].items()}
+        return evaluate(arg["in"], doc, {**variables, **bound})
+    raise OperationFailure(f"Unrecognized expression '{op}'")
+
+# --- Updates ----------------------------------------------------------------
+
+def _positional_index(doc: dict, array_path: str, query: dict) -> int:
+    array = get_path(doc, array_path)
+    if not isinstance(array, list):
+        raise OperationFailure("The positional operator did not find the match needed from the query.")
+    for index, item in enumerate(array):
+        ok = True
+        for key, condition in query.items():
+            if key == array_path and isinstance(condition, dict) and "$elemMatch" in condition:
+                ok = _element_matches(item, condition["$elemMatch"])
+            elif key.startswith(array_path + "."):
+                ok = matches(item, {key[len(array_path) + 1:]: condition}) if isinstance(item, dict) else False
+            elif key == array_path:
+                ok = matches({"v": item}, {"v": condition})
+            else:
+                continue
+            if not ok:
+                break
+        if ok:
+            return index
+    raise OperationFailure("The positional operator did not find the match needed from the query.")
+
+def _expand_positional(doc: dict, path: str, query: dict) -> str:
+    if ".$" not in path:
+        return path
+    prefix, _, rest = path.partition(".$")
+    index = _positional_index(doc, prefix, query)
+    return f"{prefix}.{index}{rest}"
+
+def _apply_pipeline(doc: dict, pipeline: List[dict]) -> dict:
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name in ("$set", "$addFields"):
+            values = {path: evaluate(expr, doc) for path, expr in spec.items()}
+            for path, value in values.items():
+                if value is MISSING:
+                    unset_path(doc, path)
+                else:
+                    set_path(doc, path, copy.deepcopy(value))
+        elif name in ("$unset",):
+            for path in [spec] if isinstance(spec, str) else spec:
+                unset_path(doc, path)
+        elif name in ("$replaceRoot", "$replaceWith"):
+            new_root = evaluate(spec["newRoot"] if name == "$replaceRoot" else spec, doc)
+            document_id = doc.get("_id")
+            doc = copy.deepcopy(new_root)
+            if "_id" not in doc and document_id is not None:
+                doc["_id"] = document_id
+        elif name == "$project":
+            doc = _project_stage(doc, spec)
+        else:
+            raise OperationFailure(f"{name} is not allowed in an update pipeline")
+    return doc
+
+def apply_update(doc: dict, update, query: dict, inserting: bool) -> dict:
+    if isinstance(update, list):
+        return _apply_pipeline(doc, update)
+    # The positional $ refers to the element the filter matched before any operator ran
+    matched = copy.deepcopy(doc)
+    for op, fields in update.items():
+        if op == "$setOnInsert" and not inserting:
+            continue
+        for raw_path, value in fields.items():
+            path = _expand_positional(matched, raw_path, query)
+            if op in ("$set", "$setOnInsert"):
+                set_path(doc, path, copy.deepcopy(value))
+            elif op == "$unset":
+                unset_path(doc, path)
+            elif op == "$inc":
+                set_path(doc, path, _number(get_path(doc, path, 0)) + value)
+            elif op == "$mul":
+                set_path(doc, path, _number(get_path(doc, path, 0)) * value)
+            elif op in ("$min", "$max"):
+                current = get_path(doc, path)
+                if current is MISSING or (compare(value, current) < 0 if op == "$min" else compare(value, current) > 0):
+                    set_path(doc, path, copy.deepcopy(value))
+            elif op == "$currentDate":
+                set_path(doc, path, datetime.datetime.now())
+            elif op == "$rename":
+                current = get_path(doc, path)
+                if current is not MISSING:
+                    unset_path(doc, path)
+                    set_path(doc, value, current)
+            elif op in ("$push", "$addToSet"):
+                array = get_path(doc, path)
+                if array is MISSING or array is None:
+                    array = []
+                elif not isinstance(array, list):
+                    raise OperationFailure(f"The field '{path}' must be an array")
+                else:
+                    array = list(array)
+                items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                for item in items:
+                    if op == "$addToSet" and any(equals(item, existing) for existing in array):
+                        continue
+                    array.append(copy.deepcopy(item))
+                if isinstance(value, dict) and "$sort" in value:
+                    spec = value["$sort"]
+                    if isinstance(spec, dict):
+                        array = sort_documents(array, list(spec.items()))
+                    else:
+                        array = sorted(array, key=_sort_key, reverse=spec < 0)
+                if isinstance(value, dict) and "$slice" in value:
+                    array = _slice(array, value["$slice"])
+                set_path(doc, path, array)
+            elif op == "$pull":
+                array = get_path(doc, path)
+                if isinstance(array, list):
+                    set_path(doc, path, [item for item in array if not (
+                        _element_matches(item, value) if isinstance(value, dict) else equals(item, value)
+                    )])
+            elif op == "$pullAll":
+                array = get_path(doc, path)
+                if isinstance(array, list):
+                    set_path(doc, path, [item for item in array if not any(equals(item, v) for v in value)])
+            elif op == "$pop":
+                array = get_path(doc, path)
+                if isinstance(array, list) and array:
+                    set_path(doc, path, array[1:] if value < 0 else array[:-1])
+            else:
+                raise OperationFailure(f"Unknown modifier: {op}")
+    return doc
+
+def _upsert_seed(query: dict) -> dict:
+    """Fields an upsert copies from the equality conditions of its filter."""
+    seed: dict = {}
+    for key, condition in query.items():
+        if key.startswith("$"):
+            if key == "$and":
+                for part in condition:
+                    seed.update(_upsert_seed(part))
+            continue
+        if isinstance(condition, dict) and "$eq" in condition:
+            set_path(seed, key, copy.deepcopy(condition["$eq"]))
+        elif not _is_operator_dict(condition) and not isinstance(condition, re.Pattern):
+            set_path(seed, key, copy.deepcopy(condition))
+    return seed
+
+# --- Aggregation stages ------------------------------------------------------
+
+def _project_stage(doc: dict, spec: dict) -> dict:
+    computed = {k: v for k, v in spec.items() if not isinstance(v, (bool, int))}
+    flags = {k: v for k, v in spec.items() if k not in computed}
+    if computed or any(flags.get(k) for k in flags if k != "_id"):
+        result = project(doc, {k: 1 for k, v in flags.items() if v and k != "_id"} or {"_id": 1})
+        if not flags.get("_id", 1):
+            result.pop("_id", None)
+        for path, expr in computed.items():
+            value = evaluate(expr, doc)
+            if value is not MISSING:
+                set_path(result, path, copy.deepcopy(value))
+        return result
+    return project(doc, flags)
+
+_ACCUMULATORS = ("$sum", "$avg", "$min", "$max", "$first", "$last", "$push", "$addToSet", "$count")
+
+def _group(docs: List[dict], spec: dict) -> List[dict]:
+    groups: "OrderedDict[Any, dict]" = OrderedDict()
+    keys: Dict[Any, Any] = {}
+    for doc in docs:
+        key = evaluate(spec["_id"], doc)
+        if key is MISSING:
+            key = None
+        marker = repr(_freeze(key))
+        if marker not in groups:
+            groups[marker] = {"_id": key}
+            keys[marker] = {}
+        state = groups[marker]
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (op, expr), = accumulator.items()
+            value = evaluate(expr, doc) if op != "$count" else 1
+            if op in ("$sum", "$count"):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    state[field] = state.get(field, 0) + value
+                else:
+                    state.setdefault(field, 0)
+            elif op == "$avg":
+                total, count = keys[marker].get(field, (0, 0))
+                if isinstance(value, (int, float)):
+                    total, count = total + value, count + 1
+                keys[marker][field] = (total, count)
+                state[field] = total / count if count else None
+            elif op in ("$min", "$max"):
+                if value is None or value is MISSING:
+                    state.setdefault(field, None)
+                elif state.get(field) is None or (compare(value, state[field]) < 0 if op == "$min" else compare(value, state[field]) > 0):
+                    state[field] = value
+            elif op == "$first":
+                if field not in state:
+                    state[field] = None if value is MISSING else value
+            elif op == "$last":
+                state[field] = None if value is MISSING else value
+            elif op == "$push":
+                if value is not MISSING:
+                    state.setdefault(field, []).append(value)
+                else:
+                    state.setdefault(field, [])
+            elif op == "$addToSet":
+                bucket = state.setdefault(field, [])
+                if value is not MISSING and not any(equals(value, existing) for existing in bucket):
+                    bucket.append(value)
+            else:
+                raise OperationFailure(f"unknown group operator '{op}'")
+    return [copy.deepcopy(g) for g in groups.values()]
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return (type(value).__name__, value)
+
+# --- Results and cursors -----------------------------------------------------
+
+class MemoryCursor:
+    def __init__(self, producer, collection: Optional["MemoryCollection"] = None):
+        self._producer = producer
+        self._collection = collection
+        self._filter: dict = {}
+        self._projection = None
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[List[dict]] = None
+        self._position = 0
+
+    def _spec(self, **values):
+        if self._results is not None:
+            raise OperationFailure("cannot set options after executing query")
+        for name, value in values.items():
+            setattr(self, name, value)
+        return self
+
+    def sort(self, key_or_list, direction=None):
+        return self._spec(_sort=normalize_sort(key_or_list, direction))
+
+    def skip(self, skip: int):
+        return self._spec(_skip=skip)
+
+    def limit(self, limit: int):
+        return self._spec(_limit=limit)
+
+    def batch_size(self, batch_size: int):
+        return self
+
+    def hint(self, index):
+        return self
+
+    def max_time_ms(self, ms):
+        return self
+
+    def _materialize(self) -> List[dict]:
+        if self._results is None:
+            docs = self._producer()
+            if self._sort:
+                docs = sort_documents(docs, self._sort)
+            docs = docs[self._skip:]
+            if self._limit:
+                docs = docs[:abs(self._limit)]
+            self._results = [project(d, self._projection) for d in docs]
+        return self._results
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        results = self._materialize()
+        end = len(results) if length is None else min(self._position + length, len(results))
+        batch = results[self._position:end]
+        self._position = end
+        return batch
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        results = self._materialize()
+        if self._position >= len(results):
+            raise StopAsyncIteration
+        self._position += 1
+        return results[self._position - 1]
+
+    async def close(self):
+        self._position = len(self._materialize())
+
+class MemoryCollection:
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self._docs: "OrderedDict[Any, dict]" = OrderedDict()
+        self._indexes: Dict[str, dict] = {"_id_": {"key": [("_id", 1)], "unique": True}}
+        self._text_fields: Optional[List[str]] = None
+
+    def __repr__(self):
+        return f"MemoryCollection({self.name!r})"
+
+    # Indexes are only kept for unique constraints and $text fields
+    async def create_index(self, keys, name: Optional[str] = None, unique: bool = False, **kwargs) -> str:
+        spec = normalize_sort(keys, 1)
+        name = name or "_".join(f"{field}_{direction}" for field, direction in spec)
+        if any(direction == "text" for _, direction in spec):
+            self._text_fields = [field for field, direction in spec if direction == "text"]
+        self._indexes[name] = {"key": spec, "unique": unique, "partialFilterExpression": kwargs.get("partialFilterExpression")}
+        if unique:
+            self._check_unique_all()
+        return name
+
+    async def create_indexes(self, indexes) -> List[str]:
+        return [await self.create_index(index.document["key"].items(), **{k: v for k, v in index.document.items() if k != "key"}) for index in indexes]
+
+    async def drop_index(self, name: str):
+        self._indexes.pop(name, None)
+
+    async def index_information(self) -> dict:
+        return copy.deepcopy(self._indexes)
+
+    def _unique_key(self, doc: dict, index: dict):
+        partial = index.get("partialFilterExpression")
+        if partial and not matches(doc, partial):
+            return None
+        return repr(_freeze([get_path(doc, field, None) for field, _ in index["key"]]))
+
+    def _check_unique(self, doc: dict, ignore_id=MISSING):
+        for name, index in self._indexes.items():
+            if not index.get("unique"):
+                continue
+            key = self._unique_key(doc, index)
+            if key is None:
+                continue
+            for other in self._docs.values():
+                if not equals(other["_id"], ignore_id) and self._unique_key(other, index) == key:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}", 11000)
+
+    def _check_unique_all(self):
+        docs = list(self._docs.values())
+        self._docs = OrderedDict()
+        try:
+            for doc in docs:
+                self._check_unique(doc)
+                self._docs[self._key(doc["_id"])] = doc
+        finally:
+            for doc in docs:
+                self._docs[self._key(doc["_id"])] = doc
+
+    @staticmethod
+    def _key(document_id):
+        return repr(_freeze(document_id))
+
+    def _matching(self, query: Optional[dict]) -> List[dict]:
+        query = query or {}
+        _require_text_index(query, self._text_fields)
+        if set(query) == {"_id"} and not _is_operator_dict(query["_id"]):
+            doc = self._docs.get(self._key(query["_id"]))
+            return [doc] if doc is not None else []
+        return [doc for doc in self._docs.values() if matches(doc, query, self._text_fields)]
+
+    def _insert(self, doc: dict) -> Any:
+        doc = to_bson(doc)
+        if "_id" not in doc:
+            doc["_id"] = ObjectId()
+        key = self._key(doc["_id"])
+        if key in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_ dup key: {{ _id: {doc['_id']!r} }}", 11000)
+        self._check_unique(doc)
+        self._docs[key] = doc
+        return doc["_id"]
+
+    def _replace_stored(self, old: dict, new: dict) -> dict:
+        if not equals(new.get("_id"), old["_id"]):
+            raise OperationFailure("Performing an update on the path '_id' would modify the immutable field '_id'", 66)
+        new = to_bson(new)
+        self._check_unique(new, ignore_id=old["_id"])
+        self._docs[self._key(old["_id"])] = new
+        return new
+
+    def _update(self, query: dict, update, upsert: bool, multi: bool, sort=None) -> Tuple[int, int, Any, List[Tuple[Optional[dict], dict]]]:
+        """Returns (matched, modified, upserted id, [(before, after)])."""
+        targets = self._matching(query)
+        if sort:
+            targets = sort_documents(targets, normalize_sort(sort))
+        if not multi:
+            targets = targets[:1]
+        changes = []
+        modified = 0
+        for stored in targets:
+            before = copy.deepcopy(stored)
+            after = apply_update(copy.deepcopy(stored), update, query, inserting=False)
+            if not equals(after, before):
+                after = copy.deepcopy(self._replace_stored(stored, after))
+                modified += 1
+            changes.append((before, after))
+        if targets or not upsert:
+            return len(targets), modified, None, changes
+        seed = _upsert_seed(query)
+        doc = apply_update(seed, update, query, inserting=True)
+        if "_id" not in doc:
+            doc = {"_id": ObjectId(), **doc}
+        upserted_id = self._insert(doc)
+        return 0, 0, upserted_id, [(None, copy.deepcopy(self._docs[self._key(upserted_id)]))]
+
+    async def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        inserted_id = self._insert(document)
+        document.setdefault("_id", inserted_id)
+        return InsertOneResult(inserted_id, True)
+
+    async def insert_many(self, documents: Iterable[dict], ordered: bool = True, **kwargs) -> InsertManyResult:
+        inserted, errors = [], []
+        for index, document in enumerate(documents):
+            try:
+                inserted_id = self._insert(document)
+                document.setdefault("_id", inserted_id)
+                inserted.append(inserted_id)
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e), "op": document})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted), "writeConcernErrors": [],
+                                  "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []})
+        return InsertManyResult(inserted, True)
+
+    async def find_one(self, filter: Optional[dict] = None, projection=None, *args, sort=None, **kwargs) -> Optional[dict]:
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        docs = self._matching(filter)
+        if sort:
+            docs = sort_documents(docs, normalize_sort(sort))
+        return project(docs[0], projection) if docs else None
+
+    def find(self, filter: Optional[dict] = None, projection=None, *args, sort=None, skip: int = 0, limit: int = 0, **kwargs) -> MemoryCursor:
+        cursor = MemoryCursor(lambda: self._matching(filter), self)
+        cursor._projection = projection
+        cursor._skip = skip
+        cursor._limit = limit
+        if sort:
+            cursor._sort = normalize_sort(sort)
+        return cursor
+
+    async def count_documents(self, filter: dict, limit: int = 0, skip: int = 0, **kwargs) -> int:
+        count = max(len(self._matching(filter)) - skip, 0)
+        return min(count, limit) if limit else count
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        return len(self._docs)
+
+    async def distinct(self, key: str, filter: Optional[dict] = None, **kwargs) -> list:
+        values: list = []
+        for doc in self._matching(filter):
+            for value in _candidates(doc, key):
+                if not isinstance(value, list) and not any(equals(value, v) for v in values):
+                    values.append(copy.deepcopy(value))
+        return values
+
+    async def update_one(self, filter: dict, update, upsert: bool = False, **kwargs) -> UpdateResult:
+        matched, modified, upserted_id, _ = self._update(filter, update, upsert, multi=False, sort=kwargs.get("sort"))
+        return UpdateResult({"n": matched or int(upserted_id is not None), "nModified": modified, "upserted": upserted_id}, True)
+
+    async def update_many(self, filter: dict, update, upsert: bool = False, **kwargs) -> UpdateResult:
+        matched, modified, upserted_id, _ = self._update(filter, update, upsert, multi=True)
+        return UpdateResult({"n": matched or int(upserted_id is not None), "nModified": modified, "upserted": upserted_id}, True)
+
+    async def replace_one(self, filter: dict, replacement: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        targets = self._matching(filter)[:1]
+        if targets:
+            stored = targets[0]
+            new = copy.deepcopy(replacement)
+            new.setdefault("_id", stored["_id"])
+            modified = int(not equals(new, stored))
+            self._replace_stored(stored, new)
+            return UpdateResult({"n": 1, "nModified": modified, "upserted": None}, True)
+        if not upsert:
+            return UpdateResult({"n": 0, "nModified": 0, "upserted": None}, True)
+        doc = {**_upsert_seed(filter), **copy.deepcopy(replacement)}
+        upserted_id = self._insert(doc)
+        return UpdateResult({"n": 1, "nModified": 0, "upserted": upserted_id}, True)
+
+    async def find_one_and_update(self, filter: dict, update, projection=None, sort=None, upsert: bool = False,
+                                  return_document=ReturnDocument.BEFORE, **kwargs) -> Optional[dict]:
+        _, _, _, changes = self._update(filter, update, upsert, multi=False, sort=sort)
+        if not changes:
+            return None
+        before, after = changes[0]
+        chosen = after if return_document == ReturnDocument.AFTER else before
+        return project(chosen, projection) if chosen is not None else None
+
+    async def find_one_and_replace(self, filter: dict, replacement: dict, projection=None, sort=None, upsert: bool = False,
+                                   return_document=ReturnDocument.BEFORE, **kwargs) -> Optional[dict]:
+        before = await self.find_one(filter, sort=sort)
+        await self.replace_one(filter if before is None else {"_id": before["_id"]}, replacement, upsert=upsert)
+        chosen = before if return_document == ReturnDocument.BEFORE else await self.find_one(
+            {"_id": before["_id"]} if before else _upsert_seed(filter))
+        return project(chosen, projection) if chosen is not None else None
+
+    async def find_one_and_delete(self, filter: dict, projection=None, sort=None, **kwargs) -> Optional[dict]:
+        docs = self._matching(filter)
+        if sort:
+            docs = sort_documents(docs, normalize_sort(sort))
+        if not docs:
+            return None
+        del self._docs[self._key(docs[0]["_id"])]
+        return project(docs[0], projection)
+
+    async def delete_one(self, filter: dict, **kwargs) -> DeleteResult:
+        docs = self._matching(filter)[:1]
+        for doc in docs:
+            del self._docs[self._key(doc["_id"])]
+        return DeleteResult({"n": len(docs)}, True)
+
+    async def delete_many(self, filter: dict, **kwargs) -> DeleteResult:
+        docs = self._matching(filter)
+        for doc in docs:
+            del self._docs[self._key(doc["_id"])]
+        return DeleteResult({"n": len(docs)}, True)
+
+    async def bulk_write(self, requests: list, ordered: bool = True, **kwargs) -> BulkWriteResult:
+        result = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "nUpserted": 0, "upserted": [], "writeErrors": [], "writeConcernErrors": []}
+        for index, request in enumerate(requests):
+            kind = type(request).__name__
+            try:
+                if kind == "InsertOne":
+                    self._insert(request._doc)
+                    result["nInserted"] += 1
+                elif kind in ("UpdateOne", "UpdateMany", "ReplaceOne"):
+                    if kind == "ReplaceOne":
+                        outcome = await self.replace_one(request._filter, request._doc, upsert=bool(request._upsert))
+                    else:
+                        outcome = await (self.update_one if kind == "UpdateOne" else self.update_many)(
+                            request._filter, request._doc, upsert=bool(request._upsert))
+                    if outcome.upserted_id is not None:
+                        result["nUpserted"] += 1
+                        result["upserted"].append({"index": index, "_id": outcome.upserted_id})
+                    else:
+                        result["nMatched"] += outcome.matched_count
+                        result["nModified"] += outcome.modified_count
+                elif kind in ("DeleteOne", "DeleteMany"):
+                    outcome = await (self.delete_one if kind == "DeleteOne" else self.delete_many)(request._filter)
+                    result["nRemoved"] += outcome.deleted_count
+                else:
+                    raise OperationFailure(f"unsupported bulk operation {kind}")
+            except DuplicateKeyError as e:
+                result["writeErrors"].append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+    def aggregate(self, pipeline: List[dict], **kwargs) -> MemoryCursor:
+        return MemoryCursor(lambda: self.database._run_pipeline(self, pipeline))
+
+    def watch(self, *args, **kwargs):
+        return self.database.watch(*args, **kwargs)
+
+class _AdminDatabase:
+    async def command(self, command, *args, **kwargs):
+        return {"ok": 1.0}
+
+class MemoryDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self, name)
+        return self._collections[name]
+
+    __getattr__ = __getitem__
+
+    async def list_collection_names(self) -> List[str]:
+        return [name for name, collection in self._collections.items() if collection._docs]
+
+    async def drop_collection(self, name: str):
+        self._collections.pop(name, None)
+
+    async def command(self, command, *args, **kwargs):
+        # collMod, ping and friends have nothing to change here
+        return {"ok": 1.0}
+
+    def watch(self, *args, **kwargs):
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", 40573)
+
+    def _run_pipeline(self, collection: MemoryCollection, pipeline: List[dict]) -> List[dict]:
+        docs = [copy.deepcopy(d) for d in collection._docs.values()]
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == "$match":
+                _require_text_index(spec, collection._text_fields)
+                docs = [d for d in docs if matches(d, spec, collection._text_fields)]
+            elif name in ("$set", "$addFields", "$unset", "$replaceRoot", "$replaceWith"):
+                docs = [_apply_pipeline(d, [stage]) for d in docs]
+            elif name == "$project":
+                docs = [_project_stage(d, spec) for d in docs]
+            elif name == "$unwind":
+                path = spec if isinstance(spec, str) else spec["path"]
+                keep_empty = isinstance(spec, dict) and spec.get("preserveNullAndEmptyArrays")
+                include_index = spec.get("includeArrayIndex") if isinstance(spec, dict) else None
+                field = path[1:]
+                unwound = []
+                for d in docs:
+                    value = get_path(d, field)
+                    if isinstance(value, list) and value:
+                        for index, item in enumerate(value):
+                            copy_doc = copy.deepcopy(d)
+                            set_path(copy_doc, field, copy.deepcopy(item))
+                            if include_index:
+                                copy_doc[include_index] = index
+                            unwound.append(copy_doc)
+                    elif isinstance(value, list) or value is MISSING or value is None:
+                        if keep_empty:
+                            copy_doc = copy.deepcopy(d)
+                            if isinstance(value, list):
+                                unset_path(copy_doc, field)
+                            unwound.append(copy_doc)
+                    else:
+                        unwound.append(d)
+                docs = unwound
+            elif name == "$group":
+                docs = _group(docs, spec)
+            elif name == "$sort":
+                docs = sort_documents(docs, list(spec.items()))
+            elif name == "$skip":
+                docs = docs[spec:]
+            elif name == "$limit":
+                docs = docs[:spec]
+            elif name == "$count":
+                docs = [{spec: len(docs)}] if docs else []
+            elif name == "$sortByCount":
+                docs = sort_documents(_group(docs, {"_id": spec, "count": {"$sum": 1}}), [("count", -1)])
+            elif name == "$lookup":
+                foreign = self[spec["from"]]
+                for d in docs:
+                    if "localField" in spec:
+                        local = _candidates(d, spec["localField"]) or [None]
+                        joined = [copy.deepcopy(f) for f in foreign._docs.values()
+                                  if any(_equals_any(_candidates(f, spec["foreignField"]), v) for v in local)]
+                    else:
+                        variables = {k: evaluate(v, d) for k, v in spec.get("let", {}).items()}
+                        joined = self._run_pipeline(foreign, _bind(spec["pipeline"], variables))
+                    set_path(d, spec["as"], joined)
+            elif name == "$facet":
+                docs = [{field: self._run_pipeline(_Snapshot(collection, docs), sub) for field, sub in spec.items()}]
+            elif name in ("$merge", "$out"):
+                self._merge(docs, spec if name == "$merge" else {"into": spec, "whenMatched": "replace"}, replace_all=name == "$out")
+                docs = []
+            else:
+                raise OperationFailure(f"Unrecognized pipeline stage name: '{name}'")
+        return docs
+
+    def _merge(self, docs: List[dict], spec, replace_all: bool):
+        target_name = spec if isinstance(spec, str) else spec["into"]
+        if isinstance(target_name, dict):
+            target_name = target_name["coll"]
+        target = self[target_name]
+        if replace_all:
+            target._docs = OrderedDict()
+        on = spec.get("on", "_id") if isinstance(spec, dict) else "_id"
+        on = [on] if isinstance(on, str) else list(on)
+        when_matched = spec.get("whenMatched", "merge") if isinstance(spec, dict) else "merge"
+        when_not_matched = spec.get("whenNotMatched", "insert") if isinstance(spec, dict) else "insert"
+        for doc in docs:
+            if "_id" not in doc:
+                doc["_id"] = ObjectId()
+            existing = target._matching({field: get_path(doc, field, None) for field in on})
+            if existing:
+                stored = existing[0]
+                if when_matched == "replace":
+                    new = {**copy.deepcopy(doc), "_id": stored["_id"]}
+                elif when_matched == "merge":
+                    new = {**copy.deepcopy(stored), **copy.deepcopy({k: v for k, v in doc.items() if k != "_id"})}
+                elif when_matched == "keepExisting":
+                    continue
+                elif when_matched == "fail":
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {target.name}", 11000)
+                elif isinstance(when_matched, list):
+                    new = _apply_pipeline(copy.deepcopy(stored), _bind(when_matched, {"new": doc}))
+                else:
+                    raise OperationFailure(f"unsupported whenMatched: {when_matched}")
+                target._replace_stored(stored, new)
+            elif when_not_matched == "insert":
+                target._insert(doc)
+            elif when_not_matched == "fail":
+                raise OperationFailure(f"$merge could not find a matching document in {target.name}")
+
+class _Snapshot:
+    """A throwaway collection over documents already flowing through a pipeline, for $facet."""
+    def __init__(self, collection: MemoryCollection, docs: List[dict]):
+        self._docs = OrderedDict((str(i), d) for i, d in enumerate(docs))
+        self._text_fields = collection._text_fields
+
+def _bind(pipeline, variables: dict):
+    """Substitute ``$$name`` references to pipeline-level variables with their values."""
+    if isinstance(pipeline, str) and pipeline.startswith("$$"):
+        name, _, path = pipeline[2:].partition(".")
+        if name in variables:
+            value = variables[name]
+            return {"$literal": _field(value, path) if path else value}
+        return pipeline
+    if isinstance(pipeline, list):
+        return [_bind(item, variables) for item in pipeline]
+    if isinstance(pipeline, dict):
+        return {k: _bind(v, variables) for k, v in pipeline.items()}
+    return pipeline
+
+class MemoryClient:
+    """Drop-in for ``AsyncIOMotorClient`` holding every database in this process."""
+
+    def __init__(self, *args, **kwargs):
+        self._databases: Dict[str, MemoryDatabase] = {}
+        self.admin = _AdminDatabase()
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(name)
+        return self._databases[name]
+
+    def get_database(self, name: str) -> MemoryDatabase:
+        return self[name]
+
+    def close(self):
+        pass
@@ -0,0 +1,96 @@
+import datetime
+from typing import List, Optional
+from pymongo import ReturnDocument
+from .base import Repository
+
+class NotificationRepository(Repository):
+    def __init__(self):
+        super().__init__("notifications")
+
+    async def page(self, recipient_id, skip: int, limit: int, unread_only: bool) -> List[dict]:
+        # recipient_id is always an ObjectId; naming both is_read values lets the
+        # (recipient_id, is_read, updated_at) index serve the sort either way
+        filter_query = {"recipient_id": recipient_id, "is_read": False if unread_only else {"$in": [False, True]}}
+        # Coalesced notifications move up with every new event folded into them
+        return await self.find(filter_query).sort([("updated_at", -1), ("_id", -1)]).skip(skip).limit(limit).to_list(length=limit)
+
+    async def unread_count(self, recipient_id) -> int:
+        return await self.count_documents({"recipient_id": recipient_id, "is_read": False})
+
+    async def fold_unread(self, recipient_id, type: str, related_question_id, fields: dict, sender_username: Optional[str], max_senders: int) -> dict:
+        """Fold an event into the recipient's unread notification of ``type`` on the question, creating it if there is none.
+
+        ``fields`` overwrite the stored ones, ``count`` goes up by one and the
+        sender moves to the front of ``senders``, which keeps at most
+        ``max_senders`` distinct names.
+        """
+        now = datetime.datetime.now()
+        key = {
+            "recipient_id": recipient_id,
+            "type": type,
+            "related_question_id": related_question_id,
+            "is_read": False,
+        }
+        sender = {"$literal": sender_username}
+        # Pipeline update so the sender list can be de-duplicated and trimmed in the same write
+        update = [{"$set": {
+            **{field: {"$literal": value} for field, value in fields.items()},
+            "sender_username": sender,
+            "count": {"$add": [{"$ifNull": ["$count", 0]}, 1]},
+            "senders": {"$slice": [
+                {"$concatArrays": [
+                    [sender] if sender_username else [],
+                    {"$filter": {"input": {"$ifNull": ["$senders", []]}, "cond": {"$ne": ["$$this", sender]}}},
+                ]},
+                max_senders,
+            ]},
+            "created_at": {"$ifNull": ["$created_at", now]},
+            "updated_at": now,
+        }}]
+        return await self.find_one_and_update(key, update, upsert=True, return_document=ReturnDocument.AFTER)
+
+    async def recipients_read_before(self, cutoff: datetime.datetime) -> List:
+        """Recipients holding notifications read before ``cutoff``."""
+        cursor = self.aggregate([{"$match": {"read_at": {"$lt": cutoff}}}, {"$group": {"_id": "$recipient_id"}}])
+        return [r["_id"] async for r in cursor]
+
+    async def delete_read_before(self, cutoff: datetime.datetime) -> int:
+        result = await self.delete_many({"read_at": {"$lt": cutoff}})
+        return result.deleted_count
+
+    async def mark_read(self, ids: list, recipient_id=None) -> int:
+        query = {"_id": {"$in": ids}, "is_read": False}
+        if recipient_id is not None:
+            query["recipient_id"] = recipient_id
+        result = await self.update_many(query, {"$set": {"is_read": True, "read_at": datetime.datetime.now()}})
+        return result.modified_count
+
+    async def mark_one_read(self, notification_id, recipient_id) -> bool:
+        """Mark one of the recipient's notifications read; ``False`` if they have no such notification."""
+        result = await self.update_one(
+            {"_id": notification_id, "recipient_id": recipient_id},
+            {"$set": {"is_read": True, "read_at": datetime.datetime.now()}}
+        )
+        return bool(result.matched_count)
+
+    async def unread_ids(self, recipient_id, limit: int) -> list:
+        chunk = await self.find(
+            {"recipient_id": recipient_id, "is_read": False},
+            {"_id": 1}
+        ).sort([("updated_at", -1), ("_id", -1)]).limit(limit).to_list(length=limit)
+        return [n["_id"] for n in chunk]
+
+    async def delete_owned(self, ids: list, recipient_id) -> int:
+        result = await self.delete_many({"_id": {"$in": ids}, "recipient_id": recipient_id})
+        return result.deleted_count
+
+    async def convert_string_ids(self, field: str) -> int:
+        """Rewrite ``field`` values stored as strings to ObjectIds; returns how many changed."""
+        result = await self.update_many({field: {"$type": "string"}}, [{"$set": {field: {"$toObjectId": f"${field}"}}}])
+        return result.modified_count
+
+    async def backfill_updated_at(self) -> int:
+        result = await self.update_many({"updated_at": {"$exists": False}}, [{"$set": {"updated_at": "$created_at"}}])
+        return result.modified_count
+
+notification_repo = NotificationRepository()
@@ -0,0 +1,122 @@
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from pymongo import ReturnDocument, UpdateOne
+from .base import Repository, TimedCursor
+
+def vote_pipeline(user_id: str, vote_value: int, then: Optional[dict] = None) -> List[dict]:
+    """Update pipeline toggling ``user_id``'s vote server-side.
+
+    Casting the same value again removes the vote, anything else sets or flips
+    it; ``votes`` moves by the difference and ``version`` is bumped. ``then``
+    is an extra ``$set`` stage evaluated against the new totals.
+    """
+    pipeline = [
+        {"$set": {"_vote_old": {"$ifNull": [f"$user_votes.{user_id}", 0]}}},
+        {"$set": {"_vote_new": {"$cond": [{"$eq": ["$_vote_old", vote_value]}, 0, vote_value]}}},
+        {"$set": {
+            "votes": {"$add": [{"$ifNull": ["$votes", 0]}, {"$subtract": ["$_vote_new", "$_vote_old"]}]},
+            "user_votes": {"$cond": [
+                {"$eq": ["$_vote_new", 0]},
+                {"$arrayToObject": {"$filter": {
+                    "input": {"$objectToArray": {"$ifNull": ["$user_votes", {}]}},
+                    "cond": {"$ne": ["$$this.k", user_id]},
+                }}},
+                {"$mergeObjects": [{"$ifNull": ["$user_votes", {}]}, {user_id: vote_value}]},
+            ]},
+            "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+        }},
+        {"$unset": ["_vote_old", "_vote_new"]},
+    ]
+    if then:
+        pipeline.append({"$set": then})
+    return pipeline
+
+class PostRepository(Repository):
+    """What questions and answers share: votes kept on the post, comment positions and owned edits."""
+
+    # Counters every edit increments
+    EDIT_COUNTERS: Dict[str, int] = {"revision_count": 1}
+
+    async def update_owned(self, post_id, author_id, fields: dict) -> Optional[Tuple[dict, dict]]:
+        """Apply ``fields`` if ``author_id`` owns the post.
+
+        Returns the post as it was before and after the edit. Both come from
+        the one atomic write: ``after`` is ``before`` with ``fields`` set and
+        the ``EDIT_COUNTERS`` added, which is exactly what the write stored.
+        """
+        before = await self.find_one_and_update(
+            {"_id": post_id, "author_id": author_id},
+            {"$set": fields, "$inc": self.EDIT_COUNTERS},
+            return_document=ReturnDocument.BEFORE
+        )
+        if before is None:
+            return None
+        after = {**before, **fields}
+        for counter, step in self.EDIT_COUNTERS.items():
+            after[counter] = before.get(counter, 0) + step
+        return before, after
+
+    async def toggle_vote(self, post_id, user_id: str, vote_value: int, projection: dict, then: Optional[dict] = None) -> Optional[Tuple[dict, int, int]]:
+        """Apply a vote in one atomic round trip.
+
+        Returns the post as it was before the vote (restricted to
+        ``projection`` plus the voter's own entry), the previous vote and the
+        new one, or ``None`` if the post does not exist.
+        """
+        before = await self.find_one_and_update(
+            {"_id": post_id},
+            vote_pipeline(user_id, vote_value, then),
+            projection={**projection, f"user_votes.{user_id}": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if before is None:
+            return None
+        old_vote = before.get("user_votes", {}).get(user_id, 0)
+        return before, old_vote, 0 if old_vote == vote_value else vote_value
+
+    async def next_comment_position(self, post_id) -> Optional[dict]:
+        """Hand out the next comment position; returns the post with its new ``comments_appended``."""
+        return await self.find_one_and_update(
+            {"_id": post_id},
+            {"$inc": {"comments_appended": 1}},
+            projection={"comments_appended": 1, "author_id": 1, "question_id": 1, "title": 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def vote_points_by_author(self, points: Dict[int, int]) -> AsyncIterator[Tuple[object, int]]:
+        """``(author_id, points)`` summed over the votes on each author's posts, self-votes excluded."""
+        pipeline = [
+            {"$project": {"author_id": 1, "vote": {"$objectToArray": {"$ifNull": ["$user_votes", {}]}}}},
+            {"$unwind": "$vote"},
+            {"$match": {"$expr": {"$ne": ["$vote.k", {"$toString": "$author_id"}]}}},
+            {"$group": {
+                "_id": "$author_id",
+                "points": {"$sum": {"$switch": {
+                    "branches": [{"case": {"$eq": ["$vote.v", value]}, "then": worth} for value, worth in points.items()],
+                    "default": 0,
+                }}},
+            }},
+        ]
+        async for row in self.aggregate(pipeline, allowDiskUse=True):
+            yield row["_id"], row["points"]
+
+    async def recount_votes(self):
+        """Recompute ``votes`` from ``user_votes`` on every post that has individual votes."""
+        await self.update_many(
+            {"user_votes": {"$exists": True, "$ne": {}}},
+            [{"$set": {"votes": {"$sum": {"$map": {"input": {"$objectToArray": "$user_votes"}, "in": "$$this.v"}}}}}]
+        )
+
+    def rendered_before(self, field: str, version: int, batch_size: int) -> TimedCursor:
+        """Posts whose ``field`` HTML was rendered by another renderer version, with that field only."""
+        return self.find({"render_version": {"$ne": version}}, {field: 1}).batch_size(batch_size)
+
+    async def store_renders(self, field: str, version: int, renders: List[Tuple[dict, str]]) -> int:
+        """Save ``(post, html)`` pairs, skipping posts whose ``field`` changed since they were read."""
+        result = await self.bulk_write([
+            UpdateOne(
+                {"_id": post["_id"], field: post.get(field)},
+                {"$set": {f"{field}_html": html, "render_version": version}}
+            )
+            for post, html in renders
+        ], ordered=False)
+        return result.modified_count
@@ -0,0 +1,146 @@
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+from pymongo import ReturnDocument, UpdateOne
+from .base import TimedCursor
+from .posts import PostRepository
+from ..utils.keyset import after
+
+# Newest first, with _id breaking ties so keyset positions are total
+NEWEST = [("created_at", -1), ("_id", -1)]
+
+class QuestionRepository(PostRepository):
+    # version also validates the question's cached representations
+    EDIT_COUNTERS = {"version": 1, "revision_count": 1}
+
+    def __init__(self):
+        super().__init__("questions")
+
+    async def get_shared(self, question_id, projection: Optional[dict] = None) -> Optional[dict]:
+        return await self.find_one_shared({"_id": question_id}, projection)
+
+    async def by_ids(self, question_ids: List) -> List[dict]:
+        return await self.find({"_id": {"$in": question_ids}}).to_list(length=None)
+
+    async def search(self, text: Optional[str], tags: Optional[List[str]], sort: list, skip: int = 0, limit: int = 0) -> List[dict]:
+        """A page of questions matching ``text`` (full-text) and any of ``tags``; both optional."""
+        filter_query = {}
+        if text:
+            filter_query["$text"] = {"$search": text}
+        if tags:
+            filter_query["tags"] = {"$in": tags}
+        return await self.find(filter_query).sort(sort).skip(skip).limit(limit).to_list(length=limit or None)
+
+    async def unanswered(self, tag: Optional[str], position: Optional[Tuple], descending: bool, limit: int) -> List[dict]:
+        """Questions without an accepted answer after keyset ``position``, by (created_at, _id)."""
+        direction = -1 if descending else 1
+        # is_answered: False matches the partial indexes' filter, so they can serve the query
+        filter_query = {"is_answered": False}
+        if tag:
+            filter_query["tags"] = tag
+        if position is not None:
+            filter_query.update(after("created_at", *position, descending))
+        sort = [("created_at", direction), ("_id", direction)]
+        return await self.find(filter_query).sort(sort).limit(limit).to_list(length=limit)
+
+    async def newest_in_tags(self, tags: List[str], limit: int, position: Optional[Tuple] = None, projection: Optional[dict] = None) -> List[dict]:
+        """Newest questions carrying any of ``tags``, after keyset ``position`` if given."""
+        filter_query = {"tags": {"$in": tags}}
+        if position is not None:
+            filter_query.update(after("created_at", *position, True))
+        return await self.find(filter_query, projection).sort(NEWEST).limit(limit).to_list(length=limit)
+
+    async def tag_counts(self) -> List[dict]:
+        """``{"tag", "count"}`` for every tag in use, most used first."""
+        cursor = self.aggregate([
+            {"$unwind": "$tags"},
+            {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+        ])
+        return [{"tag": t["_id"], "count": t["count"]} async for t in cursor]
+
+    async def count_answered(self) -> int:
+        return await self.count_documents({"is_answered": True})
+
+    async def delete_owned(self, question_id, author_id=None, projection: Optional[dict] = None) -> Optional[dict]:
+        """Delete the question, only if ``author_id`` owns it unless that is ``None``."""
+        delete_filter = {"_id": question_id}
+        if author_id is not None:
+            delete_filter["author_id"] = author_id
+        return await self.find_one_and_delete(delete_filter, projection=projection)
+
+    async def record_view(self, question_id, hot_score: float):
+        await self.update_one({"_id": question_id}, {"$inc": {"views": 1}, "$set": {"hot_score": hot_score}})
+
+    async def answer_added(self, question_id, hot_score: float):
+        await self.update_one(
+            {"_id": question_id},
+            {"$inc": {"answers_count": 1, "version": 1, "answers_version": 1}, "$set": {"hot_score": hot_score}}
+        )
+
+    async def answer_removed(self, question_id, answer_id, hot_score: dict) -> Optional[dict]:
+        """Count one answer less, bump the versions and re-score with the ``hot_score`` expression.
+
+        If the removed answer was the accepted one the question goes back to
+        unanswered in the same update. Returns the question's author and
+        accepted answer as they were before.
+        """
+        was_accepted = {"$eq": ["$accepted_answer_id", answer_id]}
+        return await self.find_one_and_update({"_id": question_id}, [
+            {"$set": {
+                "answers_count": {"$add": [{"$ifNull": ["$answers_count", 0]}, -1]},
+                "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+                "answers_version": {"$add": [{"$ifNull": ["$answers_version", 0]}, 1]},
+                "is_answered": {"$cond": [was_accepted, False, "$is_answered"]},
+                "accepted_answer_id": {"$cond": [was_accepted, None, "$accepted_answer_id"]},
+            }},
+            {"$set": {"hot_score": hot_score}},
+        ], projection={"author_id": 1, "accepted_answer_id": 1})
+
+    async def bump_answers_version(self, question_id):
+        await self.update_one({"_id": question_id}, {"$inc": {"answers_version": 1}})
+
+    async def set_hot_score(self, question_id, hot_score: dict):
+        """Re-score one question server-side from the ``hot_score`` expression."""
+        await self.update_one({"_id": question_id}, [{"$set": {"hot_score": hot_score}}])
+
+    async def set_hot_scores(self, scores: Iterable[Tuple[object, float]]):
+        await self.bulk_write([UpdateOne({"_id": question_id}, {"$set": {"hot_score": score}}) for question_id, score in scores], ordered=False)
+
+    async def zero_hot_scores_before(self, cutoff):
+        await self.update_many({"created_at": {"$lt": cutoff}, "hot_score": {"$ne": 0}}, {"$set": {"hot_score": 0}})
+
+    def scoring_inputs_since(self, cutoff, batch_size: int) -> TimedCursor:
+        return self.find(
+            {"created_at": {"$gte": cutoff}},
+            {"votes": 1, "answers_count": 1, "views": 1, "created_at": 1}
+        ).batch_size(batch_size)
+
+    async def set_accepted(self, question_id, author_id, answer_id) -> Optional[dict]:
+        """Accept ``answer_id`` if ``author_id`` asks and it is not accepted already; returns the previous state."""
+        return await self.find_one_and_update(
+            {"_id": question_id, "author_id": author_id, "accepted_answer_id": {"$ne": answer_id}},
+            {"$set": {"accepted_answer_id": answer_id, "is_answered": True}, "$inc": {"version": 1}},
+            projection={"author_id": 1, "accepted_answer_id": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+
+    async def clear_accepted(self, question_id, author_id, answer_id) -> Optional[dict]:
+        return await self.find_one_and_update(
+            {"_id": question_id, "author_id": author_id, "accepted_answer_id": answer_id},
+            {"$set": {"accepted_answer_id": None, "is_answered": False}, "$inc": {"version": 1}},
+            projection={"author_id": 1, "accepted_answer_id": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+
+    async def accepted_counts_by_author(self) -> AsyncIterator[Tuple[object, int]]:
+        """``(answer author, accepted answers)`` for answers accepted on someone else's question."""
+        pipeline = [
+            {"$match": {"is_answered": True, "accepted_answer_id": {"$ne": None}}},
+            {"$lookup": {"from": "answers", "localField": "accepted_answer_id", "foreignField": "_id", "as": "answer"}},
+            {"$unwind": "$answer"},
+            {"$match": {"$expr": {"$ne": ["$answer.author_id", "$author_id"]}}},
+            {"$group": {"_id": "$answer.author_id", "accepted": {"$sum": 1}}},
+        ]
+        async for row in self.aggregate(pipeline, allowDiskUse=True):
+            yield row["_id"], row["accepted"]
+
+question_repo = QuestionRepository()
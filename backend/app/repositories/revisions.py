@@ -0,0 +1,39 @@
+from typing import List
+from pymongo import UpdateOne
+from .base import Repository, TimedCursor
+
+class RevisionRepository(Repository):
+    def __init__(self):
+        super().__init__("revisions")
+
+    def back_from(self, parent_id, number: int, batch_size: int) -> TimedCursor:
+        """A post's revisions from ``number`` down, newest first, for walking back to a snapshot."""
+        return self.find({"parent_id": parent_id, "number": {"$lte": number}}).sort("number", -1).batch_size(batch_size)
+
+    async def page(self, parent_id, skip: int, limit: int) -> List[dict]:
+        return await self.find(
+            {"parent_id": parent_id},
+            {"number": 1, "author_id": 1, "author_username": 1, "created_at": 1, "changed": 1}
+        ).sort("number", -1).skip(skip).limit(limit).to_list(length=limit)
+
+    async def uncompressed_before(self, cutoff, limit: int) -> List[dict]:
+        return await self.find({"compressed": False, "created_at": {"$lt": cutoff}}).limit(limit).to_list(length=limit)
+
+    async def store_compressed(self, revisions: List[tuple]):
+        """Mark ``(revision_id, data)`` pairs compressed; ``data`` replaces the readable body unless it is ``None``."""
+        updates = []
+        for revision_id, data in revisions:
+            if data is not None:
+                update = {"$set": {"data": data, "compressed": True}, "$unset": {"fields": "", "changes": ""}}
+            else:
+                update = {"$set": {"compressed": True}}
+            updates.append(UpdateOne({"_id": revision_id, "compressed": False}, update))
+        await self.bulk_write(updates, ordered=False)
+
+    async def delete_for_question(self, question_id):
+        await self.delete_many({"question_id": question_id})
+
+    async def delete_for_parent(self, parent_id):
+        await self.delete_many({"parent_id": parent_id})
+
+revision_repo = RevisionRepository()
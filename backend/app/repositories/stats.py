@@ -0,0 +1,74 @@
+import datetime
+from typing import Iterable, List, Optional
+from pymongo import UpdateOne
+from .base import Repository
+
+DAY_FORMAT = "%Y-%m-%d"
+
+_DAY = {"$dateToString": {"format": DAY_FORMAT, "date": "$created_at"}}
+_MERGE = {"$merge": {"into": "daily_stats", "whenMatched": "merge", "whenNotMatched": "insert"}}
+
+def _created(start: Optional[datetime.datetime], end: datetime.datetime) -> dict:
+    window = {"$lt": end}
+    if start is not None:
+        window["$gte"] = start
+    return {"created_at": window}
+
+class DailyStatsRepository(Repository):
+    """One document per day, ``_id`` being the day as ``YYYY-MM-DD``, written by ``services.rollups``."""
+
+    def __init__(self):
+        super().__init__("daily_stats")
+
+    async def between(self, first_day: str, last_day: str) -> List[dict]:
+        return await self.find({"_id": {"$gte": first_day, "$lte": last_day}}).sort("_id", 1).to_list(length=None)
+
+    async def zero_days(self, days: Iterable[str], fields: Iterable[str]):
+        """Store each of ``days`` with ``fields`` at zero and no tags.
+
+        ``$merge`` only writes the days that have activity, so a day whose
+        count dropped to zero would otherwise keep its old figure.
+        """
+        zeros = {**{field: 0 for field in fields}, "tags": []}
+        requests = [UpdateOne({"_id": day}, {"$set": zeros}, upsert=True) for day in days]
+        if requests:
+            await self.bulk_write(requests, ordered=False)
+
+    async def zero_through(self, last_day: str, fields: Iterable[str]):
+        """``zero_days`` for every stored day up to ``last_day``, when the first day is not known."""
+        await self.update_many({"_id": {"$lte": last_day}}, {"$set": {**{field: 0 for field in fields}, "tags": []}})
+
+    async def merge_counts(self, source: Repository, field: str, start: Optional[datetime.datetime], end: datetime.datetime, extra: Optional[dict] = None):
+        """Count ``source``'s documents created in ``[start, end)`` per day into ``field``, server-side."""
+        await source.aggregate([
+            {"$match": {**(extra or {}), **_created(start, end)}},
+            {"$group": {"_id": _DAY, field: {"$sum": 1}}},
+            _MERGE,
+        ]).to_list(length=None)
+
+    async def merge_tags(self, source: Repository, start: Optional[datetime.datetime], end: datetime.datetime):
+        """Store each day's ``[{tag, count}]`` of the ``source`` documents created in ``[start, end)`` as ``tags``."""
+        await source.aggregate([
+            {"$match": _created(start, end)},
+            {"$unwind": "$tags"},
+            {"$group": {"_id": {"day": _DAY, "tag": "$tags"}, "count": {"$sum": 1}}},
+            {"$group": {"_id": "$_id.day", "tags": {"$push": {"tag": "$_id.tag", "count": "$count"}}}},
+            _MERGE,
+        ]).to_list(length=None)
+
+class RollupStateRepository(Repository):
+    """How far each rollup has been computed, keyed by the rollup's name."""
+
+    def __init__(self):
+        super().__init__("rollup_state")
+
+    async def watermark(self, name: str) -> Optional[datetime.datetime]:
+        state = await self.get(name)
+        return state["watermark"] if state else None
+
+    async def advance(self, name: str, watermark: datetime.datetime):
+        # $max keeps a slower concurrent run on another worker from moving the watermark back
+        await self.update_one({"_id": name}, {"$max": {"watermark": watermark}}, upsert=True)
+
+daily_stats_repo = DailyStatsRepository()
+rollup_state_repo = RollupStateRepository()
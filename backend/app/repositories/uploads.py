@@ -0,0 +1,12 @@
+from .base import Repository
+
+class UploadRepository(Repository):
+    """Stored files, keyed by the hash of their content."""
+
+    def __init__(self):
+        super().__init__("uploads")
+
+    async def save(self, upload: dict):
+        await self.replace_one({"_id": upload["_id"]}, upload, upsert=True)
+
+upload_repo = UploadRepository()
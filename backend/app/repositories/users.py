@@ -0,0 +1,94 @@
+import datetime
+from typing import Dict, Iterable, List, Optional
+from pymongo import UpdateOne
+from .base import Repository, TimedCursor
+
+class UserRepository(Repository):
+    def __init__(self):
+        super().__init__("users")
+
+    async def get_by_username(self, username: str, exclude_id=None) -> Optional[dict]:
+        query = {"username": username}
+        if exclude_id is not None:
+            query["_id"] = {"$ne": exclude_id}
+        return await self.find_one(query)
+
+    async def get_by_email(self, email: str, exclude_id=None) -> Optional[dict]:
+        query = {"email": email}
+        if exclude_id is not None:
+            query["_id"] = {"$ne": exclude_id}
+        return await self.find_one(query)
+
+    async def active_by_usernames(self, usernames: List[str]) -> List[dict]:
+        # Registration does not store is_active, so only an explicit False means banned
+        return await self.find({"username": {"$in": usernames}, "is_active": {"$ne": False}}, {"username": 1}).to_list(length=None)
+
+    async def newest(self, skip: int, limit: int) -> List[dict]:
+        return await self.find().sort("created_at", -1).skip(skip).limit(limit).to_list(length=limit)
+
+    async def count_active(self) -> int:
+        return await self.count_documents({"is_active": {"$ne": False}})
+
+    def reputations(self, batch_size: int) -> TimedCursor:
+        return self.find({}, {"username": 1, "reputation": 1}).batch_size(batch_size)
+
+    async def add_reputation(self, deltas: Dict[object, int]) -> List[dict]:
+        """Apply the increments and return the stored reputation (and username) of every user touched."""
+        user_ids = [user_id for user_id, delta in deltas.items() if delta]
+        if not user_ids:
+            return []
+        await self.bulk_write([UpdateOne({"_id": user_id}, {"$inc": {"reputation": deltas[user_id]}}) for user_id in user_ids], ordered=False)
+        return await self.find({"_id": {"$in": user_ids}}, {"username": 1, "reputation": 1}).to_list(length=None)
+
+    async def reset_reputation(self, totals: Dict[object, int], batch_size: int = 1000) -> int:
+        """Set every user's reputation to their entry in ``totals`` (zero if absent); returns how many are non-zero."""
+        await self.update_many({}, {"$set": {"reputation": 0}})
+        updates = [UpdateOne({"_id": user_id}, {"$set": {"reputation": points}}) for user_id, points in totals.items() if points]
+        for start in range(0, len(updates), batch_size):
+            await self.bulk_write(updates[start:start + batch_size], ordered=False)
+        return len(updates)
+
+    def tokens_revoked_since(self, horizon: float) -> TimedCursor:
+        """Users whose tokens were revoked after ``horizon`` (epoch seconds)."""
+        return self.find({"tokens_valid_after": {"$gt": horizon}}, {"tokens_valid_after": 1})
+
+    async def set_fields(self, user_id, fields: dict):
+        await self.update_one({"_id": user_id}, {"$set": fields})
+
+    async def follow_tag(self, user_id, tag: str, max_tags: int) -> bool:
+        """Add ``tag`` to the user's followed tags; False if already followed or at ``max_tags``."""
+        result = await self.update_one(
+            {"_id": user_id, "followed_tags": {"$ne": tag}, f"followed_tags.{max_tags - 1}": {"$exists": False}},
+            {"$push": {"followed_tags": tag}}
+        )
+        return result.modified_count > 0
+
+    async def unfollow_tag(self, user_id, tag: str) -> bool:
+        result = await self.update_one({"_id": user_id, "followed_tags": tag}, {"$pull": {"followed_tags": tag}})
+        return result.modified_count > 0
+
+    def followers_of(self, tags: List[str], batch_size: int) -> TimedCursor:
+        return self.find({"followed_tags": {"$in": tags}}, {"_id": 1}).batch_size(batch_size)
+
+    async def bump_notifications_version(self, user_ids: Iterable):
+        """Invalidate cached notification listings (ETags) of the given users."""
+        user_ids = list(user_ids)
+        if len(user_ids) == 1:
+            await self.update_one({"_id": user_ids[0]}, {"$inc": {"notifications_version": 1}})
+        else:
+            await self.update_many({"_id": {"$in": user_ids}}, {"$inc": {"notifications_version": 1}})
+
+user_repo = UserRepository()
+class RevokedTokenRepository(Repository):
+    """Logged-out token digests, kept until the token would have expired anyway."""
+
+    def __init__(self):
+        super().__init__("revoked_tokens")
+
+    async def revoke(self, digest: str, expires_at: datetime.datetime):
+        await self.update_one({"_id": digest}, {"$set": {"expires_at": expires_at}}, upsert=True)
+
+    def unexpired(self, now: datetime.datetime) -> TimedCursor:
+        return self.find({"expires_at": {"$gt": now}})
+
+revoked_token_repo = RevokedTokenRepository()
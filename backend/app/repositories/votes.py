@@ -0,0 +1,16 @@
+from typing import Optional, Tuple
+from .questions import question_repo
+from .answers import answer_repo
+
+class VoteRepository:
+    """Votes live on the voted documents (``user_votes``), so this repository
+    has no collection of its own; it dispatches to the question and answer
+    repositories. The reputation votes earn is journaled by ``ledger_repo``."""
+
+    targets = {"question": question_repo, "answer": answer_repo}
+
+    async def toggle(self, target: str, document_id, user_id: str, vote_value: int, projection: dict, then: Optional[dict] = None) -> Optional[Tuple[dict, int, int]]:
+        """See ``PostRepository.toggle_vote``; ``target`` is "question" or "answer"."""
+        return await self.targets[target].toggle_vote(document_id, user_id, vote_value, projection, then)
+
+vote_repo = VoteRepository()
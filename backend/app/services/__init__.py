@@ -0,0 +1 @@
+# Services
\ No newline at end of file
@@ -0,0 +1,95 @@
+import datetime
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from ..repositories.answers import answer_repo
+from ..repositories.comments import comment_bucket_repo
+from ..repositories.questions import question_repo
+
+# Comments per bucket document. Positions are allocated against this, so it
+# must not change once comments exist.
+BUCKET_SIZE = 50
+
+PARENT_REPOSITORIES = {"question": question_repo, "answer": answer_repo}
+
+def position_of(seq: int, index: int) -> int:
+    return seq * BUCKET_SIZE + index
+
+async def append(parent_type: str, parent_id: ObjectId, author, content: str) -> Optional[Tuple[dict, dict]]:
+    """Append a comment to ``parent_id``'s buckets in two writes.
+
+    The parent's ``comments_appended`` counter hands out positions, so the
+    bucket a comment lands in is known before writing and no bucket grows
+    past ``BUCKET_SIZE``. Returns the parent (author, question and title
+    fields only) and the stored comment, or ``None`` if the parent does not
+    exist.
+    """
+    parent = await PARENT_REPOSITORIES[parent_type].next_comment_position(parent_id)
+    if parent is None:
+        return None
+
+    comment = {
+        "_id": ObjectId(),
+        "author_id": author.id,
+        "author_username": author.username,
+        "content": content,
+        "created_at": datetime.datetime.now(),
+    }
+    seq = (parent["comments_appended"] - 1) // BUCKET_SIZE
+    await comment_bucket_repo.append(parent_type, parent_id, parent.get("question_id", parent_id), seq, comment)
+    return parent, comment
+
+def _visible(bucket: dict, start: int, limit: int) -> Tuple[List[dict], Optional[int]]:
+    """Up to ``limit`` live comments of ``bucket`` from index ``start``, and the position to resume at if it has more."""
+    comments = []
+    stored = bucket.get("comments", [])
+    for index in range(start, len(stored)):
+        if len(comments) == limit:
+            return comments, position_of(bucket["seq"], index)
+        if not stored[index].get("deleted"):
+            comments.append(stored[index])
+    return comments, None
+
+async def first_pages(parent_ids: List[ObjectId], limit: int) -> Dict[ObjectId, Tuple[List[dict], Optional[int]]]:
+    """The first ``limit`` comments of every parent in one query over their first buckets."""
+    cursor = comment_bucket_repo.first_buckets(parent_ids, limit)
+    pages = {parent_id: ([], None) for parent_id in parent_ids}
+    async for bucket in cursor:
+        comments, _ = _visible(bucket, 0, limit)
+        shown = len(bucket.get("comments", []))
+        # Either $slice left part of the bucket out, or the bucket is full and may have a successor
+        more = bucket.get("size", 0) > shown or shown == BUCKET_SIZE
+        pages[bucket["parent_id"]] = (comments, shown if more else None)
+    return pages
+
+async def page(parent_id: ObjectId, position: int, limit: int) -> Tuple[List[dict], Optional[int]]:
+    """``limit`` comments of one parent from ``position`` on, reading only the buckets that cover them."""
+    seq, start = divmod(position, BUCKET_SIZE)
+    max_buckets = limit // BUCKET_SIZE + 2
+    cursor = comment_bucket_repo.buckets_from(parent_id, seq, max_buckets)
+
+    comments, read = [], 0
+    async for bucket in cursor:
+        read += 1
+        if bucket["seq"] != seq:
+            start = 0
+        taken, next_cursor = _visible(bucket, start, limit - len(comments))
+        comments.extend(taken)
+        if next_cursor is not None:
+            return comments, next_cursor
+        if bucket.get("size", 0) < BUCKET_SIZE:
+            # Buckets fill in order, so one that isn't full is the newest
+            return comments, None
+        seq, start = bucket["seq"] + 1, 0
+    # Every bucket read was full, so there may be another after them
+    return comments, position_of(seq, 0) if read == max_buckets else None
+
+async def remove(comment_id: ObjectId, author_id: Optional[ObjectId] = None) -> bool:
+    """Tombstone a comment so the positions of the ones after it stay put."""
+    return await comment_bucket_repo.tombstone(comment_id, author_id)
+
+async def remove_for_question(question_id: ObjectId):
+    """Drop the comments on a question and on all of its answers."""
+    await comment_bucket_repo.delete_for_question(question_id)
+
+async def remove_for_answer(answer_id: ObjectId):
+    await comment_bucket_repo.delete_for_parent(answer_id)
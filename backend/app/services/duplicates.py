@@ -0,0 +1,178 @@
+import asyncio
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from ..repositories.questions import question_repo
+from .invalidation import invalidation_bus
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+# Estimated Jaccard similarity below which candidates are not worth suggesting
+MIN_SIMILARITY = 0.3
+MAX_DESCRIPTION_TOKENS = 200
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#.\-]*")
+TAG_PATTERN = re.compile(r"<[^>]+>")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "does", "for",
+    "from", "how", "i", "if", "in", "is", "it", "my", "of", "on", "or", "so", "that",
+    "the", "this", "to", "what", "when", "where", "which", "why", "with", "you",
+}
+
+_rng = np.random.default_rng(0x5EED)
+# Multiply-shift hashing: ((a * x + b) mod 2**64) >> 32 with 64-bit odd a
+_PERM_A = _rng.integers(1, 2**63, size=NUM_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 2**63, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_EMPTY_SIGNATURE = np.full(NUM_PERMUTATIONS, np.iinfo(np.uint32).max, dtype=np.uint32)
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+def shingles(title: str, description: str = "") -> Set[str]:
+    """Title words and word pairs plus the leading description words."""
+    title_tokens = tokenize(title or "")
+    result = set(title_tokens)
+    result.update(f"{a} {b}" for a, b in zip(title_tokens, title_tokens[1:]))
+    body = TAG_PATTERN.sub(" ", description or "")
+    result.update(f"d:{t}" for t in tokenize(body)[:MAX_DESCRIPTION_TOKENS])
+    return result
+
+def signature(features: Set[str]) -> np.ndarray:
+    if not features:
+        return _EMPTY_SIGNATURE
+    base = np.fromiter((zlib.crc32(f.encode()) for f in features), dtype=np.uint64, count=len(features))
+    with np.errstate(over="ignore"):
+        hashed = (_PERM_A[:, None] * base[None, :] + _PERM_B[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1).astype(np.uint32)
+
+def _band_keys(sig: np.ndarray) -> List[Tuple[int, bytes]]:
+    return [(band, sig[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()) for band in range(BANDS)]
+
+class DuplicateIndex:
+    """MinHash signatures with LSH banding over question titles and descriptions."""
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[int, bytes], Set[str]] = defaultdict(set)
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._titles: Dict[str, str] = {}
+        # Ids written while a rebuild runs, which its snapshot must not overwrite
+        self._touched: Optional[Set[str]] = None
+        self.ready = False
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def add(self, question_id: str, title: str, description: str = ""):
+        self._put(str(question_id), title, signature(shingles(title, description)))
+
+    def _put(self, question_id: str, title: str, sig: np.ndarray):
+        self.remove(question_id)
+        self._signatures[question_id] = sig
+        self._titles[question_id] = title
+        for key in _band_keys(sig):
+            self._buckets[key].add(question_id)
+
+    def remove(self, question_id: str):
+        question_id = str(question_id)
+        if self._touched is not None:
+            self._touched.add(question_id)
+        sig = self._signatures.pop(question_id, None)
+        self._titles.pop(question_id, None)
+        if sig is None:
+            return
+        for key in _band_keys(sig):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(question_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def begin_rebuild(self):
+        self._touched = set()
+
+    def finish_rebuild(self, fresh: "DuplicateIndex"):
+        """Take over ``fresh``'s entries, keeping the live state of every id written since ``begin_rebuild``."""
+        for question_id in self._touched:
+            fresh.remove(question_id)
+            if question_id in self._signatures:
+                fresh._put(question_id, self._titles[question_id], self._signatures[question_id])
+        self._buckets, self._signatures, self._titles = fresh._buckets, fresh._signatures, fresh._titles
+        self._touched = None
+        self.ready = True
+
+    def query(self, title: str, description: str = "", limit: int = 5, exclude_id: Optional[str] = None) -> List[dict]:
+        features = shingles(title, description)
+        if not features:
+            return []
+        sig = signature(features)
+        candidates = set()
+        for key in _band_keys(sig):
+            candidates.update(self._buckets.get(key, ()))
+        candidates.discard(exclude_id)
+        if not candidates:
+            return []
+
+        ids = list(candidates)
+        matrix = np.stack([self._signatures[i] for i in ids])
+        similarity = (matrix == sig).mean(axis=1)
+        order = np.argsort(-similarity)[:limit]
+        return [
+            {"id": ids[i], "title": self._titles[ids[i]], "similarity": round(float(similarity[i]), 3)}
+            for i in order if similarity[i] >= MIN_SIMILARITY
+        ]
+
+duplicate_index = DuplicateIndex()
+
+_build_lock: Optional[asyncio.Lock] = None
+
+async def build_index(batch_size: int = 2000):
+    """Build the index from a snapshot of the questions collection and swap it in.
+
+    The live index keeps serving meanwhile. Questions that create, update or
+    delete hooks write while the snapshot is read keep their live state, so
+    an edit is not overwritten by older snapshot text and a delete is not
+    undone. Entries the snapshot no longer has are dropped, which is what a
+    reset after missed events needs.
+    """
+    global _build_lock
+    if _build_lock is None:
+        _build_lock = asyncio.Lock()
+    async with _build_lock:
+        fresh = DuplicateIndex()
+        duplicate_index.begin_rebuild()
+        try:
+            cursor = question_repo.scan({"title": 1, "description": 1}, batch_size)
+            while True:
+                batch = await cursor.to_list(length=batch_size)
+                if not batch:
+                    break
+                for q in batch:
+                    fresh.add(q["_id"], q.get("title", ""), q.get("description", ""))
+                # Hashing is CPU bound, give request handlers a turn between batches
+                await asyncio.sleep(0)
+        except BaseException:
+            duplicate_index._touched = None
+            raise
+        duplicate_index.finish_rebuild(fresh)
+
+@invalidation_bus.subscribe("questions", fields=("title", "description"))
+def _on_question_changed(event: dict):
+    question_id = str(event["documentKey"]["_id"])
+    question = event.get("fullDocument")
+    if event["operationType"] == "delete":
+        duplicate_index.remove(question_id)
+    elif question:
+        duplicate_index.add(question_id, question.get("title", ""), question.get("description", ""))
+
+# A fresh index is built and swapped in, so entries of deletes missed with the lost events go too
+invalidation_bus.on_reset(build_index)
+
+_build_task: Optional[asyncio.Task] = None
+
+def start():
+    global _build_task
+    if _build_task is None:
+        _build_task = asyncio.create_task(build_index())
@@ -0,0 +1,243 @@
+import asyncio
+import datetime
+import time
+from collections import deque
+from typing import Deque, Iterable, List, Optional, Set, Tuple
+from bson import ObjectId
+from ..config import settings
+from ..repositories.feeds import timeline_repo, tag_follower_repo
+from ..repositories.questions import question_repo
+from ..repositories.users import user_repo
+from ..utils.keyset import encode_cursor
+
+# A failing fan-out or backfill is retried this many times, this many seconds apart
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 5
+
+class PopularTags:
+    """Tags served by merge-on-read, reloaded at most every ``FEED_POPULAR_TAGS_TTL`` seconds."""
+
+    def __init__(self):
+        self._tags: Optional[Set[str]] = None
+        self._loaded_at = 0.0
+
+    async def get(self) -> Set[str]:
+        if self._tags is None or time.monotonic() - self._loaded_at >= settings.FEED_POPULAR_TAGS_TTL:
+            self._tags = await tag_follower_repo.popular(settings.FEED_POPULAR_TAG_FOLLOWERS)
+            self._loaded_at = time.monotonic()
+        return self._tags
+
+    def reset(self):
+        self._tags = None
+
+popular_tags = PopularTags()
+
+def _entry(question: dict) -> dict:
+    # Truncated like MongoDB dates so entries compare equal to the cursors made from them
+    created_at = question["created_at"]
+    return {
+        "question_id": question["_id"],
+        "created_at": created_at.replace(microsecond=created_at.microsecond // 1000 * 1000),
+        "tags": question.get("tags", []),
+    }
+
+async def _push(user_ids: Iterable, entries: List[dict]) -> int:
+    pushed, batch = 0, []
+    for user_id in user_ids:
+        batch.append(user_id)
+        if len(batch) >= settings.FEED_FANOUT_BATCH_SIZE:
+            await timeline_repo.push(batch, entries, settings.FEED_TIMELINE_SIZE)
+            pushed, batch = pushed + len(batch), []
+    if batch:
+        await timeline_repo.push(batch, entries, settings.FEED_TIMELINE_SIZE)
+    return pushed + len(batch)
+
+async def _seed(user_ids: List, questions: List[dict]):
+    """Add ``questions`` to the users' timelines, leaving out those each one already holds."""
+    present = await timeline_repo.question_ids(user_ids)
+    await timeline_repo.push_each(
+        {user_id: [_entry(q) for q in questions if q["_id"] not in present.get(user_id, ())] for user_id in user_ids},
+        settings.FEED_TIMELINE_SIZE
+    )
+
+async def fan_out(question: dict) -> int:
+    """Push a new question into the capped timelines of its tags' followers; returns how many got it.
+
+    Tags with at least ``FEED_POPULAR_TAG_FOLLOWERS`` followers are left
+    out, as the write would be too large; ``page`` merges them in on read.
+    """
+    popular = await popular_tags.get()
+    tags = sorted({tag for tag in question.get("tags", []) if tag not in popular})
+    if not tags:
+        return 0
+    followers = [
+        f["_id"] async for f in user_repo.followers_of(tags, settings.FEED_FANOUT_BATCH_SIZE)
+        if f["_id"] != question["author_id"]
+    ]
+    return await _push(followers, [_entry(question)])
+
+async def backfill(tag: str) -> int:
+    """Seed the timelines of a tag's followers with its recent questions; returns how many were seeded.
+
+    Run when a tag stops being popular: its questions were merged in on
+    read until then, so they are missing from the timelines.
+    """
+    recent = await question_repo.newest_in_tags([tag], settings.FEED_TIMELINE_SIZE, projection={"created_at": 1, "tags": 1})
+    if not recent:
+        return 0
+    seeded, batch = 0, []
+    async for f in user_repo.followers_of([tag], settings.FEED_FANOUT_BATCH_SIZE):
+        batch.append(f["_id"])
+        if len(batch) >= settings.FEED_FANOUT_BATCH_SIZE:
+            await _seed(batch, recent)
+            seeded, batch = seeded + len(batch), []
+    if batch:
+        await _seed(batch, recent)
+    return seeded + len(batch)
+
+async def _adjust_followers(tag: str, delta: int):
+    popular = await tag_follower_repo.adjust(
+        tag, delta, settings.FEED_POPULAR_TAG_FOLLOWERS, settings.FEED_POPULAR_TAG_KEEP_FOLLOWERS
+    )
+    if popular is None:
+        return
+    popular_tags.reset()
+    if not popular:
+        # Other workers fan out past the tag until their popular set expires; backfill once they have caught up
+        feed_writer.submit(backfill, tag, delay=settings.FEED_POPULAR_TAGS_TTL)
+
+async def follow(user_id, tag: str) -> bool:
+    """Follow ``tag``; the timeline is seeded with the tag's recent questions unless it is popular."""
+    if not await user_repo.follow_tag(user_id, tag, settings.FEED_MAX_FOLLOWED_TAGS):
+        return False
+    await _adjust_followers(tag, 1)
+    if tag in await popular_tags.get():
+        return True
+
+    recent = await question_repo.newest_in_tags([tag], settings.FEED_TIMELINE_SIZE, projection={"created_at": 1, "tags": 1})
+    # Questions also in another followed tag are already there
+    await _seed([user_id], recent)
+    return True
+
+async def unfollow(user_id, tag: str) -> bool:
+    # The tag's timeline entries stay; reads skip entries without a followed tag
+    if not await user_repo.unfollow_tag(user_id, tag):
+        return False
+    await _adjust_followers(tag, -1)
+    return True
+
+async def page(user_id, followed_tags: List[str], position: Optional[Tuple[datetime.datetime, ObjectId]], limit: int) -> Tuple[List[dict], Optional[str]]:
+    """Questions in ``followed_tags`` after ``position``, newest first, with the cursor of the next page.
+
+    Ordinary tags reach back as far as the capped timeline does; popular
+    tags as far as the questions collection does.
+    """
+    followed = set(followed_tags)
+    if not followed:
+        return [], None
+    popular = await popular_tags.get()
+    merged, fanned_out = followed & popular, followed - popular
+
+    # question_id -> created_at of every candidate after the cursor
+    candidates = {}
+    if fanned_out:
+        for entry in await timeline_repo.entries(user_id):
+            if not fanned_out.intersection(entry.get("tags", ())):
+                continue
+            if position is not None and (entry["created_at"], entry["question_id"]) >= position:
+                continue
+            candidates.setdefault(entry["question_id"], entry["created_at"])
+
+    documents = {}
+    if merged:
+        for question in await question_repo.newest_in_tags(sorted(merged), limit + 1, position):
+            documents[question["_id"]] = question
+            candidates[question["_id"]] = question["created_at"]
+
+    # One extra row tells whether there is a next page
+    ranked = sorted(candidates.items(), key=lambda c: (c[1], c[0]), reverse=True)[:limit + 1]
+    next_cursor = None
+    if len(ranked) > limit:
+        ranked = ranked[:limit]
+        next_cursor = encode_cursor(ranked[-1][1], ranked[-1][0])
+
+    missing = [question_id for question_id, _ in ranked if question_id not in documents]
+    if missing:
+        for question in await question_repo.by_ids(missing):
+            documents[question["_id"]] = question
+    # Deleted questions leave entries behind, they are skipped here
+    return [documents[question_id] for question_id, _ in ranked if question_id in documents], next_cursor
+
+class FeedWriter:
+    """Runs fan-outs and backfills off the request path, in the order they were submitted.
+
+    Jobs wait in memory until they are due, like the reputation ledger's
+    events; ``flush`` runs everything left, due or not.
+    """
+
+    def __init__(self):
+        self._pending: Deque[list] = deque()  # [due (monotonic), job, argument, attempts]
+        self._task: Optional[asyncio.Task] = None
+        # Created on start() so it binds to the server's event loop
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def submit(self, job, argument, delay: float = 0):
+        self._pending.append([time.monotonic() + delay, job, argument, 0])
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run_due(self, force: bool = False):
+        waiting = []
+        while self._pending:
+            pending = self._pending.popleft()
+            due, job, argument, attempts = pending
+            if due > time.monotonic() and not force:
+                waiting.append(pending)
+                continue
+            try:
+                await job(argument)
+            except Exception as e:
+                print(f"Feed {job.__name__} failed: {e}")
+                if attempts + 1 < MAX_ATTEMPTS:
+                    waiting.append([time.monotonic() + RETRY_DELAY, job, argument, attempts + 1])
+        self._pending.extendleft(reversed(waiting))
+
+    async def flush(self):
+        await self.run_due(force=True)
+
+    async def _run(self):
+        while True:
+            next_due = min((pending[0] for pending in self._pending), default=None)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), None if next_due is None else max(next_due - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.run_due()
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+feed_writer = FeedWriter()
+
+def schedule_fan_out(question: dict):
+    """Queue ``fan_out`` for a new question; followers see it once the writer gets to it."""
+    feed_writer.submit(fan_out, question)
+
+def start():
+    feed_writer.start()
+
+async def stop():
+    await feed_writer.stop()
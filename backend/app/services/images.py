@@ -0,0 +1,73 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from ..config import settings
+
+ALLOWED_FORMATS = {"JPEG", "PNG", "GIF", "WEBP"}
+MAX_DIMENSION = 2048
+THUMBNAIL_SIZE = (320, 320)
+MAX_PIXELS = 40_000_000
+OUTPUT_FORMAT = "WEBP"
+OUTPUT_EXTENSION = "webp"
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def image_filename(content_hash: str) -> str:
+    return f"{content_hash}.{OUTPUT_EXTENSION}"
+
+def thumbnail_filename(content_hash: str) -> str:
+    return f"{content_hash}_thumb.{OUTPUT_EXTENSION}"
+
+def _save_atomic(img, path: str, **params):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    img.save(tmp_path, OUTPUT_FORMAT, **params)
+    os.replace(tmp_path, path)
+
+def process_image(source_path: str, dest_dir: str, content_hash: str) -> dict:
+    """Decode, normalise and re-encode an upload plus its thumbnail. Runs in a worker process."""
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    try:
+        with Image.open(source_path) as img:
+            if img.format not in ALLOWED_FORMATS:
+                raise ValueError("Unsupported image format")
+            img.load()
+            source_format = img.format
+            img = ImageOps.exif_transpose(img)
+            has_alpha = img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+            img = img.convert("RGBA" if has_alpha else "RGB")
+
+            if max(img.size) > MAX_DIMENSION:
+                img.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.LANCZOS)
+            _save_atomic(img, os.path.join(dest_dir, image_filename(content_hash)), quality=85, method=4)
+
+            thumb = img.copy()
+            thumb.thumbnail(THUMBNAIL_SIZE, Image.LANCZOS)
+            _save_atomic(thumb, os.path.join(dest_dir, thumbnail_filename(content_hash)), quality=80, method=4)
+            return {
+                "width": img.width,
+                "height": img.height,
+                "thumbnail_width": thumb.width,
+                "thumbnail_height": thumb.height,
+                "source_format": source_format,
+            }
+    except (Image.DecompressionBombError, Image.UnidentifiedImageError, OSError) as e:
+        raise ValueError(f"Invalid image: {e}")
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_WORKERS or None)
+    return _pool
+
+async def process_upload(source_path: str, content_hash: str) -> dict:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), process_image, source_path, settings.UPLOAD_DIR, content_hash)
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False)
+        _pool = None
@@ -0,0 +1,153 @@
+import asyncio
+import inspect
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Sequence
+from pymongo.errors import OperationFailure, PyMongoError
+from ..config import settings
+from ..database import db
+
+# Server error codes for a standalone mongod and for a resume point that fell off the oplog
+CHANGE_STREAMS_UNSUPPORTED = {40573}
+RESUME_POINT_LOST = {260, 280, 286}
+
+class InvalidationBus:
+    """Fans change stream events out to in-process caches, so every worker sees every write.
+
+    Caches subscribe per collection, optionally naming the fields whose updates
+    they care about; the server filters everything else out before it reaches
+    the worker. Nothing is persisted: a starting worker loads its caches from
+    the database, and ``mark_start`` makes the stream begin from before that
+    snapshot, so writes made while it loads are not missed.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable]] = defaultdict(list)
+        # collection -> fields of interest, None meaning any update
+        self._fields: Dict[str, Optional[set]] = {}
+        self._reset_handlers: List[Callable] = []
+        self._resume_token = None
+        self._start_at = None
+        self.enabled = False
+
+    def subscribe(self, collection: str, fields: Optional[Sequence[str]] = None):
+        """Decorator registering ``handler(event)`` for inserts, deletes and matching updates."""
+        def register(handler: Callable):
+            self._handlers[collection].append(handler)
+            if fields is None or self._fields.get(collection, set()) is None:
+                self._fields[collection] = None
+            else:
+                self._fields[collection] = self._fields.get(collection, set()) | set(fields)
+            return handler
+        return register
+
+    def on_reset(self, handler: Callable):
+        """Called when events may have been missed, so caches can drop or reload everything."""
+        self._reset_handlers.append(handler)
+        return handler
+
+    def pipeline(self) -> List[dict]:
+        clauses = []
+        for collection, fields in self._fields.items():
+            if fields is None:
+                clauses.append({"ns.coll": collection})
+                continue
+            clauses.append({"ns.coll": collection, "operationType": {"$in": ["insert", "replace", "delete"]}})
+            clauses.append({
+                "ns.coll": collection,
+                "operationType": "update",
+                "$or": [{f"updateDescription.updatedFields.{f}": {"$exists": True}} for f in sorted(fields)]
+            })
+        return [{"$match": {"$or": clauses}}]
+
+    async def dispatch(self, event: dict):
+        for handler in self._handlers.get(event.get("ns", {}).get("coll"), ()):
+            try:
+                result = handler(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"Invalidation handler {handler.__qualname__} failed: {e}")
+
+    async def _reset(self):
+        for handler in self._reset_handlers:
+            try:
+                result = handler()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"Invalidation reset handler {handler.__qualname__} failed: {e}")
+
+    async def mark_start(self):
+        """Remember the cluster's current operation time as the point the stream starts from."""
+        try:
+            self._start_at = (await db.db.command("ping")).get("operationTime")
+        except PyMongoError:
+            self._start_at = None
+
+    async def _tail(self):
+        # A resume token from an earlier stream of this process wins over the start point
+        start_at = None if self._resume_token is not None else self._start_at
+        async with db.db.watch(
+            self.pipeline(), full_document="updateLookup",
+            resume_after=self._resume_token, start_at_operation_time=start_at
+        ) as stream:
+            self.enabled = True
+            print("Change stream invalidation started")
+            while True:
+                event = await stream.try_next()
+                if event is not None:
+                    await self.dispatch(event)
+                # Idle streams still advance their resume token with each server batch
+                self._resume_token = stream.resume_token
+                if event is None:
+                    await asyncio.sleep(0.1)
+
+    async def run(self):
+        if not self._handlers:
+            return
+        backoff = 1
+        while True:
+            try:
+                await self._tail()
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    print("Change streams need a replica set, cross-worker cache invalidation is disabled")
+                    return
+                if e.code in RESUME_POINT_LOST:
+                    print("Change stream resume point lost, resetting caches")
+                    self._resume_token = None
+                    await self.mark_start()
+                    await self._reset()
+                    continue
+                print(f"Change stream failed: {e}")
+            except PyMongoError as e:
+                print(f"Change stream failed: {e}")
+            # Back off on repeated failures, but retry quickly after a stream that was working
+            backoff = 1 if self.enabled else min(backoff * 2, 60)
+            self.enabled = False
+            await asyncio.sleep(backoff)
+
+invalidation_bus = InvalidationBus()
+
+_task: Optional[asyncio.Task] = None
+
+async def mark_start():
+    if settings.INVALIDATION_ENABLED:
+        await invalidation_bus.mark_start()
+
+def start():
+    global _task
+    if _task is None and settings.INVALIDATION_ENABLED:
+        _task = asyncio.create_task(invalidation_bus.run())
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
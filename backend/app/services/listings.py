@@ -0,0 +1,73 @@
+import time
+from typing import Dict, List, Optional, Tuple
+from ..config import settings
+from ..repositories.questions import question_repo
+from .invalidation import invalidation_bus
+
+# Sorts offered by the homepage filters, primed during warm-up
+HOMEPAGE_SORTS = ("created_at", "votes", "answers_count", "hot")
+
+def listing_sort(sort_by: str, sort_direction: int) -> List[Tuple[str, int]]:
+    if sort_by == "hot":
+        # Served from the hot_score index, ties broken by recency
+        return [("hot_score", sort_direction), ("_id", sort_direction)]
+    return [(sort_by, sort_direction)]
+
+class ListingCache:
+    """First page of the unfiltered question listings, which every homepage visit asks for.
+
+    Each sort keeps the top ``LISTING_CACHE_DEPTH`` documents for a short TTL;
+    question inserts, deletes and edits drop everything.
+    """
+
+    def __init__(self):
+        self._pages: Dict[Tuple[str, int], Tuple[float, List[dict]]] = {}
+
+    def get(self, sort_by: str, sort_direction: int) -> Optional[List[dict]]:
+        page = self._pages.get((sort_by, sort_direction))
+        if page is None or time.monotonic() - page[0] >= settings.LISTING_CACHE_TTL:
+            return None
+        return page[1]
+
+    async def load(self, sort_by: str, sort_direction: int) -> List[dict]:
+        questions = await question_repo.search(None, None, listing_sort(sort_by, sort_direction), limit=settings.LISTING_CACHE_DEPTH)
+        self._pages[(sort_by, sort_direction)] = (time.monotonic(), questions)
+        return questions
+
+    def invalidate(self):
+        self._pages.clear()
+
+    def __len__(self):
+        return len(self._pages)
+
+class TagCatalog:
+    """Tag usage counts across all questions, recomputed at most every ``TAG_CATALOG_TTL`` seconds."""
+
+    def __init__(self):
+        self._tags: Optional[List[dict]] = None
+        self._loaded_at = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._tags is not None
+
+    async def get(self) -> List[dict]:
+        if self._tags is None or time.monotonic() - self._loaded_at >= settings.TAG_CATALOG_TTL:
+            await self.load()
+        return self._tags
+
+    async def load(self):
+        self._tags = await question_repo.tag_counts()
+        self._loaded_at = time.monotonic()
+
+listing_cache = ListingCache()
+tag_catalog = TagCatalog()
+
+@invalidation_bus.subscribe("questions", fields=("title", "tags", "votes", "answers_count"))
+def _on_question_changed(event: dict):
+    listing_cache.invalidate()
+
+async def prime():
+    for sort_by in HOMEPAGE_SORTS:
+        await listing_cache.load(sort_by, -1)
+    await tag_catalog.load()
@@ -0,0 +1,122 @@
+import datetime
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+from ..repositories.notifications import notification_repo
+from ..repositories.users import user_repo
+from .invalidation import invalidation_bus
+from .notifications import bump_versions
+
+# "@name" not preceded by a word character or another "@", so e-mail addresses don't count
+MENTION_PATTERN = re.compile(r"(?<![\w@])@([A-Za-z0-9_][A-Za-z0-9_.\-]{2,49})")
+HTML_TAG = re.compile(r"<[^>]+>")
+MAX_MENTIONS = 20
+USERNAME_CACHE_SIZE = 10000
+USERNAME_CACHE_TTL = 600
+
+def extract_mentions(text: Optional[str]) -> Set[str]:
+    if not text or "@" not in text:
+        return set()
+    names = set()
+    for match in MENTION_PATTERN.finditer(HTML_TAG.sub(" ", text)):
+        # Sentence punctuation after a name is not part of it
+        names.add(match.group(1).rstrip(".-"))
+        if len(names) >= MAX_MENTIONS:
+            break
+    return names
+
+class UsernameCache:
+    """username -> user id for recently resolved names, with a reverse map to follow renames."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._ids: "OrderedDict[str, tuple]" = OrderedDict()  # username -> (user_id, cached at)
+        self._names: Dict[str, str] = {}  # str(user_id) -> username
+
+    def get(self, username: str):
+        entry = self._ids.get(username)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] >= self.ttl:
+            self.forget_name(username)
+            return None
+        self._ids.move_to_end(username)
+        return entry[0]
+
+    def put(self, username: str, user_id):
+        self._ids[username] = (user_id, time.monotonic())
+        self._ids.move_to_end(username)
+        self._names[str(user_id)] = username
+        while len(self._ids) > self.maxsize:
+            evicted, (evicted_id, _) = self._ids.popitem(last=False)
+            self._names.pop(str(evicted_id), None)
+
+    def forget_name(self, username: str):
+        entry = self._ids.pop(username, None)
+        if entry is not None:
+            self._names.pop(str(entry[0]), None)
+
+    def forget_user(self, user_id):
+        username = self._names.pop(str(user_id), None)
+        if username is not None:
+            self._ids.pop(username, None)
+
+username_cache = UsernameCache(USERNAME_CACHE_SIZE, USERNAME_CACHE_TTL)
+
+@invalidation_bus.subscribe("users", fields=("username", "is_active"))
+def _on_user_changed(event: dict):
+    username_cache.forget_user(event["documentKey"]["_id"])
+
+async def resolve_usernames(usernames: Iterable[str]) -> Dict[str, object]:
+    """Map usernames to active user ids, with a single ``$in`` query for the cache misses."""
+    resolved, missing = {}, []
+    for name in usernames:
+        user_id = username_cache.get(name)
+        if user_id is None:
+            missing.append(name)
+        else:
+            resolved[name] = user_id
+    if missing:
+        for user in await user_repo.active_by_usernames(missing):
+            username_cache.put(user["username"], user["_id"])
+            resolved[user["username"]] = user["_id"]
+    return resolved
+
+async def notify_mentions(
+    text: Optional[str],
+    sender,
+    question_id,
+    question_title: str,
+    answer_id=None,
+    previous_text: Optional[str] = None,
+) -> int:
+    """Notify users newly mentioned in ``text``; on edits, names already in ``previous_text`` are skipped."""
+    names = extract_mentions(text) - extract_mentions(previous_text)
+    names.discard(sender.username)
+    if not names:
+        return 0
+    recipients = [user_id for user_id in (await resolve_usernames(names)).values() if user_id != sender.id]
+    if not recipients:
+        return 0
+
+    now = datetime.datetime.now()
+    where = "an answer to" if answer_id else "the question"
+    docs = [{
+        "recipient_id": user_id,
+        "type": "mention",
+        "title": "You were mentioned",
+        "message": f"{sender.username} mentioned you in {where}: {question_title}",
+        "related_question_id": question_id,
+        "related_answer_id": answer_id,
+        "sender_username": sender.username,
+        "count": 1,
+        "senders": [sender.username],
+        "is_read": False,
+        "created_at": now,
+        "updated_at": now,
+    } for user_id in recipients]
+    await notification_repo.insert_many(docs, ordered=False)
+    await bump_versions(recipients)
+    return len(docs)
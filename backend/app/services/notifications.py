@@ -0,0 +1,87 @@
+import asyncio
+import datetime
+from typing import Optional
+from ..config import settings
+from ..repositories.notifications import notification_repo
+from ..repositories.users import user_repo
+
+# Senders remembered on a coalesced notification, most recent first
+MAX_SENDERS = 3
+
+async def bump_version(recipient_id):
+    """Invalidate cached notification listings (ETags) for a recipient."""
+    await user_repo.bump_notifications_version([recipient_id])
+
+async def bump_versions(recipient_ids):
+    """``bump_version`` for several recipients in one write."""
+    await user_repo.bump_notifications_version(recipient_ids)
+
+async def notify(
+    recipient_id,
+    type: str,
+    title: str,
+    message: str,
+    sender_username: Optional[str] = None,
+    related_question_id=None,
+    related_answer_id=None,
+) -> dict:
+    """Record an event for ``recipient_id``, folding it into their unread notification for the same target.
+
+    Repeated events of one type on one question (say, a burst of answers) keep
+    a single rolling document with a ``count`` and the latest ``senders``
+    instead of one row each. Once that notification is read, the next event
+    starts a new one.
+    """
+    notification = await notification_repo.fold_unread(
+        recipient_id,
+        type,
+        related_question_id,
+        {"title": title, "message": message, "related_answer_id": related_answer_id},
+        sender_username,
+        MAX_SENDERS
+    )
+    await bump_version(recipient_id)
+    return notification
+
+# Recipients whose listings one purge invalidates per write
+PURGE_BUMP_BATCH = 1000
+
+async def purge_read() -> int:
+    """Delete notifications read more than ``NOTIFICATION_READ_TTL_DAYS`` ago; returns how many.
+
+    Done here rather than by a TTL index so the recipients' listing
+    versions are bumped, which keeps their ETags from serving deleted rows.
+    """
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=settings.NOTIFICATION_READ_TTL_DAYS)
+    recipients = await notification_repo.recipients_read_before(cutoff)
+    if not recipients:
+        return 0
+    deleted = await notification_repo.delete_read_before(cutoff)
+    for start_index in range(0, len(recipients), PURGE_BUMP_BATCH):
+        await bump_versions(recipients[start_index:start_index + PURGE_BUMP_BATCH])
+    return deleted
+
+_task: Optional[asyncio.Task] = None
+
+async def _loop():
+    while True:
+        try:
+            await purge_read()
+        except Exception as e:
+            print(f"Read notification purge failed: {e}")
+        await asyncio.sleep(settings.NOTIFICATION_PURGE_INTERVAL)
+
+def start():
+    global _task
+    if _task is None and settings.NOTIFICATION_READ_TTL_DAYS > 0:
+        _task = asyncio.create_task(_loop())
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,98 @@
+import asyncio
+import datetime
+import math
+from typing import Optional
+import numpy as np
+from ..config import settings
+from ..repositories.questions import question_repo
+
+# Hacker News style decay: activity points divided by (age in hours + 2) ** gravity
+HOT_GRAVITY = 1.5
+HOT_ANSWER_WEIGHT = 2.0
+
+def hot_score(votes: int, answers_count: int, views: int, created_at: datetime.datetime, now: Optional[datetime.datetime] = None) -> float:
+    now = now or datetime.datetime.now()
+    age_hours = max((now - created_at).total_seconds() / 3600, 0)
+    points = votes + HOT_ANSWER_WEIGHT * answers_count + math.log10(1 + max(views, 0))
+    return points / (age_hours + 2) ** HOT_GRAVITY
+
+def hot_scores(votes: np.ndarray, answers_count: np.ndarray, views: np.ndarray, age_hours: np.ndarray) -> np.ndarray:
+    """Vectorized ``hot_score`` over whole columns of counters."""
+    points = votes + HOT_ANSWER_WEIGHT * answers_count + np.log10(1 + np.maximum(views, 0))
+    return points / (np.maximum(age_hours, 0) + 2) ** HOT_GRAVITY
+
+def question_hot_score(question: dict, votes_delta: int = 0, answers_delta: int = 0, views_delta: int = 0) -> float:
+    """Score for a question document after applying the given counter changes."""
+    return hot_score(
+        question.get("votes", 0) + votes_delta,
+        question.get("answers_count", 0) + answers_delta,
+        question.get("views", 0) + views_delta,
+        question.get("created_at") or datetime.datetime.now(),
+    )
+
+def hot_score_expression(now: Optional[datetime.datetime] = None) -> dict:
+    """``hot_score`` as an aggregation expression over a question's own fields, for update pipelines."""
+    now = now or datetime.datetime.now()
+    age_hours = {"$max": [{"$divide": [{"$subtract": [now, {"$ifNull": ["$created_at", now]}]}, 3600 * 1000]}, 0]}
+    points = {"$add": [
+        {"$ifNull": ["$votes", 0]},
+        {"$multiply": [HOT_ANSWER_WEIGHT, {"$ifNull": ["$answers_count", 0]}]},
+        {"$log10": {"$add": [1, {"$max": [{"$ifNull": ["$views", 0]}, 0]}]}},
+    ]}
+    return {"$divide": [points, {"$pow": [{"$add": [age_hours, 2]}, HOT_GRAVITY]}]}
+
+async def answer_removed(question_id, answer_id) -> Optional[dict]:
+    """See ``QuestionRepository.answer_removed``; the question is re-scored as of now."""
+    return await question_repo.answer_removed(question_id, answer_id, hot_score_expression())
+
+async def update_hot_score(question_id):
+    await question_repo.set_hot_score(question_id, hot_score_expression())
+
+async def refresh_hot_scores(batch_size: int = 5000) -> int:
+    """Re-decay every question in the active window and zero the ones that left it."""
+    now = datetime.datetime.now()
+    cutoff = now - datetime.timedelta(days=settings.HOT_WINDOW_DAYS)
+
+    await question_repo.zero_hot_scores_before(cutoff)
+
+    cursor = question_repo.scoring_inputs_since(cutoff, batch_size)
+
+    updated = 0
+    while True:
+        batch = await cursor.to_list(length=batch_size)
+        if not batch:
+            break
+        scores = hot_scores(
+            np.fromiter((q.get("votes", 0) for q in batch), dtype=np.float64, count=len(batch)),
+            np.fromiter((q.get("answers_count", 0) for q in batch), dtype=np.float64, count=len(batch)),
+            np.fromiter((q.get("views", 0) for q in batch), dtype=np.float64, count=len(batch)),
+            np.fromiter(((now - q["created_at"]).total_seconds() / 3600 for q in batch), dtype=np.float64, count=len(batch)),
+        )
+        await question_repo.set_hot_scores((q["_id"], float(score)) for q, score in zip(batch, scores))
+        updated += len(batch)
+    return updated
+
+_refresh_task: Optional[asyncio.Task] = None
+
+async def _refresh_loop():
+    while True:
+        try:
+            await refresh_hot_scores()
+        except Exception as e:
+            print(f"Hot score refresh failed: {e}")
+        await asyncio.sleep(settings.HOT_REFRESH_INTERVAL)
+
+def start():
+    global _refresh_task
+    if _refresh_task is None:
+        _refresh_task = asyncio.create_task(_refresh_loop())
+
+async def stop():
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
@@ -0,0 +1,85 @@
+import asyncio
+import os
+import time
+from typing import Optional
+from fastapi import FastAPI
+from pymongo.errors import PyMongoError
+from ..config import settings
+from ..database import db
+from . import listings
+from .duplicates import duplicate_index
+from .invalidation import invalidation_bus
+from .related import related_index
+from .suggest import suggest_index
+
+class Readiness:
+    def __init__(self):
+        self.warm = False
+        self.warmup_error: Optional[str] = None
+        self.warmup_seconds: Optional[float] = None
+
+readiness = Readiness()
+
+async def ping_mongo() -> dict:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(db.client.admin.command("ping"), settings.READY_PING_TIMEOUT)
+    except (PyMongoError, asyncio.TimeoutError) as e:
+        return {"status": "error", "error": str(e) or "timeout", "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+    return {"status": "ok", "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+async def warm_up(app: FastAPI):
+    """Open pooled connections, prime hot caches and build schemas before taking traffic."""
+    started = time.perf_counter()
+    backoff = 1
+    while True:
+        try:
+            # Concurrent pings force the pool to open MONGODB_MIN_POOL_SIZE sockets now
+            await asyncio.gather(*(db.client.admin.command("ping") for _ in range(max(settings.MONGODB_MIN_POOL_SIZE, 1))))
+            await listings.prime()
+            # The OpenAPI schema (and every model's JSON schema) is otherwise built by the first /docs hit
+            app.openapi()
+            break
+        except Exception as e:
+            # Anything escaping here would end the task silently and leave the instance never ready
+            readiness.warmup_error = f"{type(e).__name__}: {e}"
+            if isinstance(e, PyMongoError):
+                print(f"Warm-up waiting for MongoDB: {e}")
+            else:
+                print(f"Warm-up failed, retrying in {backoff}s: {readiness.warmup_error}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+    readiness.warm = True
+    readiness.warmup_error = None
+    readiness.warmup_seconds = round(time.perf_counter() - started, 3)
+    print(f"Warm-up finished in {readiness.warmup_seconds}s")
+
+async def report() -> dict:
+    mongodb = await ping_mongo()
+    dependencies = {
+        "mongodb": mongodb,
+        "upload_dir": {"status": "ok" if os.access(settings.UPLOAD_DIR, os.W_OK) else "error"},
+        "change_streams": {"status": "ok" if invalidation_bus.enabled else "disabled"},
+    }
+    caches = {
+        "listings": len(listings.listing_cache) > 0,
+        "tags": listings.tag_catalog.loaded,
+        "duplicates": duplicate_index.ready,
+        "suggest": suggest_index.ready,
+        "related": related_index.matrix is not None,
+    }
+    return {
+        "ready": readiness.warm and mongodb["status"] == "ok",
+        "warm": readiness.warm,
+        "warmup_seconds": readiness.warmup_seconds,
+        "warmup_error": readiness.warmup_error,
+        "dependencies": dependencies,
+        "caches": caches,
+    }
+
+_task: Optional[asyncio.Task] = None
+
+def start(app: FastAPI):
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(warm_up(app))
@@ -0,0 +1,215 @@
+import asyncio
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from ..config import settings
+from ..repositories.questions import question_repo
+from .duplicates import tokenize
+from .invalidation import invalidation_bus
+
+# Tags say more about a question's topic than any single title word
+TAG_WEIGHT = 2
+
+def features(title: str, tags: List[str]) -> Counter:
+    counts = Counter(tokenize(title or ""))
+    for tag in tags or []:
+        counts[f"tag:{tag.lower()}"] += TAG_WEIGHT
+    return counts
+
+class TfidfMatrix:
+    """L2-normalised TF-IDF rows in CSR form, plus a CSC copy for term -> rows lookups."""
+
+    def __init__(self, ids: List[str], titles: List[str], rows: List[Counter]):
+        self.ids = ids
+        self.titles = titles
+        self.row_of_id = {qid: i for i, qid in enumerate(ids)}
+        self.vocab: Dict[str, int] = {}
+        n = len(rows)
+
+        indptr = [0]
+        indices: List[int] = []
+        counts: List[float] = []
+        for row in rows:
+            for term, count in row.items():
+                indices.append(self.vocab.setdefault(term, len(self.vocab)))
+                counts.append(count)
+            indptr.append(len(indices))
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        counts_array = np.asarray(counts, dtype=np.float32)
+
+        df = np.bincount(self.indices, minlength=len(self.vocab))
+        self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        data = (1 + np.log(counts_array)) * self.idf[self.indices]
+        row_index = np.repeat(np.arange(n), np.diff(self.indptr))
+        norms = np.sqrt(np.bincount(row_index, weights=data ** 2, minlength=n))
+        norms[norms == 0] = 1
+        self.data = (data / norms[row_index]).astype(np.float32)
+
+        order = np.argsort(self.indices, kind="stable")
+        self.csc_rows = row_index[order].astype(np.int32)
+        self.csc_data = self.data[order]
+        self.csc_indptr = np.concatenate(([0], np.cumsum(np.bincount(self.indices, minlength=len(self.vocab))))).astype(np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row_vector(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def vectorize(self, counts: Counter) -> Tuple[np.ndarray, np.ndarray]:
+        """Project a document onto this matrix's vocabulary; unseen terms carry no weight here."""
+        known = [(self.vocab[t], c) for t, c in counts.items() if t in self.vocab]
+        if not known:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        indices = np.fromiter((i for i, _ in known), dtype=np.int32, count=len(known))
+        weights = (1 + np.log(np.fromiter((c for _, c in known), dtype=np.float32, count=len(known)))) * self.idf[indices]
+        return indices, weights / np.linalg.norm(weights)
+
+    def scores(self, indices: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Cosine similarity of a normalised query vector against every row."""
+        if len(indices) == 0:
+            return np.zeros(len(self.ids), dtype=np.float32)
+        slices = [slice(self.csc_indptr[t], self.csc_indptr[t + 1]) for t in indices]
+        rows = np.concatenate([self.csc_rows[s] for s in slices])
+        contributions = np.concatenate([self.csc_data[s] * w for s, w in zip(slices, weights)])
+        return np.bincount(rows, weights=contributions, minlength=len(self.ids))
+
+class RelatedIndex:
+    """Batch-built TF-IDF matrix plus a small delta of questions written since the last build."""
+
+    def __init__(self):
+        self.matrix: Optional[TfidfMatrix] = None
+        # question_id -> (title, term counts, vector against the current matrix, written at)
+        self._delta: "OrderedDict[str, tuple]" = OrderedDict()
+        self._removed: Dict[str, float] = {}
+        self._cache: "OrderedDict[str, Tuple[float, int, List[dict]]]" = OrderedDict()
+
+    def replace(self, matrix: TfidfMatrix, snapshot_started: float):
+        """Swap in a rebuilt matrix, keeping writes that happened after its snapshot was taken."""
+        self.matrix = matrix
+        delta = [(qid, entry) for qid, entry in self._delta.items() if entry[3] >= snapshot_started]
+        self._delta = OrderedDict((qid, (title, counts, matrix.vectorize(counts), ts)) for qid, (title, counts, _, ts) in delta)
+        self._removed = {qid: ts for qid, ts in self._removed.items() if ts >= snapshot_started}
+        self._cache.clear()
+
+    def add(self, question_id: str, title: str, tags: List[str]):
+        question_id = str(question_id)
+        counts = features(title, tags)
+        vector = self.matrix.vectorize(counts) if self.matrix is not None else None
+        now = time.monotonic()
+        self._delta.pop(question_id, None)
+        self._delta[question_id] = (title, counts, vector, now)
+        # A re-added question supersedes its row in the batch matrix
+        self._removed[question_id] = now
+        self._cache.pop(question_id, None)
+
+    def remove(self, question_id: str):
+        question_id = str(question_id)
+        self._delta.pop(question_id, None)
+        self._removed[question_id] = time.monotonic()
+        self._cache.pop(question_id, None)
+
+    def _query_vector(self, question_id: str, fallback: Optional[Tuple[str, List[str]]]):
+        matrix = self.matrix
+        if question_id in self._delta:
+            return self._delta[question_id][2]
+        if question_id in matrix.row_of_id and question_id not in self._removed:
+            return matrix.row_vector(matrix.row_of_id[question_id])
+        if fallback is not None:
+            return matrix.vectorize(features(*fallback))
+        return None
+
+    def related(self, question_id: str, limit: int, fallback: Optional[Tuple[str, List[str]]] = None) -> Optional[List[dict]]:
+        question_id = str(question_id)
+        cached = self._cache.get(question_id)
+        if cached and time.monotonic() - cached[0] < settings.RELATED_CACHE_TTL and cached[1] >= limit:
+            self._cache.move_to_end(question_id)
+            return [r for r in cached[2] if r["id"] not in self._removed or r["id"] in self._delta][:limit]
+
+        matrix = self.matrix
+        if matrix is None:
+            return None
+        query = self._query_vector(question_id, fallback)
+        if query is None:
+            return None
+        indices, weights = query
+
+        candidates: List[Tuple[float, str, str]] = []
+        scores = matrix.scores(indices, weights)
+        # Over-fetch so rows superseded by the delta can be dropped
+        wanted = min(limit + 1 + len(self._removed), len(scores))
+        if wanted:
+            top = np.argpartition(-scores, wanted - 1)[:wanted] if wanted < len(scores) else np.arange(len(scores))
+            for row in top:
+                qid = matrix.ids[row]
+                if scores[row] > 0 and qid != question_id and qid not in self._removed:
+                    candidates.append((float(scores[row]), qid, matrix.titles[row]))
+
+        # Questions written since the last build are few, score them directly
+        query_weights = dict(zip(indices.tolist(), weights.tolist()))
+        for qid, (title, _, (d_indices, d_weights), _) in self._delta.items():
+            if qid == question_id:
+                continue
+            score = sum(query_weights.get(i, 0.0) * w for i, w in zip(d_indices.tolist(), d_weights.tolist()))
+            if score > 0:
+                candidates.append((score, qid, title))
+
+        candidates.sort(reverse=True)
+        results = [{"id": qid, "title": title, "score": round(score, 4)} for score, qid, title in candidates[:limit]]
+        self._cache[question_id] = (time.monotonic(), limit, results)
+        while len(self._cache) > settings.RELATED_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return results
+
+related_index = RelatedIndex()
+
+async def rebuild_index(batch_size: int = 5000):
+    snapshot_started = time.monotonic()
+    cursor = question_repo.scan({"title": 1, "tags": 1}, batch_size)
+    ids, titles, rows = [], [], []
+    async for q in cursor:
+        ids.append(str(q["_id"]))
+        titles.append(q.get("title", ""))
+        rows.append(features(q.get("title", ""), q.get("tags", [])))
+    # Building the matrix is pure NumPy work, keep it off the event loop
+    matrix = await asyncio.get_running_loop().run_in_executor(None, TfidfMatrix, ids, titles, rows)
+    related_index.replace(matrix, snapshot_started)
+
+@invalidation_bus.subscribe("questions", fields=("title", "tags"))
+def _on_question_changed(event: dict):
+    question_id = str(event["documentKey"]["_id"])
+    question = event.get("fullDocument")
+    if event["operationType"] == "delete":
+        related_index.remove(question_id)
+    elif question:
+        related_index.add(question_id, question.get("title", ""), question.get("tags", []))
+
+invalidation_bus.on_reset(rebuild_index)
+
+_rebuild_task: Optional[asyncio.Task] = None
+
+async def _rebuild_loop():
+    while True:
+        try:
+            await rebuild_index()
+        except Exception as e:
+            print(f"Related questions index rebuild failed: {e}")
+        await asyncio.sleep(settings.RELATED_REBUILD_INTERVAL)
+
+def start():
+    global _rebuild_task
+    if _rebuild_task is None:
+        _rebuild_task = asyncio.create_task(_rebuild_loop())
+
+async def stop():
+    global _rebuild_task
+    if _rebuild_task is not None:
+        _rebuild_task.cancel()
+        try:
+            await _rebuild_task
+        except asyncio.CancelledError:
+            pass
+        _rebuild_task = None
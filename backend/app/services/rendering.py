@@ -0,0 +1,126 @@
+import html
+import re
+from html.parser import HTMLParser
+from typing import List, Optional
+
+# Bump whenever the output of render_body changes so stored HTML gets re-rendered
+RENDERER_VERSION = 2
+
+ALLOWED_TAGS = {
+    "p", "br", "strong", "b", "em", "i", "u", "s", "strike", "a", "ul", "ol", "li",
+    "blockquote", "pre", "code", "h1", "h2", "h3", "h4", "h5", "h6", "img", "span",
+    "sub", "sup", "hr",
+}
+# Elements without content or end tag, allowed or not
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+# Elements dropped together with everything inside them
+DROP_CONTENT_TAGS = {"script", "style", "iframe", "object", "embed", "template", "noscript", "svg", "math"}
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "target"},
+    "img": {"src", "alt", "width", "height"},
+}
+# Quill expresses alignment, indentation and code blocks through ql-* classes
+QUILL_CLASS = re.compile(r"^ql-[a-z0-9-]+$")
+SAFE_URL = re.compile(r"^(https?://|mailto:|/(?!/)|#)", re.IGNORECASE)
+SAFE_IMAGE_URL = re.compile(r"^(https?://|/(?!/)|data:image/(png|jpeg|gif|webp);base64,)", re.IGNORECASE)
+HTML_TAG = re.compile(r"<[a-zA-Z/][^>]*>")
+
+class _Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out: List[str] = []
+        self.open_tags: List[str] = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            if tag not in VOID_TAGS:
+                self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        rendered = self._render_attrs(tag, attrs)
+        if rendered is None:
+            return
+        # Unclosed <li>/<p> end implicitly at the next sibling, as browsers do
+        if tag in ("li", "p") and self.open_tags and self.open_tags[-1] == tag:
+            self.out.append(f"</{self.open_tags.pop()}>")
+        self.out.append(f"<{tag}{rendered}>")
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        # <svg/> has no content, so what follows it is not dropped
+        if tag in DROP_CONTENT_TAGS or (tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag):
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            if tag not in VOID_TAGS:
+                self.dropping = max(self.dropping - 1, 0)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        # Close anything left open inside this element so the output stays well formed
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.out.append(f"</{open_tag}>")
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.out.append(html.escape(data, quote=False))
+
+    def _render_attrs(self, tag, attrs) -> Optional[str]:
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        parts = []
+        for name, value in attrs:
+            value = value or ""
+            if name == "class":
+                classes = [c for c in value.split() if QUILL_CLASS.match(c)]
+                if classes:
+                    parts.append(f' class="{html.escape(" ".join(classes))}"')
+                continue
+            if name not in allowed:
+                continue
+            if name == "href" and not SAFE_URL.match(value.strip()):
+                continue
+            if name == "src" and not SAFE_IMAGE_URL.match(value.strip()):
+                return None if tag == "img" else ""
+            if name == "target":
+                value = "_blank"
+            parts.append(f' {name}="{html.escape(value.strip())}"')
+        if tag == "img" and not any(p.startswith(" src=") for p in parts):
+            return None
+        if tag == "a":
+            parts.append(' rel="nofollow noopener noreferrer"')
+        return "".join(parts)
+
+    def result(self) -> str:
+        while self.open_tags:
+            self.out.append(f"</{self.open_tags.pop()}>")
+        return "".join(self.out)
+
+def sanitize_html(source: str) -> str:
+    parser = _Sanitizer()
+    parser.feed(source)
+    parser.close()
+    return parser.result()
+
+def render_plain_text(source: str) -> str:
+    paragraphs = [p for p in re.split(r"\n\s*\n", source.strip()) if p.strip()]
+    return "".join(f"<p>{html.escape(p).replace(chr(10), '<br>')}</p>" for p in paragraphs)
+
+def render_body(source: str) -> str:
+    """Canonical, sanitized HTML for a question description or answer body."""
+    if not source:
+        return ""
+    if HTML_TAG.search(source):
+        return sanitize_html(source)
+    return render_plain_text(source)
+
+def rendered_fields(field: str, source: str) -> dict:
+    """Fields to store next to ``field`` so reads can return precomputed HTML."""
+    return {f"{field}_html": render_body(source), "render_version": RENDERER_VERSION}
@@ -0,0 +1,238 @@
+import asyncio
+import bisect
+import datetime
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from ..config import settings
+from ..repositories.answers import answer_repo
+from ..repositories.questions import question_repo
+from ..repositories.users import user_repo
+from ..repositories.ledger import ledger_repo
+from .invalidation import invalidation_bus
+
+# Points earned by a content author for each vote value cast on their post
+REPUTATION_RULES = {
+    "question": {1: 5, -1: -2},
+    "answer": {1: 10, -1: -2},
+}
+
+# Points for the author of an accepted answer (not awarded for accepting one's own)
+ACCEPTED_ANSWER_POINTS = 15
+
+def vote_points(target: str, vote_value: int) -> int:
+    return REPUTATION_RULES[target].get(vote_value, 0)
+
+def vote_delta(target: str, old_vote: int, new_vote: int) -> int:
+    """Reputation change for the author when a vote moves from ``old_vote`` to ``new_vote`` (0 = no vote)."""
+    return vote_points(target, new_vote) - vote_points(target, old_vote)
+
+def accepted_points(question: Optional[dict], answer: dict) -> int:
+    """Reputation ``answer``'s author holds for it being accepted on ``question``."""
+    if not question or question.get("accepted_answer_id") != answer["_id"]:
+        return 0
+    return 0 if question.get("author_id") == answer["author_id"] else ACCEPTED_ANSWER_POINTS
+
+def votes_points(target: str, user_votes: dict, author_id) -> int:
+    """Total reputation a post's votes are worth to its author, ignoring self-votes."""
+    author = str(author_id)
+    return sum(vote_points(target, v) for voter, v in (user_votes or {}).items() if voter != author)
+
+class Leaderboard:
+    """Users ordered by reputation, kept as a sorted list of ``(-reputation, user_id)``."""
+
+    def __init__(self):
+        self._ranked: List[Tuple[int, str]] = []
+        self._users: Dict[str, Tuple[int, str]] = {}  # user_id -> (reputation, username)
+
+    def load(self, users: List[dict]):
+        self._users = {str(u["_id"]): (u.get("reputation", 0), u["username"]) for u in users}
+        self._ranked = sorted((-rep, uid) for uid, (rep, _) in self._users.items())
+
+    def set(self, user_id: str, reputation: int, username: Optional[str] = None):
+        user_id = str(user_id)
+        current = self._users.get(user_id)
+        if current is not None:
+            index = bisect.bisect_left(self._ranked, (-current[0], user_id))
+            if index < len(self._ranked) and self._ranked[index] == (-current[0], user_id):
+                del self._ranked[index]
+            username = username or current[1]
+        if username is None:
+            return
+        self._users[user_id] = (reputation, username)
+        bisect.insort(self._ranked, (-reputation, user_id))
+
+    def remove(self, user_id: str):
+        current = self._users.pop(str(user_id), None)
+        if current is not None:
+            index = bisect.bisect_left(self._ranked, (-current[0], str(user_id)))
+            if index < len(self._ranked) and self._ranked[index] == (-current[0], str(user_id)):
+                del self._ranked[index]
+
+    def rename(self, user_id: str, username: str):
+        current = self._users.get(str(user_id))
+        if current is not None:
+            self._users[str(user_id)] = (current[0], username)
+
+    def top(self, limit: int) -> List[dict]:
+        return [
+            {"rank": i + 1, "user_id": uid, "username": self._users[uid][1], "reputation": -neg_rep}
+            for i, (neg_rep, uid) in enumerate(self._ranked[:limit])
+        ]
+
+    def rank(self, user_id: str) -> Optional[dict]:
+        current = self._users.get(str(user_id))
+        if current is None:
+            return None
+        reputation, username = current
+        # Rank is shared between users on the same reputation
+        rank = bisect.bisect_left(self._ranked, (-reputation, "")) + 1
+        return {"rank": rank, "user_id": str(user_id), "username": username, "reputation": reputation, "total_users": len(self._ranked)}
+
+class ReputationLedger:
+    """Buffers reputation events and applies them to user documents in batches.
+
+    Every event is appended to the ``reputation_ledger`` collection and the
+    per-user sums are applied with a single ``bulk_write`` per flush.
+    """
+
+    def __init__(self, leaderboard: Leaderboard):
+        self.leaderboard = leaderboard
+        self._pending: List[dict] = []
+        self._task: Optional[asyncio.Task] = None
+        # Created on start() so they bind to the server's event loop
+        self._wakeup: Optional[asyncio.Event] = None
+        self.flush_lock: Optional[asyncio.Lock] = None
+
+    def record(self, user_id, delta: int, reason: str, source_id=None, cast: bool = False):
+        """Queue a reputation change; ``cast`` marks a vote being cast, kept even if it is worth nothing."""
+        if not delta and not cast:
+            return
+        entry = {
+            "user_id": ObjectId(str(user_id)),
+            "delta": delta,
+            "reason": reason,
+            "source_id": ObjectId(str(source_id)) if source_id is not None else None,
+            "created_at": datetime.datetime.now(),
+        }
+        if cast:
+            entry["cast"] = True
+        self._pending.append(entry)
+        if self._wakeup is not None and len(self._pending) >= settings.REPUTATION_BATCH_SIZE:
+            self._wakeup.set()
+
+    async def flush(self):
+        if self.flush_lock is None:
+            self.flush_lock = asyncio.Lock()
+        async with self.flush_lock:
+            if not self._pending:
+                return
+            entries, self._pending = self._pending, []
+            totals = defaultdict(int)
+            for entry in entries:
+                if entry["delta"]:
+                    totals[entry["user_id"]] += entry["delta"]
+            try:
+                await ledger_repo.record(entries)
+            except Exception:
+                # Nothing was applied yet, keep the batch for the next flush
+                self._pending = entries + self._pending
+                raise
+            # Scores come from the stored documents, so a change event that already carried the
+            # new reputation is not applied a second time
+            for user in await user_repo.add_reputation(totals):
+                self.leaderboard.set(str(user["_id"]), user.get("reputation", 0), user.get("username"))
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.REPUTATION_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Reputation flush failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self.flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+leaderboard = Leaderboard()
+ledger = ReputationLedger(leaderboard)
+
+async def load_leaderboard():
+    cursor = user_repo.reputations(5000)
+    leaderboard.load(await cursor.to_list(length=None))
+
+# Reputation is flushed by whichever worker recorded the vote, follow the other workers' flushes
+@invalidation_bus.subscribe("users", fields=("reputation", "username"))
+def _on_user_changed(event: dict):
+    user_id = str(event["documentKey"]["_id"])
+    if event["operationType"] == "delete":
+        leaderboard.remove(user_id)
+        return
+    user = event.get("fullDocument")
+    if user:
+        leaderboard.set(user_id, user.get("reputation", 0), user.get("username"))
+
+invalidation_bus.on_reset(load_leaderboard)
+
+async def start():
+    await load_leaderboard()
+    ledger.start()
+
+async def stop():
+    await ledger.stop()
+
+async def compute_reputation() -> Dict[ObjectId, int]:
+    """Recompute every author's reputation from the votes stored on questions and answers."""
+    totals: Dict[ObjectId, int] = defaultdict(int)
+    for repo, target in ((question_repo, "question"), (answer_repo, "answer")):
+        async for author_id, points in repo.vote_points_by_author(REPUTATION_RULES[target]):
+            totals[author_id] += points
+    async for author_id, accepted in question_repo.accepted_counts_by_author():
+        totals[author_id] += accepted * ACCEPTED_ANSWER_POINTS
+    return totals
+
+async def rebuild():
+    """Reset the ledger and every user's reputation to the totals derived from source data.
+
+    Run it with the API stopped (or otherwise not accepting votes and
+    accepts). Every worker buffers ledger entries for up to
+    ``REPUTATION_FLUSH_INTERVAL``; only this process's buffer is discarded
+    here, so entries another worker flushes afterwards would be applied on
+    top of totals that already include them.
+    """
+    if ledger.flush_lock is None:
+        ledger.flush_lock = asyncio.Lock()
+    async with ledger.flush_lock:
+        ledger._pending = []
+        totals = await compute_reputation()
+        now = datetime.datetime.now()
+
+        await ledger_repo.clear()
+        rebuilt = await user_repo.reset_reputation(totals)
+
+        entries = [
+            {"user_id": uid, "delta": points, "reason": "rebuild", "source_id": None, "created_at": now}
+            for uid, points in totals.items() if points
+        ]
+        for start_index in range(0, len(entries), 1000):
+            await ledger_repo.record(entries[start_index:start_index + 1000])
+
+    await load_leaderboard()
+    return rebuilt
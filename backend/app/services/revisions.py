@@ -0,0 +1,208 @@
+import asyncio
+import datetime
+import difflib
+import json
+import zlib
+from typing import List, Optional
+from ..config import settings
+from ..repositories.revisions import revision_repo
+
+# Fields whose history is kept, per kind of post
+TRACKED_FIELDS = {"question": ("title", "description", "tags"), "answer": ("content",)}
+
+def diff_text(old: str, new: str) -> list:
+    """Line delta turning ``old`` into ``new``.
+
+    A positive int copies that many lines of ``old``, a negative one skips
+    them and a string is inserted as is.
+    """
+    a, b = old.splitlines(keepends=True), new.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append("".join(b[j1:j2]))
+    return ops
+
+def patch_text(old: str, ops: list) -> str:
+    lines = old.splitlines(keepends=True)
+    out, position = [], 0
+    for op in ops:
+        if isinstance(op, str):
+            out.append(op)
+        elif op > 0:
+            out.extend(lines[position:position + op])
+            position += op
+        else:
+            position -= op
+    return "".join(out)
+
+def _changes(fields: tuple, before: dict, after: dict) -> dict:
+    """``{"d": ops}`` for text that diffs smaller than it is, ``{"v": value}`` for anything else that changed."""
+    changes = {}
+    for field in fields:
+        old, new = before.get(field), after.get(field)
+        if old == new:
+            continue
+        if isinstance(old, str) and isinstance(new, str):
+            ops = diff_text(old, new)
+            if len(json.dumps(ops)) < len(json.dumps(new)):
+                changes[field] = {"d": ops}
+                continue
+        changes[field] = {"v": new}
+    return changes
+
+def _revision(parent_type: str, post: dict, number: int, author_id, author_username: Optional[str], created_at: datetime.datetime, **body) -> dict:
+    return {
+        "parent_type": parent_type,
+        "parent_id": post["_id"],
+        "question_id": post.get("question_id", post["_id"]),
+        "number": number,
+        "author_id": author_id,
+        "author_username": author_username,
+        "created_at": created_at,
+        "compressed": False,
+        **body,
+    }
+
+async def record_edit(parent_type: str, before: dict, after: dict, editor) -> int:
+    """Store the revision an edit produced and return its number.
+
+    ``before`` is the post as the (atomic) edit found it, so its
+    ``revision_count`` tells which number the edit got even under
+    concurrent edits. The original text becomes revision 1 on the first
+    edit; every ``REVISION_SNAPSHOT_INTERVAL``-th revision is a full
+    snapshot and the rest are deltas against the one before.
+    """
+    fields = TRACKED_FIELDS[parent_type]
+    edits = before.get("revision_count", 0)
+    number = edits + 2
+    docs = []
+    if edits == 0:
+        docs.append(_revision(
+            parent_type, before, 1, before["author_id"], before.get("author_username"), before.get("created_at") or after["updated_at"],
+            snapshot=True, fields={f: before.get(f) for f in fields}, changed=list(fields)
+        ))
+    changes = _changes(fields, before, after)
+    if (number - 1) % settings.REVISION_SNAPSHOT_INTERVAL == 0:
+        body = {"snapshot": True, "fields": {f: after.get(f) for f in fields}}
+    else:
+        body = {"snapshot": False, "changes": changes}
+    docs.append(_revision(parent_type, after, number, editor.id, editor.username, after["updated_at"], changed=list(changes), **body))
+    await revision_repo.insert_many(docs, ordered=False)
+    return number
+
+def _payload(revision: dict) -> dict:
+    if "data" in revision:
+        return json.loads(zlib.decompress(revision["data"]))
+    return {"fields": revision.get("fields"), "changes": revision.get("changes")}
+
+def _info(revision: dict) -> dict:
+    return {
+        "number": revision["number"],
+        "author_id": str(revision["author_id"]),
+        "author_username": revision.get("author_username"),
+        "created_at": revision["created_at"],
+        "changed_fields": revision.get("changed", []),
+    }
+
+def _current(parent_type: str, post: dict) -> dict:
+    """A post that was never edited, as its only revision."""
+    return {
+        "number": 1,
+        "author_id": str(post["author_id"]),
+        "author_username": post.get("author_username"),
+        "created_at": post.get("created_at"),
+        "changed_fields": list(TRACKED_FIELDS[parent_type]),
+        **{f: post.get(f) for f in TRACKED_FIELDS[parent_type]},
+    }
+
+async def list_revisions(parent_type: str, post: dict, skip: int, limit: int) -> List[dict]:
+    """Revision metadata, newest first; ``post`` needs its tracked fields only if it may never have been edited."""
+    if not post.get("revision_count"):
+        return [_current(parent_type, post)][skip:skip + limit]
+    return [_info(r) for r in await revision_repo.page(post["_id"], skip, limit)]
+
+async def materialize(parent_type: str, post: dict, number: int) -> Optional[dict]:
+    """The tracked fields as of revision ``number``, from the nearest snapshot at or before it."""
+    if not post.get("revision_count"):
+        return _current(parent_type, post) if number == 1 else None
+    if number > post["revision_count"] + 1:
+        return None
+
+    chain = []
+    async for revision in revision_repo.back_from(post["_id"], number, settings.REVISION_SNAPSHOT_INTERVAL + 1):
+        # A gap means a concurrent edit has not written its revision yet
+        if revision["number"] != number - len(chain):
+            return None
+        chain.append(revision)
+        if revision.get("snapshot"):
+            break
+    if not chain or not chain[-1].get("snapshot"):
+        return None
+
+    fields = dict(_payload(chain[-1])["fields"])
+    for revision in reversed(chain[:-1]):
+        for field, change in _payload(revision)["changes"].items():
+            fields[field] = patch_text(fields.get(field) or "", change["d"]) if "d" in change else change["v"]
+    return {**_info(chain[0]), **fields}
+
+async def compress_old_revisions(batch_size: Optional[int] = None) -> int:
+    """zlib-compress the bodies of revisions older than ``REVISION_COMPRESS_AFTER_HOURS``, in bulk writes."""
+    batch_size = batch_size or settings.REVISION_COMPRESS_BATCH_SIZE
+    cutoff = datetime.datetime.now() - datetime.timedelta(hours=settings.REVISION_COMPRESS_AFTER_HOURS)
+    compressed = 0
+    while True:
+        batch = await revision_repo.uncompressed_before(cutoff, batch_size)
+        if not batch:
+            break
+        results = []
+        for revision in batch:
+            raw = json.dumps(_payload(revision), separators=(",", ":")).encode()
+            data = zlib.compress(raw, 9)
+            if len(data) < len(raw):
+                results.append((revision["_id"], data))
+                compressed += 1
+            else:
+                # Tiny deltas do not shrink, leave them readable and out of the next pass
+                results.append((revision["_id"], None))
+        await revision_repo.store_compressed(results)
+        if len(batch) < batch_size:
+            break
+    return compressed
+
+async def remove_for_question(question_id):
+    """Drop the history of a question and of all of its answers."""
+    await revision_repo.delete_for_question(question_id)
+
+async def remove_for_answer(answer_id):
+    await revision_repo.delete_for_parent(answer_id)
+
+_compress_task: Optional[asyncio.Task] = None
+
+async def _compress_loop():
+    while True:
+        try:
+            await compress_old_revisions()
+        except Exception as e:
+            print(f"Revision compression failed: {e}")
+        await asyncio.sleep(settings.REVISION_COMPRESS_INTERVAL)
+
+def start():
+    global _compress_task
+    if _compress_task is None:
+        _compress_task = asyncio.create_task(_compress_loop())
+
+async def stop():
+    global _compress_task
+    if _compress_task is not None:
+        _compress_task.cancel()
+        try:
+            await _compress_task
+        except asyncio.CancelledError:
+            pass
+        _compress_task = None
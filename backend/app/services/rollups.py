@@ -0,0 +1,122 @@
+import asyncio
+import datetime
+from collections import Counter
+from typing import List, Optional
+from ..config import settings
+from ..repositories.stats import DAY_FORMAT, daily_stats_repo, rollup_state_repo
+from ..repositories.users import user_repo
+from ..repositories.questions import question_repo
+from ..repositories.answers import answer_repo
+from ..repositories.ledger import ledger_repo
+
+STATE_ID = "daily_stats"
+
+# Counted per day: (collection, field in daily_stats, extra filter)
+SOURCES = (
+    (user_repo, "new_users", {}),
+    (question_repo, "questions", {}),
+    (answer_repo, "answers", {}),
+    (ledger_repo, "votes", ledger_repo.CAST),
+)
+COUNTERS = tuple(field for _, field, _ in SOURCES)
+
+def _day_start(moment: datetime.datetime) -> datetime.datetime:
+    return datetime.datetime(moment.year, moment.month, moment.day)
+
+async def roll_up(start: Optional[datetime.datetime], end: datetime.datetime):
+    """Recompute the rollups of every day in ``[start, end)`` and merge them into ``daily_stats``.
+
+    ``start`` must fall on a day boundary: each day's counts are computed
+    whole and overwrite what was stored, so running a range twice is
+    harmless. ``None`` starts from the oldest data.
+
+    Every day of the range is first reset to zeros, so readers can see a
+    day at zero while its counts are being recomputed.
+    """
+    last_day = (end - datetime.timedelta(microseconds=1)).date()
+    if start is None:
+        await daily_stats_repo.zero_through(last_day.strftime(DAY_FORMAT), COUNTERS)
+    else:
+        days, day = [], start.date()
+        while day <= last_day:
+            days.append(day.strftime(DAY_FORMAT))
+            day += datetime.timedelta(days=1)
+        await daily_stats_repo.zero_days(days, COUNTERS)
+    for repo, field, extra in SOURCES:
+        await daily_stats_repo.merge_counts(repo, field, start, end, extra)
+    await daily_stats_repo.merge_tags(question_repo, start, end)
+
+async def refresh() -> datetime.datetime:
+    """Bring the rollups up to ``ROLLUP_SETTLE_SECONDS`` ago and return the new watermark.
+
+    Only the day holding the last watermark and the days after it are
+    aggregated. Activity younger than the settle delay is left for the next
+    run, so writes that are buffered before reaching the database (such as
+    the reputation ledger's votes) are in place when their day is counted.
+    The first run, without a watermark, aggregates all history.
+    """
+    last = await rollup_state_repo.watermark(STATE_ID)
+    end = datetime.datetime.now() - datetime.timedelta(seconds=settings.ROLLUP_SETTLE_SECONDS)
+    start = _day_start(last) if last else None
+    await roll_up(start, end)
+    await rollup_state_repo.advance(STATE_ID, end)
+    return end
+
+async def backfill(first_day: datetime.date, last_day: datetime.date):
+    """Recompute a historical range of days, e.g. after an import; the watermark is left alone."""
+    start = datetime.datetime.combine(first_day, datetime.time())
+    end = datetime.datetime.combine(last_day + datetime.timedelta(days=1), datetime.time())
+    await roll_up(start, end)
+
+async def watermark() -> Optional[datetime.datetime]:
+    return await rollup_state_repo.watermark(STATE_ID)
+
+def _top_tags(counts: Counter, limit: int) -> List[dict]:
+    return [{"tag": tag, "count": count} for tag, count in counts.most_common(limit)]
+
+async def series(first_day: datetime.date, last_day: datetime.date, top_tags: int) -> dict:
+    """Per-day counters (days without activity as zeros) and the top tags of each week, from the rollups alone."""
+    stored = {doc["_id"]: doc for doc in await daily_stats_repo.between(
+        first_day.strftime(DAY_FORMAT), last_day.strftime(DAY_FORMAT)
+    )}
+    days, weeks = [], {}
+    day = first_day
+    while day <= last_day:
+        key = day.strftime(DAY_FORMAT)
+        doc = stored.get(key, {})
+        days.append({"day": key, **{field: doc.get(field, 0) for field in COUNTERS}})
+        # Weeks start on Monday; a range's first and last week may be partial
+        week = weeks.setdefault((day - datetime.timedelta(days=day.weekday())).strftime(DAY_FORMAT), Counter())
+        for entry in doc.get("tags", []):
+            week[entry["tag"]] += entry["count"]
+        day += datetime.timedelta(days=1)
+    return {
+        "days": days,
+        "weeks": [{"week": week, "top_tags": _top_tags(counts, top_tags)} for week, counts in weeks.items()],
+        "rolled_up_to": await watermark(),
+    }
+
+_task: Optional[asyncio.Task] = None
+
+async def _loop():
+    while True:
+        try:
+            await refresh()
+        except Exception as e:
+            print(f"Daily stats rollup failed: {e}")
+        await asyncio.sleep(settings.ROLLUP_INTERVAL)
+
+def start():
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_loop())
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,190 @@
+import asyncio
+import bisect
+import datetime
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from ..repositories.questions import question_repo
+from .invalidation import invalidation_bus
+
+# Word prefixes up to this length are indexed, longer query words are checked against the title
+MAX_PREFIX_LENGTH = 8
+MIN_QUERY_LENGTH = 2
+# Bound the work per keystroke when the query words rarely occur together
+MAX_SCAN = 2000
+# One order of magnitude of votes is worth this much age
+RECENCY_SECONDS = 7 * 24 * 3600
+
+WORD_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#.\-]*")
+
+def words(text: str) -> List[str]:
+    return WORD_PATTERN.findall((text or "").lower())
+
+def rank_key(votes: int, created_at: Optional[datetime.datetime]) -> float:
+    """Higher is better. Does not decay, so posting lists never need re-sorting as time passes."""
+    created_ts = (created_at or datetime.datetime.now()).timestamp()
+    return math.log10(max(votes, 0) + 1) + created_ts / RECENCY_SECONDS
+
+class SuggestIndex:
+    """Title word prefixes -> question ids, each posting list kept sorted best first."""
+
+    def __init__(self):
+        self._postings: Dict[str, List[Tuple[float, str]]] = defaultdict(list)
+        # question_id -> (title, title words, votes, created_at, sort key)
+        self._entries: Dict[str, tuple] = {}
+        # Ids written while a rebuild runs, which its snapshot must not overwrite
+        self._touched: Optional[Set[str]] = None
+        # Posting lists filled by a bulk load, sorted on first use instead of on every batch
+        self._unsorted: Set[str] = set()
+        self.ready = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _prefixes(title_words: List[str]) -> Set[str]:
+        return {w[:n] for w in title_words for n in range(1, min(len(w), MAX_PREFIX_LENGTH) + 1)}
+
+    def add(self, question_id: str, title: str, votes: int = 0, created_at: Optional[datetime.datetime] = None):
+        question_id = str(question_id)
+        self.remove(question_id)
+        title_words = words(title)
+        key = (-rank_key(votes, created_at), question_id)
+        self._entries[question_id] = (title, title_words, votes, created_at, key)
+        for prefix in self._prefixes(title_words):
+            if prefix in self._unsorted:
+                self._postings[prefix].append(key)
+            else:
+                bisect.insort(self._postings[prefix], key)
+
+    def remove(self, question_id: str):
+        question_id = str(question_id)
+        if self._touched is not None:
+            self._touched.add(question_id)
+        entry = self._entries.pop(question_id, None)
+        if entry is None:
+            return
+        _, title_words, _, _, key = entry
+        for prefix in self._prefixes(title_words):
+            posting = self._postings.get(prefix)
+            if posting is None:
+                continue
+            if prefix in self._unsorted:
+                posting.remove(key)
+            else:
+                i = bisect.bisect_left(posting, key)
+                if i < len(posting) and posting[i] == key:
+                    del posting[i]
+            if not posting:
+                del self._postings[prefix]
+                self._unsorted.discard(prefix)
+
+    def load(self, questions: List[dict]):
+        """Bulk add snapshot documents to an index being built."""
+        for q in questions:
+            question_id = str(q["_id"])
+            if question_id in self._entries:
+                continue
+            title = q.get("title", "")
+            title_words = words(title)
+            key = (-rank_key(q.get("votes", 0), q.get("created_at")), question_id)
+            self._entries[question_id] = (title, title_words, q.get("votes", 0), q.get("created_at"), key)
+            for prefix in self._prefixes(title_words):
+                self._postings[prefix].append(key)
+                self._unsorted.add(prefix)
+
+    def begin_rebuild(self):
+        self._touched = set()
+
+    def finish_rebuild(self, fresh: "SuggestIndex"):
+        """Take over ``fresh``'s entries, keeping the live state of every id written since ``begin_rebuild``."""
+        for question_id in self._touched:
+            fresh.remove(question_id)
+            entry = self._entries.get(question_id)
+            if entry is not None:
+                title, _, votes, created_at, _ = entry
+                fresh.add(question_id, title, votes, created_at)
+        self._postings, self._entries, self._unsorted = fresh._postings, fresh._entries, fresh._unsorted
+        self._touched = None
+        self.ready = True
+
+    def _sorted_posting(self, prefix: str) -> List[Tuple[float, str]]:
+        posting = self._postings[prefix]
+        if prefix in self._unsorted:
+            posting.sort()
+            self._unsorted.discard(prefix)
+        return posting
+
+    def set_votes(self, question_id: str, votes: int):
+        entry = self._entries.get(str(question_id))
+        if entry is not None and entry[2] != votes:
+            self.add(question_id, entry[0], votes, entry[3])
+
+    def set_title(self, question_id: str, title: str):
+        entry = self._entries.get(str(question_id))
+        if entry is not None:
+            self.add(question_id, title, entry[2], entry[3])
+
+    def suggest(self, query: str, limit: int = 8) -> List[dict]:
+        query_words = words(query)
+        if not query_words or len(query.strip()) < MIN_QUERY_LENGTH:
+            return []
+        prefixes = [w[:MAX_PREFIX_LENGTH] for w in query_words]
+        if not all(p in self._postings for p in prefixes):
+            return []
+
+        # Walk the shortest list in rank order, every query word must prefix some title word
+        driver = self._sorted_posting(min(prefixes, key=lambda p: len(self._postings[p])))
+        results = []
+        for _, qid in driver[:MAX_SCAN]:
+            title, title_words, votes, _, _ = self._entries[qid]
+            if all(any(t.startswith(w) for t in title_words) for w in query_words):
+                results.append({"id": qid, "title": title, "votes": votes})
+                if len(results) >= limit:
+                    break
+        return results
+
+suggest_index = SuggestIndex()
+
+_build_lock: Optional[asyncio.Lock] = None
+
+async def build_index(batch_size: int = 5000):
+    """Build the index from a snapshot of question titles and swap it in, like the duplicate index."""
+    global _build_lock
+    if _build_lock is None:
+        _build_lock = asyncio.Lock()
+    async with _build_lock:
+        fresh = SuggestIndex()
+        suggest_index.begin_rebuild()
+        try:
+            cursor = question_repo.scan({"title": 1, "votes": 1, "created_at": 1}, batch_size)
+            while True:
+                batch = await cursor.to_list(length=batch_size)
+                if not batch:
+                    break
+                fresh.load(batch)
+                await asyncio.sleep(0)
+        except BaseException:
+            suggest_index._touched = None
+            raise
+        suggest_index.finish_rebuild(fresh)
+
+@invalidation_bus.subscribe("questions", fields=("title", "votes"))
+def _on_question_changed(event: dict):
+    question_id = str(event["documentKey"]["_id"])
+    question = event.get("fullDocument")
+    if event["operationType"] == "delete":
+        suggest_index.remove(question_id)
+    elif question:
+        suggest_index.add(question_id, question.get("title", ""), question.get("votes", 0), question.get("created_at"))
+
+# A fresh index is built and swapped in, so entries of deletes missed with the lost events go too
+invalidation_bus.on_reset(build_index)
+
+_build_task: Optional[asyncio.Task] = None
+
+def start():
+    global _build_task
+    if _build_task is None:
+        _build_task = asyncio.create_task(build_index())
@@ -0,0 +1,7 @@
+from fastapi import HTTPException, status
+
+async def raise_not_found_or_forbidden(repo, document_id, not_found: str, forbidden: str):
+    """Explain why a write filtered on ownership matched nothing; only runs on the failure path."""
+    if await repo.has(document_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=forbidden)
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=not_found)
@@ -0,0 +1,50 @@
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+
+# Responses carrying an ETag must still be revalidated before reuse
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts, weak: bool = False) -> str:
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:24]
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against ``etag`` (RFC 9110 13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    return etag_matches(request.headers.get("if-none-match"), etag)
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL})
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+
+def question_etag(question: dict) -> str:
+    # View counts are left out so other readers' views do not defeat revalidation;
+    # a copy that differs only in views is equivalent, which makes this a weak validator
+    return make_etag(
+        question["_id"],
+        question.get("version", 0),
+        question.get("updated_at"),
+        question.get("votes", 0),
+        question.get("answers_count", 0),
+        weak=True,
+    )
+
+# Fields needed to compute question_etag without loading the document body
+QUESTION_ETAG_PROJECTION = {"version": 1, "updated_at": 1, "votes": 1, "answers_count": 1}
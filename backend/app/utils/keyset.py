@@ -0,0 +1,25 @@
+import datetime
+from typing import Optional, Tuple
+from bson import ObjectId
+
+# MongoDB stores dates with millisecond precision, so cursors do too
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MILLISECOND = datetime.timedelta(milliseconds=1)
+
+def encode_cursor(value: datetime.datetime, document_id: ObjectId) -> str:
+    """Opaque position after a ``(date, _id)`` pair, for keyset paging."""
+    return f"{(value - _EPOCH) // _MILLISECOND}.{document_id}"
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime.datetime, ObjectId]]:
+    millis, _, document_id = cursor.partition(".")
+    if not millis.lstrip("-").isdigit() or not ObjectId.is_valid(document_id):
+        return None
+    return _EPOCH + int(millis) * _MILLISECOND, ObjectId(document_id)
+
+def after(field: str, value: datetime.datetime, document_id: ObjectId, descending: bool) -> dict:
+    """Filter for the documents sorted after ``(value, document_id)`` by ``[(field, d), ("_id", d)]``."""
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {field: {op: value}},
+        {field: value, "_id": {op: document_id}},
+    ]}
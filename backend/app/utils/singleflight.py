@@ -0,0 +1,118 @@
+import asyncio
+import json
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+from bson import json_util
+from ..database import get_collection
+
+# Per-key counters kept for the most recently used keys only
+MAX_TRACKED_KEYS = 1000
+
+def normalize(value: Any) -> Hashable:
+    """Hashable, key-order independent form of a filter or projection."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(v) for v in value)
+    return value
+
+class KeyMetrics:
+    __slots__ = ("label", "calls", "shared", "errors", "max_waiters", "_waiters")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.calls = 0  # database calls actually made
+        self.shared = 0  # callers served by another caller's in-flight call
+        self.errors = 0
+        self.max_waiters = 0
+        self._waiters = 0
+
+    def as_dict(self) -> dict:
+        return {"key": self.label, "calls": self.calls, "shared": self.shared, "errors": self.errors, "max_waiters": self.max_waiters}
+
+class SingleFlight:
+    """Lets concurrent identical reads share one in-flight database call.
+
+    The call runs in its own task and every caller awaits it through
+    ``asyncio.shield``, so a caller going away (a client disconnect cancels its
+    request) never cancels the query for the others. Results are shared between
+    callers and must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._metrics: "OrderedDict[Hashable, KeyMetrics]" = OrderedDict()
+
+    def _metrics_for(self, key: Hashable, describe: Optional[Callable[[], str]]) -> KeyMetrics:
+        metrics = self._metrics.get(key)
+        if metrics is None:
+            metrics = self._metrics[key] = KeyMetrics(describe() if describe else str(key))
+            while len(self._metrics) > MAX_TRACKED_KEYS:
+                self._metrics.popitem(last=False)
+        else:
+            self._metrics.move_to_end(key)
+        return metrics
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable], describe: Optional[Callable[[], str]] = None):
+        metrics = self._metrics_for(key, describe)
+        task = self._inflight.get(key)
+        if task is None:
+            metrics.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t, metrics))
+        else:
+            metrics.shared += 1
+        metrics._waiters += 1
+        metrics.max_waiters = max(metrics.max_waiters, metrics._waiters)
+        try:
+            return await asyncio.shield(task)
+        finally:
+            metrics._waiters -= 1
+
+    def _finished(self, key: Hashable, task: asyncio.Task, metrics: KeyMetrics):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Retrieve the outcome so an error nobody is left waiting for is not reported as unhandled
+        if not task.cancelled() and task.exception() is not None:
+            metrics.errors += 1
+
+    def stats(self, limit: int = 50) -> List[dict]:
+        ranked = sorted(self._metrics.values(), key=lambda m: (m.shared, m.calls), reverse=True)
+        return [m.as_dict() for m in ranked[:limit]]
+
+read_flight = SingleFlight()
+
+def _label(collection_name: str, op: str, spec: dict) -> str:
+    return f"{collection_name}.{op} {json.dumps(json.loads(json_util.dumps(spec)), sort_keys=True)}"
+
+async def find_one_shared(collection_name: str, filter: dict, projection: Optional[dict] = None) -> Optional[dict]:
+    key = (collection_name, "find_one", normalize(filter), normalize(projection))
+    return await read_flight.do(
+        key,
+        lambda: get_collection(collection_name).find_one(filter, projection),
+        lambda: _label(collection_name, "find_one", {"filter": filter, "projection": projection})
+    )
+
+async def find_shared(
+    collection_name: str,
+    filter: dict,
+    sort: Optional[list] = None,
+    skip: int = 0,
+    limit: int = 0,
+    projection: Optional[dict] = None,
+) -> List[dict]:
+    # Sort order is significant, so it is keyed as given rather than normalized
+    key = (collection_name, "find", normalize(filter), tuple(map(tuple, sort or [])), skip, limit, normalize(projection))
+
+    async def run():
+        cursor = get_collection(collection_name).find(filter, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        return await cursor.skip(skip).limit(limit).to_list(length=limit or None)
+
+    return await read_flight.do(
+        key,
+        run,
+        lambda: _label(collection_name, "find", {"filter": filter, "sort": sort, "skip": skip, "limit": limit, "projection": projection})
+    )
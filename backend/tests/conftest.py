@@ -0,0 +1,69 @@
+"""Shared fixtures.
+
+Tests run against the in-memory backend by default. Set
+``TEST_MONGODB_URL`` (e.g. ``mongodb://localhost:27017``) to run them
+against a real mongod instead; they use, and drop, the ``stackit_test``
+database there.
+"""
+import datetime
+import os
+import pytest
+from bson import ObjectId
+from app.config import settings
+from app.database import db, connect_to_mongo, close_mongo_connection, ensure_indexes
+from app.models.user import UserInDB
+
+TEST_MONGODB_URL = os.getenv("TEST_MONGODB_URL")
+
+@pytest.fixture
+async def database(monkeypatch):
+    if TEST_MONGODB_URL:
+        monkeypatch.setattr(settings, "DATABASE_BACKEND", "mongodb")
+        monkeypatch.setattr(settings, "MONGODB_URL", TEST_MONGODB_URL)
+        monkeypatch.setattr(settings, "DATABASE_NAME", "stackit_test")
+    else:
+        monkeypatch.setattr(settings, "DATABASE_BACKEND", "memory")
+    await connect_to_mongo()
+    if TEST_MONGODB_URL:
+        await db.client.drop_database(settings.DATABASE_NAME)
+    await ensure_indexes()
+    yield db.db
+    if TEST_MONGODB_URL:
+        await db.client.drop_database(settings.DATABASE_NAME)
+    await close_mongo_connection()
+
+def make_user(username: str, **fields) -> UserInDB:
+    return UserInDB(
+        id=ObjectId(),
+        username=username,
+        email=f"{username}@example.com",
+        full_name=username.title(),
+        hashed_password="not-a-hash",
+        **fields
+    )
+
+async def insert_user(database, username: str) -> UserInDB:
+    user = make_user(username)
+    await database["users"].insert_one({**user.dict(by_alias=True), "_id": user.id})
+    return user
+
+async def insert_question(database, author: UserInDB, **fields) -> dict:
+    now = datetime.datetime.now()
+    question = {
+        "_id": ObjectId(),
+        "title": "How do I keep vote totals exact?",
+        "description": "A question used by the tests.",
+        "tags": ["python"],
+        "author_id": author.id,
+        "author_username": author.username,
+        "votes": 0,
+        "user_votes": {},
+        "views": 0,
+        "answers_count": 0,
+        "is_answered": False,
+        "created_at": now,
+        "updated_at": now,
+        **fields,
+    }
+    await database["questions"].insert_one(question)
+    return question
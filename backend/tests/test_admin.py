@@ -0,0 +1,59 @@
+import datetime
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from app.api import admin
+from app.config import settings
+from app.services import rollups
+from app.services.mentions import resolve_usernames
+from .conftest import insert_question, insert_user
+
+async def test_banning_and_unbanning_update_mention_lookups(database):
+    admin_user = await insert_user(database, "moderator")
+    member = await insert_user(database, "troublemaker")
+    assert await resolve_usernames(["troublemaker"]) == {"troublemaker": member.id}
+
+    await admin.ban_user(str(member.id), admin_user)
+    assert await resolve_usernames(["troublemaker"]) == {}
+
+    await admin.unban_user(str(member.id), admin_user)
+    assert await resolve_usernames(["troublemaker"]) == {"troublemaker": member.id}
+
+def _on(day: int) -> datetime.datetime:
+    # January 2024 starts on a Monday
+    return datetime.datetime(2024, 1, day, 12)
+
+async def test_daily_stats_are_served_from_the_rollups(database, monkeypatch):
+    monkeypatch.setattr(settings, "ROLLUP_SETTLE_SECONDS", 0)
+    admin_user = await insert_user(database, "moderator")
+    for day, tags in ((1, ["python", "rust"]), (3, ["python"]), (3, ["python", "go"]), (9, ["go"])):
+        await insert_question(database, admin_user, tags=tags, created_at=_on(day))
+    await database["answers"].insert_one({"_id": ObjectId(), "content": "An answer.", "author_id": admin_user.id, "created_at": _on(3)})
+
+    # Nothing is counted until the rollups have run
+    before = await admin.get_daily_stats(datetime.date(2024, 1, 1), datetime.date(2024, 1, 9), 2, admin_user)
+    assert sum(day["questions"] for day in before["days"]) == 0 and before["rolled_up_to"] is None
+
+    await rollups.refresh()
+    stats = await admin.get_daily_stats(datetime.date(2024, 1, 1), datetime.date(2024, 1, 9), 2, admin_user)
+    assert [(day["day"], day["questions"], day["answers"]) for day in stats["days"] if day["questions"] or day["answers"]] == [
+        ("2024-01-01", 1, 0), ("2024-01-03", 2, 1), ("2024-01-09", 1, 0)
+    ]
+    assert len(stats["days"]) == 9
+    assert stats["weeks"] == [
+        {"week": "2024-01-01", "top_tags": [{"tag": "python", "count": 3}, {"tag": "rust", "count": 1}]},
+        {"week": "2024-01-08", "top_tags": [{"tag": "go", "count": 1}]},
+    ]
+    assert stats["rolled_up_to"] is not None
+
+    # A later run only recomputes from the watermark's day, and does not double count
+    await rollups.refresh()
+    again = await admin.get_daily_stats(datetime.date(2024, 1, 1), datetime.date(2024, 1, 9), 2, admin_user)
+    assert again["days"] == stats["days"]
+
+async def test_daily_stats_reject_bad_ranges(database):
+    admin_user = await insert_user(database, "moderator")
+    for start, end in ((datetime.date(2024, 1, 9), datetime.date(2024, 1, 1)), (datetime.date(2000, 1, 1), datetime.date(2024, 1, 1))):
+        with pytest.raises(HTTPException) as raised:
+            await admin.get_daily_stats(start, end, 10, admin_user)
+        assert raised.value.status_code == 400
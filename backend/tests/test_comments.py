@@ -0,0 +1,70 @@
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from app.api import answers, comments as comment_routes
+from app.models.answer import AnswerCreate
+from app.models.comment import CommentCreate
+from app.services.comments import BUCKET_SIZE
+from .conftest import insert_question, insert_user
+
+async def _comment(parent_type: str, parent_id: str, user, content: str):
+    return await comment_routes.create_comment(CommentCreate(content=content), parent_type, parent_id, user)
+
+async def test_comments_page_across_buckets(database):
+    author, commenter = await insert_user(database, "author"), await insert_user(database, "commenter")
+    question = await insert_question(database, author)
+    question_id = str(question["_id"])
+
+    for i in range(BUCKET_SIZE + 5):
+        await _comment("question", question_id, commenter, f"comment {i}")
+
+    first = await comment_routes.get_comments("question", question_id, 0, 30)
+    second = await comment_routes.get_comments("question", question_id, first.next_cursor, 30)
+    assert [c.content for c in first.comments + second.comments] == [f"comment {i}" for i in range(BUCKET_SIZE + 5)]
+    assert second.next_cursor is None
+    # Comments on someone else's question fold into one unread notification for its author
+    (notification,) = await database["notifications"].find({"recipient_id": author.id, "type": "comment"}).to_list(length=None)
+    assert notification["count"] == BUCKET_SIZE + 5
+
+async def test_thread_returns_the_first_comments_of_each_post(database):
+    author = await insert_user(database, "author")
+    question = await insert_question(database, author)
+    question_id = str(question["_id"])
+    answer = await answers.create_answer(AnswerCreate(content="An answer to comment on."), question_id, author)
+
+    await _comment("question", question_id, author, "on the question")
+    await _comment("answer", answer.id, author, "on the answer")
+    silent = str(ObjectId())
+
+    thread = await comment_routes.get_thread_comments(question_id, f"{answer.id},{silent}", 5)
+    assert [c.content for c in thread[question_id].comments] == ["on the question"]
+    assert [c.content for c in thread[answer.id].comments] == ["on the answer"]
+    assert thread[silent].comments == [] and thread[silent].next_cursor is None
+    # Commenting on your own posts notifies nobody
+    assert await database["notifications"].count_documents({}) == 0
+
+async def test_only_the_author_may_delete_a_comment(database):
+    author, other = await insert_user(database, "author"), await insert_user(database, "other")
+    question = await insert_question(database, author)
+    comment = await _comment("question", str(question["_id"]), author, "mine to delete")
+
+    with pytest.raises(HTTPException) as raised:
+        await comment_routes.delete_comment(comment.id, other)
+    assert raised.value.status_code == 403
+
+    await comment_routes.delete_comment(comment.id, author)
+    page = await comment_routes.get_comments("question", str(question["_id"]), 0, 20)
+    assert page.comments == []
+
+    with pytest.raises(HTTPException) as raised:
+        await comment_routes.delete_comment(comment.id, author)
+    assert raised.value.status_code == 404
+
+async def test_comment_on_a_missing_post_is_not_found(database):
+    user = await insert_user(database, "user")
+    with pytest.raises(HTTPException) as raised:
+        await _comment("answer", str(ObjectId()), user, "nobody is listening")
+    assert raised.value.status_code == 404
+    with pytest.raises(HTTPException) as raised:
+        await _comment("question", "not-an-id", user, "nobody is listening")
+    assert raised.value.status_code == 400
@@ -0,0 +1,88 @@
+import pytest
+from fastapi import HTTPException
+from app.api import feed, questions
+from app.config import settings
+from app.models.question import QuestionCreate
+from app.models.user import UserInDB
+from app.services import feeds
+from .conftest import insert_user
+
+@pytest.fixture(autouse=True)
+def fresh_feed_state():
+    feeds.popular_tags.reset()
+    feeds.feed_writer._pending.clear()
+
+async def _reload(database, user: UserInDB) -> UserInDB:
+    # The routes read followed_tags from the current user, as loaded per request
+    return UserInDB(**await database["users"].find_one({"_id": user.id}))
+
+async def _ask(author, title: str, tags):
+    question = await questions.create_question(QuestionCreate(title=title, description="A question asked by the feed tests.", tags=tags), author)
+    await feeds.feed_writer.flush()
+    return question
+
+async def _titles(user, limit: int = 20, cursor=None):
+    page = await feed.get_feed(cursor, limit, user)
+    return [q.title for q in page.questions], page.next_cursor
+
+async def test_feed_shows_followed_tags_newest_first(database):
+    author, reader = await insert_user(database, "author"), await insert_user(database, "reader")
+    await _ask(author, "Asked before following", ["python"])
+
+    await feed.follow_tag("python", reader)
+    reader = await _reload(database, reader)
+    assert await feed.get_followed_tags(reader) == ["python"]
+
+    await _ask(author, "Asked about another tag", ["rust"])
+    await _ask(author, "Asked after following", ["python", "asyncio"])
+    await _ask(author, "Asked most recently", ["python"])
+
+    titles, _ = await _titles(reader)
+    assert titles == ["Asked most recently", "Asked after following", "Asked before following"]
+    first, cursor = await _titles(reader, limit=2)
+    rest, last = await _titles(reader, limit=2, cursor=cursor)
+    assert (first + rest, last) == (titles, None)
+
+    # Authors do not get their own questions, and unfollowing empties the feed
+    assert await _titles(await _reload(database, author)) == ([], None)
+    await feed.unfollow_tag("python", reader)
+    assert await _titles(await _reload(database, reader)) == ([], None)
+
+async def test_follow_limits_and_errors(database, monkeypatch):
+    monkeypatch.setattr(settings, "FEED_MAX_FOLLOWED_TAGS", 2)
+    reader = await insert_user(database, "reader")
+    for tag in ("python", "rust"):
+        await feed.follow_tag(tag, reader)
+    reader = await _reload(database, reader)
+
+    assert (await feed.follow_tag("python", reader))["message"] == "Tag already followed"
+    with pytest.raises(HTTPException) as raised:
+        await feed.follow_tag("go", reader)
+    assert raised.value.status_code == 400
+    with pytest.raises(HTTPException) as raised:
+        await feed.unfollow_tag("go", reader)
+    assert raised.value.status_code == 404
+    with pytest.raises(HTTPException) as raised:
+        await feed.get_feed("not-a-cursor", 20, reader)
+    assert raised.value.status_code == 400
+
+async def test_popular_tags_are_merged_on_read_and_backfilled_when_demoted(database, monkeypatch):
+    monkeypatch.setattr(settings, "FEED_POPULAR_TAG_FOLLOWERS", 2)
+    monkeypatch.setattr(settings, "FEED_POPULAR_TAG_KEEP_FOLLOWERS", 2)
+    author = await insert_user(database, "author")
+    readers = [await insert_user(database, f"reader{i}") for i in range(2)]
+    for reader in readers:
+        await feed.follow_tag("python", reader)
+    readers = [await _reload(database, reader) for reader in readers]
+
+    # Popular: nothing is fanned out, reads go to the questions collection
+    await _ask(author, "Asked while popular", ["python"])
+    assert await database["timelines"].count_documents({"entries.0": {"$exists": True}}) == 0
+    assert (await _titles(readers[0]))[0] == ["Asked while popular"]
+
+    # Demoted: the remaining follower's timeline is backfilled with it
+    await feed.unfollow_tag("python", readers[1])
+    await feeds.feed_writer.flush()
+    await _ask(author, "Asked once demoted", ["python"])
+    assert (await _titles(readers[0]))[0] == ["Asked once demoted", "Asked while popular"]
+    assert await database["timelines"].count_documents({"entries.0": {"$exists": True}}) == 1
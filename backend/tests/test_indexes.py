@@ -0,0 +1,61 @@
+import asyncio
+from app.repositories.questions import question_repo
+from app.services import duplicates, suggest
+from app.services.duplicates import duplicate_index
+from app.services.suggest import suggest_index
+from .conftest import insert_question, insert_user
+
+TITLES = [f"Sorting list number {i} in python" for i in range(6)]
+
+def _duplicate_titles():
+    return dict(duplicate_index._titles)
+
+def _suggest_titles():
+    return {question_id: entry[0] for question_id, entry in suggest_index._entries.items()}
+
+async def _questions(database):
+    author = await insert_user(database, "author")
+    return [await insert_question(database, author, title=title) for title in TITLES]
+
+async def _build_with_writes_midway(build):
+    """Run ``build`` one question per batch, letting the test write once the snapshot is being read."""
+    task = asyncio.create_task(build(batch_size=1))
+    for _ in range(3):
+        await asyncio.sleep(0)
+    return task
+
+async def test_writes_during_a_build_are_not_overwritten_by_the_snapshot(database):
+    questions = await _questions(database)
+    deleted, edited = str(questions[-1]["_id"]), str(questions[0]["_id"])
+
+    for build, index in ((duplicates.build_index, duplicate_index), (suggest.build_index, suggest_index)):
+        task = await _build_with_writes_midway(build)
+        assert index._touched is not None
+        # What the delete and update routes do, while later snapshot batches are still to come
+        await question_repo.delete_owned(questions[-1]["_id"])
+        index.remove(deleted)
+        if index is duplicate_index:
+            index.add(edited, "Edited while loading", "")
+        else:
+            index.add(edited, "Edited while loading", 0, questions[0]["created_at"])
+        await task
+
+    for titles in (_duplicate_titles(), _suggest_titles()):
+        assert deleted not in titles
+        assert titles[edited] == "Edited while loading"
+        assert len(titles) == len(TITLES) - 1
+
+async def test_rebuild_drops_entries_missed_while_events_were_lost(database):
+    questions = await _questions(database)
+    await duplicates.build_index()
+    await suggest.build_index()
+
+    # A delete the change stream never delivered
+    await question_repo.delete_owned(questions[0]["_id"])
+    await duplicates.build_index()
+    await suggest.build_index()
+
+    gone = str(questions[0]["_id"])
+    assert gone not in _duplicate_titles() and gone not in _suggest_titles()
+    assert not suggest_index.suggest("number 0")
+    assert duplicate_index.ready and suggest_index.ready
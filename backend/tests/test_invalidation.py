@@ -0,0 +1,81 @@
+"""The invalidation bus against a real change stream.
+
+Change streams need a replica set; run these with ``TEST_MONGODB_URL``
+pointing at one, a single node is enough (``mongod --replSet rs0`` then
+``rs.initiate()``). They are skipped otherwise.
+"""
+import asyncio
+import pytest
+from app.database import db
+from app.services.duplicates import duplicate_index
+from app.services.invalidation import invalidation_bus
+from app.services.suggest import suggest_index
+from .conftest import TEST_MONGODB_URL, insert_question, insert_user
+
+pytestmark = pytest.mark.skipif(not TEST_MONGODB_URL, reason="needs TEST_MONGODB_URL pointing at a replica set")
+
+async def _eventually(condition, timeout: float = 10):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "change not delivered"
+        await asyncio.sleep(0.05)
+
+@pytest.fixture
+async def bus(database):
+    if not (await db.client.admin.command("hello")).get("setName"):
+        pytest.skip("TEST_MONGODB_URL is not a replica set")
+    await invalidation_bus.mark_start()
+    task = asyncio.create_task(invalidation_bus.run())
+    await _eventually(lambda: invalidation_bus.enabled)
+    yield invalidation_bus
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    invalidation_bus._resume_token = None
+    invalidation_bus.enabled = False
+
+async def test_writes_reach_subscribed_caches(database, bus):
+    author = await insert_user(database, "author")
+    question = await insert_question(database, author, title="Streaming changes into caches")
+    question_id = str(question["_id"])
+    await _eventually(lambda: question_id in duplicate_index._titles and question_id in suggest_index._entries)
+
+    await database["questions"].update_one({"_id": question["_id"]}, {"$set": {"title": "Renamed through the stream"}})
+    await _eventually(lambda: duplicate_index._titles.get(question_id) == "Renamed through the stream")
+
+    await database["questions"].delete_one({"_id": question["_id"]})
+    await _eventually(lambda: question_id not in duplicate_index._titles and question_id not in suggest_index._entries)
+
+async def test_writes_made_before_the_stream_opens_are_delivered(database):
+    if not (await db.client.admin.command("hello")).get("setName"):
+        pytest.skip("TEST_MONGODB_URL is not a replica set")
+    author = await insert_user(database, "author")
+    # mark_start before the write, the stream itself only after it, as on startup
+    await invalidation_bus.mark_start()
+    question = await insert_question(database, author, title="Written while caches were loading")
+    task = asyncio.create_task(invalidation_bus.run())
+    try:
+        await _eventually(lambda: str(question["_id"]) in duplicate_index._titles)
+    finally:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        invalidation_bus._resume_token = None
+        invalidation_bus.enabled = False
+
+async def test_reset_rebuilds_from_the_collection(database, bus):
+    author = await insert_user(database, "author")
+    kept = await insert_question(database, author, title="Kept across a reset")
+    # An entry for a delete whose event was lost
+    duplicate_index.add("000000000000000000000000", "Deleted while the stream was down")
+    suggest_index.add("000000000000000000000000", "Deleted while the stream was down")
+
+    await bus._reset()
+
+    assert "000000000000000000000000" not in duplicate_index._titles
+    assert "000000000000000000000000" not in suggest_index._entries
+    assert str(kept["_id"]) in duplicate_index._titles
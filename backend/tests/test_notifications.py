@@ -0,0 +1,47 @@
+import datetime
+from bson import ObjectId
+from starlette.requests import Request
+from starlette.responses import Response
+from app.api import notifications as notifications_api
+from app.models.user import UserInDB
+from app.services import notifications
+from .conftest import insert_user
+
+def _request(headers=None) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]})
+
+async def _reload(database, user: UserInDB) -> UserInDB:
+    return UserInDB(**await database["users"].find_one({"_id": user.id}))
+
+async def _etag(user: UserInDB) -> str:
+    response = Response()
+    await notifications_api.get_notifications(_request(), response, user, 0, 20, False)
+    return response.headers["etag"]
+
+async def test_purging_read_notifications_invalidates_the_listing(database):
+    user = await insert_user(database, "recipient")
+    now = datetime.datetime.now()
+    old = now - datetime.timedelta(days=365)
+    await database["notifications"].insert_many([
+        {"_id": ObjectId(), "recipient_id": user.id, "type": "answer", "title": "t", "message": "read long ago",
+         "is_read": True, "read_at": old, "created_at": old, "updated_at": old},
+        {"_id": ObjectId(), "recipient_id": user.id, "type": "answer", "title": "t", "message": "unread",
+         "is_read": False, "created_at": now, "updated_at": now},
+    ])
+    etag = await _etag(user)
+
+    assert await notifications.purge_read() == 1
+    user = await _reload(database, user)
+    listed = await notifications_api.get_notifications(_request({"If-None-Match": etag}), Response(), user, 0, 20, False)
+    assert [n.message for n in listed] == ["unread"]
+
+    # Nothing else changed, so the new tag revalidates
+    response = await notifications_api.get_notifications(_request({"If-None-Match": await _etag(user)}), Response(), user, 0, 20, False)
+    assert response.status_code == 304
+
+async def test_new_notifications_invalidate_the_listing(database):
+    user = await insert_user(database, "recipient")
+    etag = await _etag(user)
+    await notifications.notify(user.id, "answer", "New answer", "Someone answered", sender_username="someone")
+    user = await _reload(database, user)
+    assert await _etag(user) != etag
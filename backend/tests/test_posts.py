@@ -0,0 +1,45 @@
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from starlette.requests import Request
+from starlette.responses import Response
+from app.api import answers, questions
+from app.models.answer import AnswerCreate, AnswerUpdate
+from app.models.question import QuestionUpdate
+from .conftest import insert_question, insert_user
+
+async def _status(call) -> int:
+    with pytest.raises(HTTPException) as raised:
+        await call
+    return raised.value.status_code
+
+async def test_only_the_author_may_edit_or_delete_a_question(database):
+    author, other = await insert_user(database, "author"), await insert_user(database, "other")
+    question = await insert_question(database, author)
+    question_id = str(question["_id"])
+
+    assert await _status(questions.update_question(question_id, QuestionUpdate(title="Taken over by someone"), other)) == 403
+    assert await _status(questions.delete_question(question_id, other)) == 403
+    assert await _status(questions.update_question(str(ObjectId()), QuestionUpdate(title="Nothing to edit here"), author)) == 404
+    assert await _status(questions.update_question("not-an-id", QuestionUpdate(title="Nothing to edit here"), author)) == 400
+
+    edited = await questions.update_question(question_id, QuestionUpdate(title="Edited by the author"), author)
+    assert edited.title == "Edited by the author"
+    assert (await database["questions"].find_one({"_id": question["_id"]}))["revision_count"] == 1
+
+async def test_only_the_author_may_edit_or_delete_an_answer(database):
+    author, other = await insert_user(database, "author"), await insert_user(database, "other")
+    question = await insert_question(database, author)
+    answer = await answers.create_answer(AnswerCreate(content="An answer written by the author."), str(question["_id"]), author)
+
+    assert await _status(answers.update_answer(answer.id, AnswerUpdate(content="Rewritten by someone else."), other)) == 403
+    assert await _status(answers.delete_answer(answer.id, other)) == 403
+    assert await _status(answers.delete_answer(str(ObjectId()), author)) == 404
+
+    await answers.delete_answer(answer.id, author)
+    assert await database["answers"].count_documents({}) == 0
+
+async def test_missing_question_is_not_found(database):
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+    assert await _status(questions.get_question(str(ObjectId()), request, Response())) == 404
+    assert await _status(questions.vote_question(str(ObjectId()), "upvote", await insert_user(database, "voter"))) == 404
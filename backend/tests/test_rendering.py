@@ -0,0 +1,21 @@
+import pytest
+from app.services.rendering import render_body
+
+@pytest.mark.parametrize("tag", ["svg", "iframe", "script", "style", "math"])
+def test_self_closed_drop_tag_keeps_what_follows(tag):
+    assert render_body(f"<p>a<{tag}/>b</p><p>c</p>") == "<p>ab</p><p>c</p>"
+
+def test_void_drop_tag_keeps_what_follows():
+    assert render_body("<p>a<embed src=x>b</p><p>c</p>") == "<p>ab</p><p>c</p>"
+    assert render_body("<p>a<embed src=x></embed>b</p>") == "<p>ab</p>"
+
+def test_stray_void_end_tag_does_not_end_a_dropped_element():
+    assert render_body('<svg><embed></embed><a href="https://example.com">x</a></svg><p>ok</p>') == "<p>ok</p>"
+
+def test_drop_tag_content_is_removed():
+    assert render_body("<p>a<script>alert(1)</script>b</p>") == "<p>ab</p>"
+    assert render_body("<p>a<svg><text>hidden</text></svg>b</p>") == "<p>ab</p>"
+
+def test_self_closed_allowed_tags():
+    assert render_body("<p>x<br/>y</p>") == "<p>x<br>y</p>"
+    assert render_body("<p>a<span/>b</p>") == "<p>a<span></span>b</p>"
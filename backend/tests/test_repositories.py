@@ -0,0 +1,273 @@
+"""Repository methods the services rely on, checked against MongoDB's documented results.
+
+They run on whichever backend the ``database`` fixture selects, so the same
+assertions hold the in-memory emulator to the server's behaviour.
+"""
+import datetime
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from app.repositories.answers import answer_repo
+from app.repositories.comments import comment_bucket_repo
+from app.repositories.feeds import tag_follower_repo, timeline_repo
+from app.repositories.notifications import notification_repo
+from app.repositories.questions import question_repo
+from app.repositories.stats import daily_stats_repo, rollup_state_repo
+from app.repositories.users import user_repo
+from .conftest import insert_question, insert_user
+
+async def test_dates_are_stored_with_millisecond_precision(database):
+    author = await insert_user(database, "author")
+    created_at = datetime.datetime(2024, 5, 1, 12, 30, 15, 123456)
+    question = await insert_question(database, author, created_at=created_at)
+
+    stored = await question_repo.get(question["_id"])
+    assert stored["created_at"] == datetime.datetime(2024, 5, 1, 12, 30, 15, 123000)
+
+async def test_toggle_vote_casts_flips_and_removes(database):
+    author = await insert_user(database, "author")
+    question = await insert_question(database, author)
+    voter = "5f0000000000000000000001"
+
+    before, old, new = await question_repo.toggle_vote(question["_id"], voter, 1, {"votes": 1})
+    assert (before["votes"], old, new) == (0, 0, 1)
+    before, old, new = await question_repo.toggle_vote(question["_id"], voter, -1, {"votes": 1})
+    assert (before["votes"], before["user_votes"], old, new) == (1, {voter: 1}, 1, -1)
+    await question_repo.toggle_vote(question["_id"], voter, -1, {"votes": 1})
+
+    stored = await question_repo.get(question["_id"])
+    assert (stored["votes"], stored["user_votes"], stored["version"]) == (0, {}, 3)
+    assert await question_repo.toggle_vote(ObjectId(), voter, 1, {"votes": 1}) is None
+
+async def test_toggle_vote_then_stage_sees_new_totals(database):
+    author = await insert_user(database, "author")
+    question = await insert_question(database, author)
+
+    await question_repo.toggle_vote(question["_id"], "voter", 1, {"votes": 1}, then={"score": {"$multiply": ["$votes", 10]}})
+    assert (await question_repo.get(question["_id"]))["score"] == 10
+
+async def test_update_owned_only_matches_the_author(database):
+    author, other = await insert_user(database, "author"), await insert_user(database, "other")
+    question = await insert_question(database, author)
+
+    assert await question_repo.update_owned(question["_id"], other.id, {"title": "Taken over"}) is None
+    before, after = await question_repo.update_owned(question["_id"], author.id, {"title": "Edited title"})
+    stored = await question_repo.get(question["_id"])
+    assert (stored["title"], stored["version"], stored["revision_count"]) == ("Edited title", 1, 1)
+    assert before["title"] == question["title"]
+    assert after == stored
+
+async def test_next_comment_position_returns_the_new_count_and_projection(database):
+    author = await insert_user(database, "author")
+    question = await insert_question(database, author)
+
+    first = await question_repo.next_comment_position(question["_id"])
+    second = await question_repo.next_comment_position(question["_id"])
+    assert (first["comments_appended"], second["comments_appended"]) == (1, 2)
+    assert set(second) == {"_id", "comments_appended", "author_id", "title"}
+    assert await question_repo.next_comment_position(ObjectId()) is None
+
+async def test_comment_buckets_append_page_and_tombstone(database):
+    parent_id, question_id = ObjectId(), ObjectId()
+    comments = [{"_id": ObjectId(), "author_id": ObjectId(), "content": f"comment {i}"} for i in range(3)]
+    for comment in comments:
+        await comment_bucket_repo.append("answer", parent_id, question_id, 0, comment)
+
+    bucket = (await comment_bucket_repo.first_buckets([parent_id], 2).to_list(length=None))[0]
+    # $slice trims the array but the other projected fields come back whole
+    assert [c["content"] for c in bucket["comments"]] == ["comment 0", "comment 1"]
+    assert (bucket["size"], bucket["seq"]) == (3, 0)
+
+    assert await comment_bucket_repo.tombstone(comments[1]["_id"], author_id=ObjectId()) is False
+    assert await comment_bucket_repo.tombstone(comments[1]["_id"]) is True
+    assert await comment_bucket_repo.tombstone(comments[1]["_id"]) is False
+    assert not await comment_bucket_repo.has_live(comments[1]["_id"])
+    assert await comment_bucket_repo.has_live(comments[2]["_id"])
+
+    stored = await comment_bucket_repo.find_one({"parent_id": parent_id})
+    # The positional $ touched only the matched element
+    assert stored["comments"][1] == {"_id": comments[1]["_id"], "author_id": comments[1]["author_id"], "deleted": True}
+    assert stored["comments"][2]["content"] == "comment 2"
+    assert (stored["count"], stored["question_id"], stored["parent_type"]) == (2, question_id, "answer")
+
+async def test_comment_bucket_seq_is_unique_per_parent(database):
+    parent_id = ObjectId()
+    await comment_bucket_repo.insert_one({"parent_id": parent_id, "seq": 0, "comments": []})
+    with pytest.raises(DuplicateKeyError):
+        await comment_bucket_repo.insert_one({"parent_id": parent_id, "seq": 0, "comments": []})
+
+async def test_fold_unread_coalesces_events(database):
+    recipient = ObjectId()
+    question_id = ObjectId()
+    for sender in ("ann", "bob", "ann", "cid", "dan"):
+        folded = await notification_repo.fold_unread(
+            recipient, "answer", question_id, {"title": "New answer", "message": f"by {sender}"}, sender, 3
+        )
+
+    assert (folded["count"], folded["senders"], folded["message"]) == (5, ["dan", "cid", "ann"], "by dan")
+    assert folded["is_read"] is False
+    assert await notification_repo.unread_count(recipient) == 1
+
+    assert await notification_repo.mark_one_read(folded["_id"], recipient)
+    fresh = await notification_repo.fold_unread(recipient, "answer", question_id, {"title": "t", "message": "m"}, "eve", 3)
+    assert fresh["_id"] != folded["_id"]
+    assert (fresh["count"], fresh["senders"]) == (1, ["eve"])
+
+async def test_fold_unread_keeps_dollar_strings_literal(database):
+    folded = await notification_repo.fold_unread(ObjectId(), "mention", None, {"title": "$title", "message": "$$ROOT"}, None, 3)
+    assert (folded["title"], folded["message"], folded["senders"]) == ("$title", "$$ROOT", [])
+
+async def test_convert_string_ids(database):
+    target = ObjectId()
+    await notification_repo.insert_one({"recipient_id": str(target), "created_at": datetime.datetime(2024, 1, 1)})
+
+    assert await notification_repo.convert_string_ids("recipient_id") == 1
+    assert await notification_repo.backfill_updated_at() == 1
+    stored = await notification_repo.find_one({})
+    assert stored["recipient_id"] == target
+    assert stored["updated_at"] == stored["created_at"]
+
+async def test_search_requires_and_uses_the_text_index(database):
+    author = await insert_user(database, "author")
+    await insert_question(database, author, title="Sorting a list in python", tags=["python"])
+    await insert_question(database, author, title="Closures in javascript", description="Scopes.", tags=["javascript"])
+
+    found = await question_repo.search("javascript", None, [("created_at", -1)])
+    assert [q["title"] for q in found] == ["Closures in javascript"]
+    tagged = await question_repo.search(None, ["python", "go"], [("created_at", -1)])
+    assert [q["title"] for q in tagged] == ["Sorting a list in python"]
+
+async def test_unanswered_pages_cover_ties_in_created_at(database):
+    author = await insert_user(database, "author")
+    moment = datetime.datetime(2024, 3, 1, 9, 0, 0, 500000)
+    questions = []
+    for i in range(7):
+        # Pairs share a millisecond, so only the _id tiebreak orders them
+        created_at = moment + datetime.timedelta(microseconds=(i // 2) * 1000 + i % 2 * 10)
+        questions.append(await insert_question(database, author, created_at=created_at, tags=["python"]))
+    await insert_question(database, author, is_answered=True, tags=["python"])
+
+    for descending in (True, False):
+        expected = sorted(questions, key=lambda q: (q["created_at"].replace(microsecond=q["created_at"].microsecond // 1000 * 1000), q["_id"]), reverse=descending)
+        seen, position = [], None
+        while True:
+            page = await question_repo.unanswered("python", position, descending, 3)
+            seen.extend(q["_id"] for q in page)
+            if len(page) < 3:
+                break
+            position = (page[-1]["created_at"], page[-1]["_id"])
+        assert seen == [q["_id"] for q in expected]
+
+async def test_newest_in_tags_and_tag_counts(database):
+    author = await insert_user(database, "author")
+    base = datetime.datetime(2024, 1, 1)
+    for i, tags in enumerate((["go"], ["python", "go"], ["rust"], ["python"])):
+        await insert_question(database, author, tags=tags, created_at=base + datetime.timedelta(hours=i))
+
+    newest = await question_repo.newest_in_tags(["python", "go"], 10, projection={"tags": 1, "created_at": 1})
+    assert [q["tags"] for q in newest] == [["python"], ["python", "go"], ["go"]]
+    assert set(newest[0]) == {"_id", "tags", "created_at"}
+    assert await question_repo.tag_counts() == [
+        {"tag": "go", "count": 2}, {"tag": "python", "count": 2}, {"tag": "rust", "count": 1},
+    ]
+
+async def test_answer_removed_reopens_the_question(database):
+    author = await insert_user(database, "author")
+    accepted = ObjectId()
+    question = await insert_question(database, author, answers_count=2, is_answered=True, accepted_answer_id=accepted)
+
+    before = await question_repo.answer_removed(question["_id"], ObjectId(), 1.5)
+    assert before == {"_id": question["_id"], "author_id": author.id, "accepted_answer_id": accepted}
+    await question_repo.answer_removed(question["_id"], accepted, 0.5)
+
+    stored = await question_repo.get(question["_id"])
+    assert (stored["answers_count"], stored["is_answered"], stored["accepted_answer_id"]) == (0, False, None)
+    assert (stored["version"], stored["answers_version"], stored["hot_score"]) == (2, 2, 0.5)
+
+async def test_reputation_sources_skip_self_votes_and_self_accepts(database):
+    author, voter = await insert_user(database, "author"), await insert_user(database, "voter")
+    question = await insert_question(database, author, user_votes={str(author.id): 1, str(voter.id): 1, "x": -1})
+    own = await answer_repo.insert_one({"question_id": question["_id"], "author_id": author.id, "user_votes": {}})
+    await question_repo.set_accepted(question["_id"], author.id, own.inserted_id)
+    other = await insert_question(database, voter)
+    answer = await answer_repo.insert_one({"question_id": other["_id"], "author_id": author.id, "user_votes": {str(voter.id): -1}})
+    await question_repo.set_accepted(other["_id"], voter.id, answer.inserted_id)
+
+    assert [row async for row in question_repo.vote_points_by_author({1: 5, -1: -2})] == [(author.id, 3)]
+    assert [row async for row in answer_repo.vote_points_by_author({1: 10, -1: -2})] == [(author.id, -2)]
+    assert [row async for row in question_repo.accepted_counts_by_author()] == [(author.id, 1)]
+
+async def test_follow_tag_respects_the_cap(database):
+    user = await insert_user(database, "reader")
+    for tag in ("a", "b"):
+        assert await user_repo.follow_tag(user.id, tag, 2)
+    assert not await user_repo.follow_tag(user.id, "c", 2)
+    assert not await user_repo.follow_tag(user.id, "a", 3)
+    assert await user_repo.unfollow_tag(user.id, "a")
+    assert (await user_repo.get(user.id))["followed_tags"] == ["b"]
+
+async def test_timeline_push_keeps_the_newest(database):
+    user_id = ObjectId()
+    base = datetime.datetime(2024, 1, 1)
+    entry = lambda hours: {"question_id": ObjectId(), "created_at": base + datetime.timedelta(hours=hours)}
+    await timeline_repo.push([user_id], [entry(1), entry(5)], 3)
+    await timeline_repo.push([user_id], [entry(3), entry(0), entry(4)], 3)
+
+    assert [e["created_at"].hour for e in await timeline_repo.entries(user_id)] == [5, 4, 3]
+    assert await timeline_repo.question_ids([user_id, ObjectId()]) == {user_id: {e["question_id"] for e in await timeline_repo.entries(user_id)}}
+
+async def test_popular_tag_flag_has_hysteresis(database):
+    changes = [await tag_follower_repo.adjust("python", delta, 3, 2) for delta in (1, 1, 1, -1, 1, -1, -1)]
+    # Popular at 3 followers, kept at 2, dropped at 1
+    assert changes == [None, None, True, None, None, None, False]
+    assert await tag_follower_repo.popular(3) == set()
+
+    # A count stored before the flag existed is judged by the plain threshold
+    await database["tag_followers"].insert_one({"_id": "go", "followers": 5})
+    assert await tag_follower_repo.popular(3) == {"go"}
+    assert await tag_follower_repo.adjust("go", -1, 3, 2) is None
+    assert (await tag_follower_repo.get("go"))["popular"] is True
+
+async def test_daily_counts_merge_per_day(database):
+    author = await insert_user(database, "author")
+    day = datetime.datetime(2024, 2, 10)
+    for hours, tags in ((1, ["python"]), (2, ["python", "go"]), (30, ["go"])):
+        await insert_question(database, author, tags=tags, created_at=day + datetime.timedelta(hours=hours))
+    await daily_stats_repo.merge_counts(answer_repo, "answers", day, day + datetime.timedelta(days=2))
+    await daily_stats_repo.insert_one({"_id": "2024-02-10", "answers": 7})
+
+    end = day + datetime.timedelta(days=2)
+    await daily_stats_repo.merge_counts(question_repo, "questions", day, end)
+    await daily_stats_repo.merge_tags(question_repo, day, end)
+
+    first, second = await daily_stats_repo.between("2024-02-10", "2024-02-11")
+    # whenMatched: merge keeps the fields the pipeline did not produce
+    assert (first["questions"], first["answers"], second["questions"]) == (2, 7, 1)
+    assert sorted((t["tag"], t["count"]) for t in first["tags"]) == [("go", 1), ("python", 2)]
+
+async def test_rollup_watermark_never_moves_back(database):
+    later = datetime.datetime(2024, 1, 2)
+    await rollup_state_repo.advance("test", later)
+    await rollup_state_repo.advance("test", datetime.datetime(2024, 1, 1))
+    assert await rollup_state_repo.watermark("test") == later
+    assert await rollup_state_repo.watermark("missing") is None
+
+async def test_scan_resumes_after_an_id(database):
+    ids = sorted([ObjectId() for _ in range(5)])
+    for document_id in reversed(ids):
+        await answer_repo.insert_one({"_id": document_id, "content": "x"})
+
+    assert [a["_id"] async for a in answer_repo.scan({"_id": 1}, 2)] == ids
+    assert [a["_id"] async for a in answer_repo.scan({"_id": 1}, 2, after_id=ids[2])] == ids[3:]
+
+async def test_store_renders_skips_changed_sources(database):
+    author = await insert_user(database, "author")
+    kept = await insert_question(database, author, description="kept")
+    edited = await insert_question(database, author, description="before")
+    stale = await question_repo.rendered_before("description", 2, 10).to_list(length=None)
+    await question_repo.update_one({"_id": edited["_id"]}, {"$set": {"description": "after"}})
+
+    assert await question_repo.store_renders("description", 2, [(q, "<p>html</p>") for q in stale]) == 1
+    assert (await question_repo.get(kept["_id"]))["render_version"] == 2
+    assert "render_version" not in await question_repo.get(edited["_id"])
+    assert await question_repo.rendered_before("description", 2, 10).to_list(length=None) == [{"_id": edited["_id"], "description": "after"}]
@@ -0,0 +1,69 @@
+import pytest
+from fastapi import HTTPException
+from app.api import answers, questions
+from app.config import settings
+from app.models.answer import AnswerCreate, AnswerUpdate
+from app.models.question import QuestionUpdate
+from app.services import revisions
+from .conftest import insert_question, insert_user
+
+EDITS = 12
+
+def _description(number: int) -> str:
+    return f"Revision {number} of a description that is long enough to diff."
+
+async def test_every_question_revision_reads_back_as_written(database, monkeypatch):
+    author = await insert_user(database, "author")
+    question = await insert_question(database, author, description=_description(1))
+    question_id = str(question["_id"])
+
+    # Enough edits to cross a snapshot, some changing the title as well
+    for number in range(2, EDITS + 2):
+        update = {"description": _description(number)}
+        if number % 3 == 0:
+            update["title"] = f"Edited title number {number}"
+        await questions.update_question(question_id, QuestionUpdate(**update), author)
+
+    history = await questions.get_question_revisions(question_id, 0, 100)
+    assert [r["number"] for r in history] == list(range(EDITS + 1, 0, -1))
+    assert history[-1]["changed_fields"] == ["title", "description", "tags"]
+    assert history[0]["changed_fields"] == ["description"]
+
+    async def read_all():
+        return [await questions.get_question_revision(question_id, n) for n in range(1, EDITS + 2)]
+
+    written = await read_all()
+    assert [r["description"] for r in written] == [_description(n) for n in range(1, EDITS + 2)]
+    assert written[0]["title"] == question["title"]
+    assert written[8]["title"] == "Edited title number 9" and written[9]["title"] == "Edited title number 9"
+    assert all(r["tags"] == ["python"] for r in written)
+
+    # Compressed revisions read back the same
+    monkeypatch.setattr(settings, "REVISION_COMPRESS_AFTER_HOURS", 0)
+    assert await revisions.compress_old_revisions() == EDITS + 1
+    assert await read_all() == written
+
+    with pytest.raises(HTTPException) as raised:
+        await questions.get_question_revision(question_id, EDITS + 2)
+    assert raised.value.status_code == 404
+
+async def test_answer_revisions(database):
+    author = await insert_user(database, "author")
+    question = await insert_question(database, author)
+    answer = await answers.create_answer(AnswerCreate(content="The first wording of the answer."), str(question["_id"]), author)
+
+    # An answer that was never edited is its own only revision
+    (only,) = await answers.get_answer_revisions(answer.id, 0, 20)
+    assert only["number"] == 1 and only["content"] == "The first wording of the answer."
+
+    await answers.update_answer(answer.id, AnswerUpdate(content="The second wording of the answer."), author)
+    assert [r["number"] for r in await answers.get_answer_revisions(answer.id, 0, 20)] == [2, 1]
+    assert (await answers.get_answer_revision(answer.id, 1))["content"] == "The first wording of the answer."
+    assert (await answers.get_answer_revision(answer.id, 2))["content"] == "The second wording of the answer."
+
+    # Deleting the answer takes its history with it
+    await answers.delete_answer(answer.id, author)
+    assert await database["revisions"].count_documents({}) == 0
+    with pytest.raises(HTTPException) as raised:
+        await answers.get_answer_revisions(answer.id, 0, 20)
+    assert raised.value.status_code == 404
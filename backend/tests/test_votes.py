@@ -0,0 +1,108 @@
+import asyncio
+import datetime
+import random
+from collections import defaultdict
+from app.api import questions
+from app.repositories.questions import question_repo
+from app.repositories.stats import DAY_FORMAT, daily_stats_repo
+from app.services import reputation, rollups
+from app.services.reputation import ledger, votes_points
+from .conftest import insert_question, insert_user
+
+CALLS = 400
+
+def _random_calls(voters, seed: int):
+    """Upvotes and downvotes in random order, so users flip, remove and re-cast their votes."""
+    rng = random.Random(seed)
+    return [(rng.choice(voters), rng.choice((1, -1))) for _ in range(CALLS)]
+
+async def test_concurrent_toggles_keep_totals_exact(database):
+    author = await insert_user(database, "author")
+    voters = [str(author.id)] + [str((await insert_user(database, f"voter{i}")).id) for i in range(7)]
+    question = await insert_question(database, author)
+
+    results = await asyncio.gather(*(
+        question_repo.toggle_vote(question["_id"], voter, value, {"votes": 1})
+        for voter, value in _random_calls(voters, seed=41)
+    ))
+
+    stored = await question_repo.get(question["_id"])
+    assert stored["votes"] == sum(stored["user_votes"].values())
+    assert all(v in (1, -1) for v in stored["user_votes"].values())
+    # Each call reports the transition it made; per voter they must chain up to the stored vote
+    moved = defaultdict(int)
+    for (voter, _), (_, old_vote, new_vote) in zip(_random_calls(voters, seed=41), results):
+        moved[voter] += new_vote - old_vote
+    assert {voter: total for voter, total in moved.items() if total} == stored["user_votes"]
+    assert stored["version"] == CALLS
+
+async def test_concurrent_vote_requests_keep_ledger_exact(database):
+    author = await insert_user(database, "author")
+    users = [author] + [await insert_user(database, f"voter{i}") for i in range(7)]
+    question = await insert_question(database, author)
+    question_id = str(question["_id"])
+    ledger._pending = []
+
+    rng = random.Random(7)
+    await asyncio.gather(*(
+        questions.vote_question(question_id, rng.choice(("upvote", "downvote")), rng.choice(users))
+        for _ in range(CALLS)
+    ))
+    await ledger.flush()
+
+    stored = await question_repo.get(question["_id"])
+    assert stored["votes"] == sum(stored["user_votes"].values())
+    # Self-votes count towards the total but earn no reputation
+    expected = votes_points("question", stored["user_votes"], author.id)
+    entries = await database["reputation_ledger"].find({"source_id": question["_id"]}).to_list(length=None)
+    assert all(e["reason"] == "question_vote" and e["user_id"] == author.id for e in entries)
+    assert sum(e["delta"] for e in entries) == expected
+    assert (await database["users"].find_one({"_id": author.id}))["reputation"] == expected
+
+async def test_rollup_counts_cast_votes_and_resets_emptied_days(database):
+    author, voter = await insert_user(database, "author"), await insert_user(database, "voter")
+    question = await insert_question(database, author)
+    question_id = str(question["_id"])
+    ledger._pending = []
+
+    # A self-vote and a vote cast count; the flip and the removal that follow do not
+    for user, vote_type in ((author, "upvote"), (voter, "upvote"), (voter, "downvote"), (voter, "downvote")):
+        await questions.vote_question(question_id, vote_type, user)
+    await ledger.flush()
+
+    today = datetime.date.today()
+    key = today.strftime(DAY_FORMAT)
+    await rollups.backfill(today, today)
+    (day,) = await daily_stats_repo.between(key, key)
+    assert (day["votes"], day["questions"]) == (2, 1)
+
+    # Rebuilding reputation resets the ledger but keeps the votes cast
+    await reputation.rebuild()
+    await rollups.backfill(today, today)
+    (day,) = await daily_stats_repo.between(key, key)
+    assert day["votes"] == 2
+    assert (await database["users"].find_one({"_id": author.id}))["reputation"] == 0
+
+    # With nothing left to count, $merge writes nothing; the day must still go back to zero
+    await database["reputation_ledger"].delete_many({})
+    await rollups.backfill(today, today)
+    (day,) = await daily_stats_repo.between(key, key)
+    assert (day["votes"], day["questions"]) == (0, 1)
+
+async def test_flush_does_not_reapply_a_change_event(database, monkeypatch):
+    author = await insert_user(database, "author")
+    await reputation.load_leaderboard()
+    add_reputation = reputation.user_repo.add_reputation
+
+    async def add_and_notify(deltas):
+        # The change stream may deliver the new document before the flush reads it back
+        stored = await add_reputation(deltas)
+        for user in stored:
+            reputation._on_user_changed({"operationType": "update", "documentKey": {"_id": user["_id"]}, "fullDocument": user})
+        return stored
+
+    monkeypatch.setattr(reputation.user_repo, "add_reputation", add_and_notify)
+    ledger.record(author.id, 10, "question_vote")
+    await ledger.flush()
+
+    assert reputation.leaderboard.rank(str(author.id))["reputation"] == 10
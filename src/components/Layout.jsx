@@ -166,8 +166,11 @@ export default function Layout({ children }) {
                             !n.is_read ? 'bg-primary-50' : ''
                           )}>
                             <div className="font-medium text-gray-800">{n.title}</div>
-                            <div className="text-gray-600">{n.message}</div>
-                            <div className="text-xs text-gray-400 mt-1">{new Date(n.created_at).toLocaleString()}</div>
+                            <div className="text-gray-600">
+                              {n.message}
+                              {n.count > 1 && <span className="text-gray-500"> (+{n.count - 1} more)</span>}
+                            </div>
+                            <div className="text-xs text-gray-400 mt-1">{new Date(n.updated_at || n.created_at).toLocaleString()}</div>
                           </div>
                         ))
                       )}
@@ -63,6 +63,19 @@ export default function QuestionDetail() {
     }
   };
 
+  const handleAccept = async (answerId) => {
+    try {
+      if (question.accepted_answer_id === answerId) {
+        await api.delete(`/answers/${answerId}/accept`);
+      } else {
+        await api.post(`/answers/${answerId}/accept`);
+      }
+      fetchQuestionAndAnswers();
+    } catch (error) {
+      toast.error('Failed to accept answer');
+    }
+  };
+
   const handleSubmitAnswer = async () => {
     if (!newAnswer.trim()) {
       toast.error('Please enter an answer');
@@ -214,7 +227,7 @@ export default function QuestionDetail() {
 
             <div 
               className="prose max-w-none mb-4"
-              dangerouslySetInnerHTML={{ __html: question.description }}
+              dangerouslySetInnerHTML={{ __html: question.description_html ?? question.description }}
             />
 
             {/* Tags */}
@@ -279,6 +292,17 @@ export default function QuestionDetail() {
                 >
                   <ThumbsUp className="w-5 h-5 text-gray-400 rotate-180" />
                 </button>
+                {user && question.author_id === user.id ? (
+                  <button
+                    onClick={() => handleAccept(answer.id)}
+                    title={question.accepted_answer_id === answer.id ? 'Unaccept answer' : 'Accept answer'}
+                    className="p-1 hover:bg-gray-100 rounded transition-colors"
+                  >
+                    <CheckCircle className={`w-5 h-5 ${question.accepted_answer_id === answer.id ? 'text-green-600' : 'text-gray-300'}`} />
+                  </button>
+                ) : question.accepted_answer_id === answer.id && (
+                  <CheckCircle className="w-5 h-5 text-green-600" />
+                )}
               </div>
 
               {/* Answer Content */}
@@ -286,7 +310,7 @@ export default function QuestionDetail() {
                 <div className="flex items-start justify-between mb-4">
                   <div 
                     className="prose max-w-none"
-                    dangerouslySetInnerHTML={{ __html: answer.content }}
+                    dangerouslySetInnerHTML={{ __html: answer.content_html ?? answer.content }}
                   />
                   
                   {user && answer.author_id === user.id && (